@@ -0,0 +1,189 @@
+# coding: utf-8
+# license: GPLv3
+
+"""
+Точность против стоимости расчёта.
+Для задач двух тел (Exam/one_satellite.txt — Солнце и Земля,
+Exam/double_star.txt — двойная звезда) известно точное кеплерово решение.
+Каждый движок и метод интегрирования прогоняется на много оборотов при
+разных шагах по времени; записываются ошибка положения относительно
+точного решения, дрейф полной энергии и процессорное время. Полученные
+кривые «работа — точность» позволяют выбрать самый дешёвый шаг и метод,
+дающие нужную точность.
+
+Пример:
+    python solar_accuracy.py --orbits 10 --tolerance 1e-3 --output accuracy.csv
+"""
+import argparse
+import csv
+import math
+import os
+import time
+
+import numpy as np
+
+from solar_engines import ENGINES, INTEGRATORS, create_engine
+from solar_input import read_space_state_from_file
+from solar_interpolate import kepler_propagate
+from solar_model import gravitational_constant
+from solar_state import total_energy
+
+TWO_BODY_SCENARIOS = ("Exam/one_satellite.txt", "Exam/double_star.txt")
+
+DEFAULT_STEPS_PER_ORBIT = (50, 100, 200, 400, 800, 1600, 3200)
+
+CSV_FIELDS = ("scenario", "engine", "integrator", "steps_per_orbit", "dt", "steps",
+              "position_error", "energy_drift", "cpu_s")
+
+
+class TwoBodyOrbit:
+    """Точное решение задачи двух тел для начального состояния state."""
+    def __init__(self, state):
+        if len(state) != 2:
+            raise ValueError("Точное решение известно только для двух тел")
+        self.m = np.array(state.m, dtype=float)
+        total = self.m.sum()
+        self.mu = gravitational_constant * total
+        self.center = np.array([np.dot(self.m, state.x), np.dot(self.m, state.y)]) / total
+        self.center_velocity = np.array([np.dot(self.m, state.Vx), np.dot(self.m, state.Vy)]) / total
+        self.r = np.array([state.x[1] - state.x[0], state.y[1] - state.y[0]], dtype=float)
+        self.v = np.array([state.Vx[1] - state.Vx[0], state.Vy[1] - state.Vy[0]], dtype=float)
+        inverse_a = 2 / np.hypot(*self.r) - np.dot(self.v, self.v) / self.mu
+        if inverse_a <= 0:
+            raise ValueError("Орбита не замкнута")
+        self.a = 1 / inverse_a
+        self.period = 2 * math.pi * math.sqrt(self.a ** 3 / self.mu)
+
+    def relative(self, t):
+        """Вектор от первого тела ко второму в момент t."""
+        # Распространение по целым оборотам не нужно: решение периодично
+        rx, ry, _ = kepler_propagate(self.r[0], self.r[1], self.v[0], self.v[1], self.mu,
+                                     math.fmod(t, self.period), iterations=30)
+        return np.array([rx, ry])
+
+    def positions(self, t):
+        """Координаты тел (xs, ys) в момент t."""
+        center = self.center + self.center_velocity * t
+        r = self.relative(t)
+        share = self.m[::-1] / self.m.sum()
+        xs = center[0] + np.array([-share[0], share[1]]) * r[0]
+        ys = center[1] + np.array([-share[0], share[1]]) * r[1]
+        return xs, ys
+
+
+def run_case(path, engine_name, integrator, steps_per_orbit, orbits):
+    """Один прогон: возвращает словарь со столбцами CSV_FIELDS."""
+    state = read_space_state_from_file(path)
+    orbit = TwoBodyOrbit(state)
+    energy = total_energy(state)
+    dt = orbit.period / steps_per_orbit
+    steps = steps_per_orbit * orbits
+
+    with create_engine(engine_name, state, integrator) as engine:
+        start = time.process_time()
+        for _ in range(steps):
+            engine.step(dt)
+        cpu = time.process_time() - start
+
+        final = engine.to_state()
+        xs, ys = orbit.positions(steps * dt)
+        error = np.max(np.hypot(np.asarray(final.x) - xs, np.asarray(final.y) - ys)) / orbit.a
+        drift = abs((total_energy(final) - energy) / energy)
+    return {
+        "scenario": path, "engine": engine_name, "integrator": integrator,
+        "steps_per_orbit": steps_per_orbit, "dt": dt, "steps": steps,
+        "position_error": float(error),
+        "energy_drift": float(drift),
+        "cpu_s": cpu,
+    }
+
+
+def sweep(scenarios=TWO_BODY_SCENARIOS, engines=("python", "numpy"), integrators=INTEGRATORS,
+          steps_per_orbit=DEFAULT_STEPS_PER_ORBIT, orbits=10, log=print):
+    """Прогоны для всех сочетаний параметров."""
+    rows = []
+    for path in scenarios:
+        for engine_name in engines:
+            for integrator in integrators:
+                for count in steps_per_orbit:
+                    row = run_case(path, engine_name, integrator, count, orbits)
+                    rows.append(row)
+                    log(f"{os.path.basename(path):18s} {engine_name:7s} {integrator:9s} "
+                        f"{count:6d} шагов/оборот  ошибка {row['position_error']:9.2e}  "
+                        f"энергия {row['energy_drift']:9.2e}  {row['cpu_s']:8.3f} с")
+    return rows
+
+
+def cheapest(rows, tolerance, scenario=None):
+    """Самый дешёвый по процессорному времени прогон с ошибкой положения
+    не больше tolerance (в долях большой полуоси) или None."""
+    suitable = [row for row in rows if row["position_error"] <= tolerance
+                and (scenario is None or row["scenario"] == scenario)]
+    return min(suitable, key=lambda row: row["cpu_s"], default=None)
+
+
+def plot_work_precision(rows, filename):
+    """Рисует кривые «время — ошибка» в filename; нужен matplotlib."""
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib import pyplot
+
+    scenarios = sorted({row["scenario"] for row in rows})
+    figure, axes = pyplot.subplots(1, len(scenarios), figsize=(6 * len(scenarios), 5), squeeze=False)
+    for axis, scenario in zip(axes[0], scenarios):
+        series = sorted({(row["engine"], row["integrator"]) for row in rows
+                         if row["scenario"] == scenario})
+        for engine_name, integrator in series:
+            points = sorted((row["cpu_s"], row["position_error"]) for row in rows
+                            if row["scenario"] == scenario and row["engine"] == engine_name
+                            and row["integrator"] == integrator)
+            axis.loglog(*zip(*points), marker="o", label=f"{engine_name}/{integrator}")
+        axis.set_title(os.path.basename(scenario))
+        axis.set_xlabel("процессорное время, с")
+        axis.set_ylabel("ошибка положения / a")
+        axis.legend()
+    figure.tight_layout()
+    figure.savefig(filename)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Точность и стоимость методов интегрирования")
+    parser.add_argument("--scenarios", nargs="+", default=list(TWO_BODY_SCENARIOS))
+    parser.add_argument("--engines", nargs="+", choices=sorted(ENGINES), default=["python", "numpy"])
+    parser.add_argument("--integrators", nargs="+", choices=INTEGRATORS, default=list(INTEGRATORS))
+    parser.add_argument("--steps-per-orbit", nargs="+", type=int,
+                        default=list(DEFAULT_STEPS_PER_ORBIT))
+    parser.add_argument("--orbits", type=int, default=10)
+    parser.add_argument("--tolerance", type=float, default=1E-3,
+                        help="нужная точность положения в долях большой полуоси")
+    parser.add_argument("--output", default="accuracy.csv", help="таблица результатов CSV")
+    parser.add_argument("--plot", help="файл с кривыми «работа — точность» (нужен matplotlib)")
+    args = parser.parse_args(argv)
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    scenarios = [path if os.path.exists(path) else os.path.join(here, path)
+                 for path in args.scenarios]
+    rows = sweep(scenarios, args.engines, args.integrators, args.steps_per_orbit, args.orbits)
+    with open(args.output, 'w', newline='', encoding='utf-8') as output_file:
+        writer = csv.DictWriter(output_file, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Результаты записаны в {args.output}")
+
+    for scenario in scenarios:
+        best = cheapest(rows, args.tolerance, scenario)
+        if best is None:
+            print(f"{scenario}: точность {args.tolerance:g} не достигнута")
+        else:
+            print(f"{scenario}: {best['engine']}/{best['integrator']}, "
+                  f"{best['steps_per_orbit']} шагов на оборот (dt = {best['dt']:.6g} с), "
+                  f"{best['cpu_s']:.3f} с")
+    if args.plot:
+        try:
+            plot_work_precision(rows, args.plot)
+        except ImportError:
+            print("Для графика нужен matplotlib")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+# coding: utf-8
+# license: GPLv3
+
+"""
+Тесты производительности: расчёт, чтение и генерация, запись и
+обновление холста на системах от 10 до 10^5 тел (синтетических и
+поставляемых сценариях).
+Результаты записываются в JSON и сравниваются с сохранённым базовым
+файлом: замеры, ставшие медленнее больше чем на threshold и не меньше
+чем на min_difference секунд, считаются регрессией, и программа
+завершается с кодом 1.
+
+Пример:
+    python solar_bench.py --output bench.json --baseline baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import solar_input
+from solar_model import calculate_force, recalculate_space_objects_positions
+from solar_state import recalculate_state_positions
+
+DEFAULT_SIZES = (10, 100, 1000, 10000, 100000)
+
+SHIPPED_SCENARIOS = ("Four_stars@@@@.txt", "Exam/one_satellite.txt", "Exam/double_star.txt",
+                     "Exam/solar_system2.0.txt", "synthetic_scaling.txt")
+"""Сценарии из репозитория, на которых также проводятся замеры"""
+
+DEFAULT_THRESHOLD = 0.2
+"""Допустимое замедление относительно базового файла (0.2 = на 20%)"""
+
+DEFAULT_MIN_DIFFERENCE = 1E-5
+"""Замедление меньше этого числа секунд на вызов регрессией не считается"""
+
+MIN_SAMPLE_TIME = 0.05
+"""Наименьшая длительность одного замера: быстрые функции вызываются
+в замере столько раз подряд, чтобы её набрать"""
+
+
+def synthetic_scenario(directory, n):
+    """Файл сценария ровно на n тел: звезда и n - 1 планет без спутников."""
+    path = os.path.join(directory, f"synthetic_{n}.txt")
+    with open(path, 'w', encoding='utf-8') as scenario_file:
+        scenario_file.write("Star 20 blue 2E30 0 0 0 0\n")
+        if n > 1:
+            scenario_file.write(f"$generate_planets blue {n - 1} _ _ _ 1E10 3E11\n")
+    return path
+
+
+def measure(function, repeat=3, min_time=0.2, min_sample=MIN_SAMPLE_TIME):
+    """Время одного вызова function() в секундах: (лучшее, медиана, замеров).
+    Как в timeit, каждый замер — серия из number вызовов длительностью не
+    меньше min_sample; number подбирается удвоением. Медленные функции
+    выполняются один раз."""
+    number = 1
+    while True:
+        begin = time.perf_counter()
+        for _ in range(number):
+            function()
+        sample = time.perf_counter() - begin
+        if sample >= min_sample or sample > 5.0:
+            break
+        number *= 2
+    times = [sample / number]
+    start = time.perf_counter()
+    while len(times) < repeat or (time.perf_counter() - start < min_time and len(times) < 100):
+        if times[-1] * number > 5.0:
+            break
+        begin = time.perf_counter()
+        for _ in range(number):
+            function()
+        times.append((time.perf_counter() - begin) / number)
+    return min(times), statistics.median(times), len(times)
+
+
+def _objects(path):
+    return solar_input.read_space_objects_data_from_file(path)
+
+
+def _state(path):
+    return solar_input.read_space_state_from_file(path, seed=0)
+
+
+def bench_calculate_force(path, directory):
+    space_objects = _state(path).to_objects()
+    return lambda: calculate_force(space_objects[-1], space_objects)
+
+
+def bench_recalculate_objects(path, directory):
+    space_objects = _state(path).to_objects()
+    return lambda: recalculate_space_objects_positions(space_objects, 1.0)
+
+
+def bench_recalculate_state(path, directory):
+    state = _state(path)
+    return lambda: recalculate_state_positions(state, 1.0)
+
+
+def bench_read_objects(path, directory):
+    read = lambda: _objects(path)
+    # Чтение в объекты не выполняет синтетические директивы $...
+    read.bodies = len(read())
+    return read
+
+
+def bench_read_state(path, directory):
+    return lambda: _state(path)
+
+
+def bench_write_objects(path, directory):
+    space_objects = _state(path).to_objects()
+    output = os.path.join(directory, "written.txt")
+    return lambda: solar_input.write_space_objects_data_to_file(output, space_objects)
+
+
+def bench_write_state(path, directory):
+    state = _state(path)
+    output = os.path.join(directory, "written.txt")
+    return lambda: solar_input.write_space_state_to_file(output, state)
+
+
+def bench_canvas(path, directory):
+    """Обновление холста пакетом (CanvasUpdater) за кадр; нужен экран X."""
+    import tkinter
+    import solar_vis
+    from solar_canvas import CanvasUpdater
+
+    space_objects = _state(path).to_objects()
+    root = tkinter.Tk()
+    canvas = tkinter.Canvas(root, width=solar_vis.window_width, height=solar_vis.window_height)
+    canvas.pack()
+    root.update()
+    solar_vis.calculate_scale_factor(
+        max((body.x ** 2 + body.y ** 2) ** 0.5 for body in space_objects) * 1.3 or 1)
+    for body in space_objects:
+        create = getattr(solar_vis, f"create_{body.type}_image")
+        create(canvas, body)
+    updater = CanvasUpdater(canvas)
+    updater.set_bodies(space_objects)
+    xs, ys = updater.positions()
+
+    def frame():
+        # Все тела смещаются, как при расчёте
+        xs[:] += 1 / solar_vis.view.scale
+        updater.update(xs, ys)
+        canvas.update_idletasks()
+    frame.close = root.destroy
+    return frame
+
+
+CASES = {
+    # имя: (функция подготовки, наибольшее число тел по умолчанию)
+    "calculate_force": (bench_calculate_force, 100000),
+    "recalculate_objects": (bench_recalculate_objects, 1000),
+    "recalculate_state": (bench_recalculate_state, 10000),
+    "read_objects": (bench_read_objects, 100000),
+    "read_state": (bench_read_state, 100000),
+    "write_objects": (bench_write_objects, 100000),
+    "write_state": (bench_write_state, 100000),
+    "canvas_update": (bench_canvas, 10000),
+}
+
+
+def _count_bodies(path):
+    return len(_state(path))
+
+
+class VirtualDisplay:
+    """Виртуальный экран Xvfb на время замеров холста.
+    Если экран уже есть (DISPLAY), он и используется; если нет ни экрана,
+    ни Xvfb, available остаётся False."""
+    def __init__(self):
+        self.process = None
+        self.available = bool(os.environ.get("DISPLAY"))
+        if self.available or not shutil.which("Xvfb"):
+            return
+        display = ":%d" % (90 + os.getpid() % 100)
+        self.process = subprocess.Popen(["Xvfb", display, "-screen", "0", "1600x1000x24"],
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        time.sleep(1.0)
+        if self.process.poll() is None:
+            os.environ["DISPLAY"] = display
+            self.available = True
+
+    def close(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+
+
+def run_benchmarks(cases=None, sizes=DEFAULT_SIZES, scenarios=SHIPPED_SCENARIOS,
+                   max_bodies=None, repeat=3, log=print):
+    """Выполняет замеры. Возвращает словарь для записи в JSON."""
+    cases = cases or list(CASES)
+    results = []
+    display = VirtualDisplay() if "canvas_update" in cases else None
+    with tempfile.TemporaryDirectory() as directory:
+        inputs = [(f"synthetic_{n}", synthetic_scenario(directory, n), n) for n in sizes]
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in scenarios:
+            path = os.path.join(here, name)
+            if os.path.exists(path):
+                inputs.append((name, path, _count_bodies(path)))
+
+        for case in cases:
+            setup, case_max = CASES[case]
+            limit = min(case_max, max_bodies) if max_bodies else case_max
+            for scenario, path, bodies in inputs:
+                record = {"case": case, "scenario": scenario, "bodies": bodies}
+                if bodies > limit:
+                    continue
+                if case == "canvas_update" and not display.available:
+                    record["skipped"] = "нет экрана X и Xvfb"
+                    results.append(record)
+                    log(f"{case:22s} {scenario:32s} {bodies:7d} тел  пропущено: {record['skipped']}")
+                    continue
+                function = setup(path, directory)
+                record["bodies"] = bodies = getattr(function, "bodies", bodies)
+                try:
+                    best, median, count = measure(function, repeat)
+                finally:
+                    getattr(function, "close", lambda: None)()
+                record.update(best_s=best, median_s=median, repeats=count,
+                              body_rate=bodies / best if best > 0 else None)
+                results.append(record)
+                log(f"{case:22s} {scenario:32s} {bodies:7d} тел  {best * 1000:10.3f} мс")
+    if display is not None:
+        display.close()
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD, min_difference=DEFAULT_MIN_DIFFERENCE):
+    """Сравнивает замеры с базовыми. Возвращает список
+    (case, scenario, базовое время, новое время, отношение, регрессия).
+    Регрессия — замедление больше threshold и не меньше min_difference секунд."""
+    old = {(r["case"], r["scenario"]): r for r in baseline["results"] if "best_s" in r}
+    rows = []
+    for record in current["results"]:
+        key = (record["case"], record["scenario"])
+        if "best_s" not in record or key not in old:
+            continue
+        before, after = old[key]["best_s"], record["best_s"]
+        ratio = after / before if before > 0 else float("inf")
+        rows.append((*key, before, after, ratio,
+                     ratio > 1 + threshold and after - before >= min_difference))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры производительности модели")
+    parser.add_argument("--output", default="bench.json", help="файл результатов JSON")
+    parser.add_argument("--baseline", help="базовый файл результатов для сравнения")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="допустимое замедление, доля (по умолчанию 0.2)")
+    parser.add_argument("--min-difference", type=float, default=DEFAULT_MIN_DIFFERENCE,
+                        help="наименьшее замедление-регрессия, с на вызов")
+    parser.add_argument("--cases", help="замеры через запятую: " + ", ".join(CASES))
+    parser.add_argument("--sizes", help="числа тел синтетических систем через запятую")
+    parser.add_argument("--max-bodies", type=int, help="наибольшее число тел для всех замеров")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    cases = args.cases.split(",") if args.cases else None
+    for case in cases or ():
+        if case not in CASES:
+            parser.error(f"неизвестный замер: {case}")
+    sizes = [int(n) for n in args.sizes.split(",")] if args.sizes else DEFAULT_SIZES
+
+    current = run_benchmarks(cases, sizes, max_bodies=args.max_bodies, repeat=args.repeat)
+    with open(args.output, 'w', encoding='utf-8') as output_file:
+        json.dump(current, output_file, indent=1, ensure_ascii=False)
+    print(f"Результаты записаны в {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as baseline_file:
+            rows = compare(current, json.load(baseline_file), args.threshold,
+                           args.min_difference)
+        regressions = [row for row in rows if row[5]]
+        for case, scenario, before, after, ratio, regressed in rows:
+            mark = "РЕГРЕССИЯ" if regressed else ""
+            print(f"{case:22s} {scenario:32s} {before * 1000:10.3f} -> {after * 1000:10.3f} мс "
+                  f"x{ratio:5.2f} {mark}")
+        if regressions:
+            print(f"Регрессий: {len(regressions)} (порог {args.threshold:.0%})")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
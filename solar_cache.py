@@ -0,0 +1,110 @@
+# coding: utf-8
+# license: GPLv3
+
+"""
+Дисковый кэш развёрнутых сценариев.
+Ключ записи — хэш содержимого файла сценария, версия генератора и зерно,
+поэтому повторная загрузка того же файла пропускает разбор и генерацию
+и даёт ту же самую систему.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import zipfile
+
+from solar_input import read_space_state_from_file, GENERATOR_VERSION
+from solar_state import load_state, save_state
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEED = 0
+"""Зерно, с которым сценарии загружаются из интерфейса"""
+
+cache_dir = os.environ.get(
+    "SOLAR_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "solar_system")
+)
+"""Каталог с записями кэша"""
+
+max_cache_bytes = 512 * 1024 * 1024
+"""Предельный суммарный размер кэша, байт"""
+
+
+def scenario_key(input_filename, seed):
+    """Ключ записи кэша для файла сценария и зерна."""
+    digest = hashlib.sha256()
+    with open(input_filename, 'rb') as input_file:
+        for chunk in iter(lambda: input_file.read(1 << 20), b''):
+            digest.update(chunk)
+    digest.update(f"|{GENERATOR_VERSION}|{seed}".encode())
+    return digest.hexdigest()
+
+
+def load_space_state(input_filename, seed=DEFAULT_SEED, progress=None):
+    """Возвращает развёрнутый сценарий, по возможности из кэша.
+    При seed=None генерация каждый раз новая и кэш не используется.
+    progress передаётся в read_space_state_from_file.
+    """
+    if seed is None:
+        return read_space_state_from_file(input_filename, progress=progress)
+
+    path = os.path.join(cache_dir, scenario_key(input_filename, seed) + ".npz")
+    try:
+        state = _read_entry(path)
+        os.utime(path)  # отметка последнего использования для вытеснения
+        return state
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        pass
+
+    state = read_space_state_from_file(input_filename, seed=seed, progress=progress)
+    try:
+        _write_entry(path, state)
+        evict(max_cache_bytes)
+    except OSError as e:
+        logger.warning("Не удалось сохранить сценарий в кэш: %s", e)
+    return state
+
+
+def load_space_objects(input_filename, seed=DEFAULT_SEED, progress=None):
+    """То же, что load_space_state, но возвращает список объектов."""
+    return load_space_state(input_filename, seed, progress).to_objects(progress)
+
+
+def evict(max_bytes):
+    """Удаляет давно не использованные записи, пока кэш больше max_bytes."""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".npz"):
+            continue
+        stat = os.stat(os.path.join(cache_dir, name))
+        entries.append((stat.st_mtime, stat.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(os.path.join(cache_dir, name))
+        total -= size
+
+
+def _read_entry(path):
+    return load_state(path)[0]
+
+
+def _write_entry(path, state):
+    # Запись во временный файл и переименование, чтобы параллельная загрузка
+    # никогда не увидела недописанную запись
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            save_state(tmp_file, state)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+if __name__ == "__main__":
+    print("This module is not for direct call!")
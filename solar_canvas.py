@@ -0,0 +1,342 @@
+# coding: utf-8
+# license: GPLv3
+
+"""
+Пакетное обновление элементов холста.
+Вместо трёх обращений к Tcl на каждое тело в кадре (winfo_width,
+winfo_height, coords) все тела проецируются одной векторной операцией,
+неподвижные на экране тела пропускаются, а остальные перемещаются
+одной командой Tcl.
+"""
+import time
+
+import numpy as np
+
+import solar_vis
+
+HIDDEN_COORDS = (-100, -100, -100, -100)
+"""Куда убираются тела за пределами холста (как в update_object_position)"""
+
+RESET_OPTIONS = dict(fill="", outline="black", width=1, dash="", tags="")
+"""Параметры овала по умолчанию: сбрасываются при повторном использовании"""
+
+
+def _tcl_value(value):
+    if isinstance(value, (tuple, list)):
+        return "{" + " ".join(map(str, value)) + "}"
+    value = str(value)
+    return value if value else "{}"
+
+
+def _tcl_options(options):
+    return " ".join(f"-{name} {_tcl_value(value)}" for name, value in options.items())
+
+
+class CanvasItemPool:
+    """Овалы холста, переиспользуемые между загрузками сценариев.
+
+    Вместо space.delete("all") и создания всех овалов заново release_all
+    скрывает занятые овалы и возвращает их в пул; create_oval и take берут
+    овалы из пула и создают новые, только когда пул пуст. Остальные методы
+    холста доступны через пул, поэтому его можно передавать в функции
+    solar_vis вместо холста.
+    """
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.free = []
+        self.used = []
+
+    def __getattr__(self, name):
+        return getattr(self.canvas, name)
+
+    def create_oval(self, *coords, **options):
+        return self.take([coords], [options])[0]
+
+    def take(self, coords, options):
+        """Выдаёт len(coords) овалов с заданными координатами и параметрами
+        (не больше двух обращений к Tcl на всю пачку)."""
+        path = self.canvas._w
+        reused = [self.free.pop() for _ in range(min(len(coords), len(self.free)))]
+        script = []
+        for item, item_coords, item_options in zip(reused, coords, options):
+            script.append(f"{path} coords {item} {' '.join(map(str, item_coords))}")
+            script.append(f"{path} itemconfigure {item} -state normal "
+                          f"{_tcl_options({**RESET_OPTIONS, **item_options})}")
+        if script:
+            self.canvas.tk.eval("\n".join(script))
+
+        created = []
+        if len(coords) > len(reused):
+            commands = " ".join(
+                f"[{path} create oval {' '.join(map(str, item_coords))} {_tcl_options(item_options)}]"
+                for item_coords, item_options in zip(coords[len(reused):], options[len(reused):]))
+            created = [int(item) for item in self.canvas.tk.splitlist(
+                self.canvas.tk.eval(f"list {commands}"))]
+        items = reused + created
+        self.used.extend(items)
+        return items
+
+    def release_all(self):
+        """Скрывает все выданные овалы и возвращает их в пул."""
+        if self.used:
+            path = self.canvas._w
+            self.canvas.tk.eval("\n".join(
+                f"{path} itemconfigure {item} -state hidden -tags {{}}" for item in self.used))
+            self.free.extend(self.used)
+            self.used = []
+
+
+class CanvasUpdater:
+    """Перемещает изображения тел на холсте пакетами.
+
+    Размер холста кэшируется и обновляется по событию <Configure>.
+    Если задан пул, изображения тел без изображения создаются из пула,
+    когда тело впервые попадает на холст.
+    """
+    def __init__(self, canvas, pool=None):
+        self.canvas = canvas
+        self.pool = pool
+        self.width = canvas.winfo_width()
+        self.height = canvas.winfo_height()
+        canvas.bind("<Configure>", self._on_configure, add="+")
+        self.items = np.zeros(0, dtype=np.int64)
+        self.radius = np.zeros(0, dtype=np.int64)
+        self.offset = np.zeros((0, 2), dtype=np.int64)
+        self.last = np.zeros((0, 4), dtype=np.int64)
+        self.bodies = []
+        self.index = np.zeros(0, dtype=np.int64)
+        self.visible = 0
+        """Число тел на холсте после последнего обновления"""
+
+    def _on_configure(self, event):
+        self.width = event.width
+        self.height = event.height
+        # Смена размера меняет видимость тел: все элементы считаются изменёнными
+        self.last[:] = np.iinfo(np.int64).min
+
+    def set_bodies(self, space_objects):
+        """Запоминает изображения и радиусы тел. Тела без изображения
+        пропускаются, если нет пула, из которого их можно создать."""
+        self.index = np.array([i for i, body in enumerate(space_objects)
+                               if body.image is not None or self.pool is not None],
+                              dtype=np.int64)
+        self.bodies = [space_objects[i] for i in self.index]
+        n = len(self.bodies)
+        self.items = np.fromiter((-1 if body.image is None else body.image for body in self.bodies),
+                                 np.int64, n)
+        self.radius = np.fromiter((int(body.R) for body in self.bodies), np.int64, n)
+        self.offset = np.array(
+            [getattr(body, 'image_offset', (0, 0)) if body.type == 'moon' else (0, 0)
+             for body in self.bodies], dtype=np.int64).reshape(n, 2)
+        self.last = np.full((n, 4), np.iinfo(np.int64).min, dtype=np.int64)
+
+    def positions(self):
+        """Физические координаты запомненных тел."""
+        n = len(self.bodies)
+        return (np.fromiter((body.x for body in self.bodies), float, n),
+                np.fromiter((body.y for body in self.bodies), float, n))
+
+    def update(self, xs=None, ys=None):
+        """Перемещает изображения тел. Возвращает число отправленных изменений.
+        xs, ys — координаты всех тел списка, переданного в set_bodies;
+        если они не заданы, координаты берутся из объектов тел."""
+        if xs is None:
+            xs, ys = self.positions()
+        else:
+            xs, ys = np.asarray(xs)[self.index], np.asarray(ys)[self.index]
+        x = solar_vis.scale_x_array(xs) + self.offset[:, 0]
+        y = solar_vis.scale_y_array(ys) + self.offset[:, 1]
+        r = self.radius
+        coords = np.column_stack((x - r, y - r, x + r, y + r))
+
+        outside = (x + r < 0) | (x - r > self.width) | (y + r < 0) | (y - r > self.height)
+        coords[outside] = HIDDEN_COORDS
+        self.visible = len(outside) - int(np.count_nonzero(outside))
+
+        if self.pool is not None:
+            self._create(np.flatnonzero((self.items < 0) & ~outside), coords)
+        changed = np.flatnonzero((coords != self.last).any(axis=1) & (self.items >= 0))
+        if not len(changed):
+            return 0
+        self.last[changed] = coords[changed]
+
+        path = self.canvas._w
+        script = "\n".join(
+            f"{path} coords {item} {x1} {y1} {x2} {y2}"
+            for item, (x1, y1, x2, y2) in zip(self.items[changed].tolist(),
+                                              coords[changed].tolist())
+        )
+        self.canvas.tk.eval(script)
+        return len(changed)
+
+    def _create(self, indices, coords):
+        """Создаёт изображения тел indices, впервые попавших на холст."""
+        if not len(indices):
+            return
+        options = [solar_vis.item_options(self.bodies[i]) for i in indices.tolist()]
+        items = self.pool.take([tuple(row) for row in coords[indices].tolist()], options)
+        for i, item in zip(indices.tolist(), items):
+            self.bodies[i].image = item
+        self.items[indices] = items
+        self.last[indices] = coords[indices]
+        # Порядок наложения как при полной отрисовке: планеты, спутники, звёзды
+        self.canvas.tag_raise("moon")
+        self.canvas.tag_raise("star")
+
+
+class ItemPool:
+    """Пул однотипных элементов холста: элементы создаются по мере надобности,
+    а лишние не удаляются, а скрываются до следующего кадра.
+    lower=True опускает новые элементы под остальные."""
+    def __init__(self, canvas, kind, lower=False, **options):
+        self.canvas = canvas
+        self.kind = kind
+        self.lower = lower
+        self.options = options
+        self.items = []
+        self.shown = 0
+
+    def acquire(self, count):
+        """Возвращает count элементов; остальные элементы пула будут скрыты."""
+        create = getattr(self.canvas, f"create_{self.kind}")
+        while len(self.items) < count:
+            item = create(*HIDDEN_COORDS, state="hidden", **self.options)
+            if self.lower:
+                self.canvas.tag_lower(item)
+            self.items.append(item)
+        return self.items[:count]
+
+    def hide_script(self, count):
+        """Команды Tcl, скрывающие элементы, показанные в прошлом кадре сверх count."""
+        path = self.canvas._w
+        script = [f"{path} itemconfigure {item} -state hidden"
+                  for item in self.items[count:self.shown]]
+        script += [f"{path} itemconfigure {item} -state normal"
+                   for item in self.items[self.shown:count]]
+        self.shown = count
+        return script
+
+    def clear(self):
+        for item in self.items:
+            self.canvas.delete(item)
+        self.items = []
+        self.shown = 0
+
+
+class LodRenderer:
+    """Отрисовка с отсечением по видимой области и уровнями детализации.
+
+    Видимые тела раскладываются по ячейкам экранной сетки (сортировка по
+    номеру ячейки служит пространственным индексом). Тела с радиусом не
+    меньше min_radius пикселов рисуются отдельными овалами, но не больше
+    per_cell на ячейку; остальные тела ячейки сливаются в один квадрат
+    с усреднённым цветом и яркостью, растущей с их числом. Число элементов
+    холста поэтому ограничено площадью экрана, а не числом тел.
+    """
+    def __init__(self, canvas, cell_size=8, min_radius=2, per_cell=2):
+        self.canvas = canvas
+        self.cell_size = cell_size
+        self.min_radius = min_radius
+        self.per_cell = per_cell
+        self.ovals = ItemPool(canvas, "oval", outline="", tags="lod")
+        # Ячейки плотности лежат под отдельными телами
+        self.cells = ItemPool(canvas, "rectangle", lower=True, outline="", tags="lod")
+        self.drawn = 0
+
+    def draw(self, xs, ys, bodies, radius_scale=1.0):
+        """Рисует кадр. bodies — RasterBodies с цветами и радиусами тел."""
+        width = max(1, self.canvas.winfo_width())
+        height = max(1, self.canvas.winfo_height())
+        px = solar_vis.scale_x_array(xs)
+        py = solar_vis.scale_y_array(ys)
+        radius = np.maximum(np.rint(bodies.radius * radius_scale), 1).astype(np.int64)
+
+        # Отсечение: оставляем тела, хотя бы частично попадающие на холст
+        visible = np.flatnonzero((px + radius >= 0) & (px - radius <= width) &
+                                 (py + radius >= 0) & (py - radius <= height))
+        columns = -(-width // self.cell_size)
+        cell = (np.clip(py[visible], 0, height - 1) // self.cell_size * columns +
+                np.clip(px[visible], 0, width - 1) // self.cell_size)
+
+        # Индекс: тела по ячейкам, внутри ячейки — от крупных к мелким
+        order = np.lexsort((-radius[visible], cell))
+        visible, cell = visible[order], cell[order]
+        starts = np.flatnonzero(np.r_[True, cell[1:] != cell[:-1]])
+        rank = np.arange(len(cell)) - np.repeat(starts, np.diff(np.r_[starts, len(cell)]))
+
+        single = (radius[visible] >= self.min_radius) & (rank < self.per_cell)
+        script = self._oval_script(visible[single], px, py, radius, bodies)
+        script += self._cell_script(visible[~single], cell[~single], columns, bodies)
+        self.canvas.tk.eval("\n".join(script))
+        self.drawn = self.ovals.shown + self.cells.shown
+        return self.drawn
+
+    def _oval_script(self, indices, px, py, radius, bodies):
+        path = self.canvas._w
+        items = self.ovals.acquire(len(indices))
+        r = radius[indices]
+        x, y = px[indices], py[indices]
+        script = self.ovals.hide_script(len(indices))
+        for item, x1, y1, x2, y2, color in zip(
+                items, (x - r).tolist(), (y - r).tolist(), (x + r).tolist(), (y + r).tolist(),
+                bodies.packed[indices].tolist()):
+            script.append(f"{path} coords {item} {x1} {y1} {x2} {y2}")
+            script.append(f"{path} itemconfigure {item} -fill #{color:06x}")
+        return script
+
+    def _cell_script(self, indices, cell, columns, bodies):
+        path = self.canvas._w
+        occupied, inverse, count = np.unique(cell, return_inverse=True, return_counts=True)
+        items = self.cells.acquire(len(occupied))
+        script = self.cells.hide_script(len(occupied))
+        if not len(occupied):
+            return script
+
+        rgb = np.zeros((len(occupied), 3))
+        for channel in range(3):
+            rgb[:, channel] = np.bincount(inverse, weights=bodies.rgb[indices, channel],
+                                          minlength=len(occupied))
+        brightness = 0.35 + 0.65 * np.log1p(count) / np.log1p(count.max())
+        rgb = (rgb / count[:, None] * brightness[:, None]).astype(np.int64)
+        packed = (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+
+        x1 = occupied % columns * self.cell_size
+        y1 = occupied // columns * self.cell_size
+        for item, left, top, color in zip(items, x1.tolist(), y1.tolist(), packed.tolist()):
+            script.append(f"{path} coords {item} {left} {top} "
+                          f"{left + self.cell_size} {top + self.cell_size}")
+            script.append(f"{path} itemconfigure {item} -fill #{color:06x}")
+        return script
+
+    def clear(self):
+        self.ovals.clear()
+        self.cells.clear()
+        self.drawn = 0
+
+
+def measure_update_cost(canvas, space_objects, step, frames=100):
+    """Среднее время обновления холста за кадр (мс): по одному телу через
+    update_object_position и пакетно через CanvasUpdater.
+    step() продвигает расчёт на один шаг между кадрами и в замер не входит.
+    Возвращает (по одному телу, пакетно)."""
+    def measure(update):
+        total = 0.0
+        for _ in range(frames):
+            step()
+            start = time.perf_counter()
+            update()
+            canvas.update_idletasks()
+            total += time.perf_counter() - start
+        return total / frames * 1000
+
+    def per_body():
+        for body in space_objects:
+            solar_vis.update_object_position(canvas, body)
+
+    updater = CanvasUpdater(canvas)
+    updater.set_bodies(space_objects)
+    return measure(per_body), measure(updater.update)
+
+
+if __name__ == "__main__":
+    print("This module is not for direct call!")
@@ -0,0 +1,145 @@
+# coding: utf-8
+# license: GPLv3
+
+"""
+Расчёт из командной строки, без экрана.
+Загружает сценарий (файл сценария или контрольную точку .npz), продвигает
+его на заданное число шагов или модельное время выбранным движком и
+методом интегрирования, записывает контрольные точки и конечное состояние
+и печатает производительность в тело-шагах в секунду.
+По ходу расчёта метрики (solar_metrics) записываются в журнал JSON и/или
+в текстовый файл Prometheus.
+Модуль не импортирует tkinter, поэтому работает на вычислительных узлах.
+
+Пример:
+    python solar_cli.py synthetic_scaling.txt --time 86400 --dt 60 \\
+        --engine numpy --integrator leapfrog --checkpoint-every 100 --output final.npz \\
+        --metrics-jsonl metrics.jsonl --metrics-prom /var/lib/node_exporter/solar.prom
+"""
+import argparse
+import logging
+import math
+import os
+import time
+
+from solar_engines import ENGINES, INTEGRATORS, create_engine
+from solar_metrics import ENERGY_INTERVAL, ENERGY_MAX_BODIES
+
+logger = logging.getLogger(__name__)
+
+
+def load_initial_state(input_filename, seed):
+    """Состояние и (модельное время, номер шага) для файла сценария
+    или контрольной точки .npz."""
+    if input_filename.endswith(".npz"):
+        from solar_state import load_state
+        state, meta = load_state(input_filename)
+        return state, meta.get("time", 0.0), int(meta.get("steps", 0))
+    from solar_cache import load_space_state
+    return load_space_state(input_filename, seed), 0.0, 0
+
+
+def save_final_state(output_filename, state, sim_time, steps):
+    """Записывает состояние в .npz (точно, с временем и шагом) или в
+    текстовый формат сценария по расширению имени файла."""
+    if output_filename.endswith(".npz"):
+        from solar_state import save_state
+        save_state(output_filename, state, time=sim_time, steps=steps)
+    else:
+        from solar_input import write_space_state_to_file
+        write_space_state_to_file(output_filename, state)
+
+
+def run_simulation(engine, dt, steps, sim_time=0.0, start_step=0,
+                   checkpoint_every=0, on_checkpoint=None, metrics=None):
+    """Делает steps шагов движка engine. Каждые checkpoint_every шагов
+    вызывает on_checkpoint(движок, модельное время, номер шага).
+    metrics — MetricsRecorder, которому передаются замеры и время записи
+    контрольных точек.
+    Возвращает (модельное время, номер шага, секунд расчёта без учёта
+    записи контрольных точек)."""
+    elapsed = 0.0
+    step = start_step
+    if metrics is not None:
+        metrics.sample(engine.to_state(), sim_time, step, elapsed)
+    for done in range(1, steps + 1):
+        start = time.perf_counter()
+        engine.step(dt)
+        elapsed += time.perf_counter() - start
+        step += 1
+        sim_time += dt
+        if checkpoint_every and on_checkpoint and done % checkpoint_every == 0:
+            start = time.perf_counter()
+            on_checkpoint(engine, sim_time, step)
+            if metrics is not None:
+                metrics.checkpoint(time.perf_counter() - start)
+        if metrics is not None and done == steps:
+            metrics.sample(engine.to_state(), sim_time, step, elapsed, energy=True)
+        elif metrics is not None and metrics.due():
+            metrics.sample(engine.to_state(), sim_time, step, elapsed)
+    return sim_time, step, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Расчёт системы без экрана")
+    parser.add_argument("scenario", help="файл сценария или контрольная точка .npz")
+    length = parser.add_mutually_exclusive_group(required=True)
+    length.add_argument("--steps", type=int, help="число шагов")
+    length.add_argument("--time", type=float, help="модельное время, с")
+    parser.add_argument("--dt", type=float, default=1.0, help="шаг по времени, с")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="numpy")
+    parser.add_argument("--integrator", choices=INTEGRATORS, default="euler")
+    parser.add_argument("--seed", type=int, default=0, help="зерно генерации сценария")
+    parser.add_argument("--checkpoint-every", type=int, default=0, metavar="N",
+                        help="записывать контрольную точку каждые N шагов")
+    parser.add_argument("--checkpoint-dir", default="checkpoints")
+    parser.add_argument("--output", help="конечное состояние (.npz или текстовый сценарий)")
+    parser.add_argument("--memmap-dir", help="каталог массивов движка memmap")
+    parser.add_argument("--metrics-jsonl", help="журнал метрик, строка JSON на замер")
+    parser.add_argument("--metrics-prom", help="текстовый файл метрик Prometheus")
+    parser.add_argument("--metrics-interval", type=float, default=5.0,
+                        help="период замера метрик, с")
+    parser.add_argument("--energy-interval", type=float, default=ENERGY_INTERVAL,
+                        help="период расчёта дрейфа энергии, с")
+    parser.add_argument("--energy-max-bodies", type=int, default=ENERGY_MAX_BODIES, metavar="N",
+                        help="не считать энергию (O(n²)) для систем больше N тел")
+    parser.add_argument("--log-level", default="INFO",
+                        choices=("DEBUG", "INFO", "WARNING", "ERROR"))
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level, format="%(levelname)s %(name)s: %(message)s")
+
+    steps = args.steps if args.steps is not None else math.ceil(args.time / args.dt)
+    state, sim_time, start_step = load_initial_state(args.scenario, args.seed)
+    options = {"directory": args.memmap_dir} if args.engine == "memmap" else {}
+    engine = create_engine(args.engine, state, args.integrator, **options)
+
+    def checkpoint(engine, checkpoint_time, step):
+        os.makedirs(args.checkpoint_dir, exist_ok=True)
+        path = os.path.join(args.checkpoint_dir, f"checkpoint_{step:08d}.npz")
+        save_final_state(path, engine.to_state(), checkpoint_time, step)
+        logger.info("Контрольная точка: %s", path)
+
+    metrics = None
+    if args.metrics_jsonl or args.metrics_prom:
+        from solar_metrics import MetricsRecorder
+        metrics = MetricsRecorder(args.metrics_jsonl, args.metrics_prom, args.metrics_interval,
+                                  labels={"engine": args.engine, "integrator": args.integrator},
+                                  energy_interval=args.energy_interval,
+                                  energy_max_bodies=args.energy_max_bodies)
+    try:
+        sim_time, step, elapsed = run_simulation(engine, args.dt, steps, sim_time, start_step,
+                                                 args.checkpoint_every, checkpoint, metrics)
+        if args.output:
+            save_final_state(args.output, engine.to_state(), sim_time, step)
+    finally:
+        if metrics is not None:
+            metrics.close()
+        engine.close()
+
+    body_steps = len(state) * steps / max(elapsed, 1E-9)
+    print(f"{len(state)} тел, {steps} шагов ({args.engine}, {args.integrator}) "
+          f"за {elapsed:.3f} с: {body_steps:.4g} тело-шагов/с, модельное время {sim_time:g} с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# coding: utf-8
+# license: GPLv3
+
+"""
+Реестр движков расчёта.
+Движок продвигает систему на шаг выбранным методом интегрирования:
+"python" — объекты CelestialBody и функции solar_model,
+"numpy" — массивы SpaceState в памяти,
+"memmap" — массивы MappedSpaceState в файлах на диске.
+Модуль не импортирует tkinter и может использоваться без экрана.
+NumPy и solar_state загружаются только при создании движка, которому
+они нужны, поэтому импорт реестра не замедляет запуск.
+"""
+import tempfile
+
+from solar_model import recalculate_space_objects_positions, leapfrog_space_objects_positions
+
+INTEGRATORS = ("euler", "leapfrog")
+"""Методы интегрирования: метод Эйлера как в solar_model и leapfrog"""
+
+
+class PythonEngine:
+    """Расчёт по объектам CelestialBody, как в интерфейсе."""
+    steps = {"euler": recalculate_space_objects_positions,
+             "leapfrog": leapfrog_space_objects_positions}
+
+    def __init__(self, state, integrator="euler"):
+        self.step_function = self.steps[integrator]
+        self.space_objects = state.to_objects()
+
+    def __len__(self):
+        return len(self.space_objects)
+
+    def step(self, dt):
+        self.step_function(self.space_objects, dt)
+
+    def to_state(self):
+        from solar_state import SpaceState
+        return SpaceState.from_objects(self.space_objects)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class NumpyEngine:
+    """Векторный расчёт по массивам SpaceState."""
+    def __init__(self, state, integrator="euler"):
+        from solar_state import recalculate_state_positions, leapfrog_state_positions
+        self.step_function = {"euler": recalculate_state_positions,
+                              "leapfrog": leapfrog_state_positions}[integrator]
+        self.state = state
+
+    def __len__(self):
+        return len(self.state)
+
+    def step(self, dt):
+        self.step_function(self.state, dt)
+
+    def to_state(self):
+        self.state.flush()
+        return self.state
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class MemmapEngine(NumpyEngine):
+    """Векторный расчёт по массивам в файлах каталога directory.
+    Если каталог не задан, движок создаёт временный каталог и удаляет его
+    вместе с массивами и рабочими файлами в close(); после close()
+    состояние движка читать нельзя."""
+    def __init__(self, state, integrator="euler", directory=None):
+        from solar_state import MappedSpaceState
+        self.temporary = None
+        if directory is None:
+            self.temporary = tempfile.TemporaryDirectory(prefix="solar_state_")
+            directory = self.temporary.name
+        super().__init__(MappedSpaceState.from_state(directory, state), integrator)
+
+    def close(self):
+        if self.temporary is not None:
+            self.temporary.cleanup()
+            self.temporary = None
+
+
+ENGINES = {"python": PythonEngine, "numpy": NumpyEngine, "memmap": MemmapEngine}
+
+
+def create_engine(name, state, integrator="euler", **options):
+    """Создаёт движок name для состояния state (SpaceState)."""
+    if name not in ENGINES:
+        raise ValueError(f"Неизвестный движок: {name}")
+    if integrator not in INTEGRATORS:
+        raise ValueError(f"Неизвестный метод интегрирования: {integrator}")
+    return ENGINES[name](state, integrator, **options)
+
+
+if __name__ == "__main__":
+    print("This module is not for direct call!")
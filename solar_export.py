@@ -0,0 +1,197 @@
+# coding: utf-8
+# license: GPLv3
+
+"""
+Вывод кадров без экрана для записи видео.
+Кадры растеризуются тем же кодом, что и растровый режим интерфейса
+(цвета solar_vis, проекция solar_vis.ViewTransform), и записываются
+в файлы PNG/PPM или передаются потоком RGB внешнему кодировщику
+(например, ffmpeg). Сжатие и запись выполняются в пуле потоков или
+процессов параллельно с расчётом. Модуль не импортирует tkinter.
+"""
+import argparse
+import os
+import queue
+import struct
+import subprocess
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+
+import solar_vis
+from solar_raster import RasterBodies, render_frame, to_ppm
+
+FRAME_FORMATS = ("png", "ppm")
+
+PNG_COMPRESSION = 1
+"""Уровень сжатия zlib для PNG: быстрое сжатие важнее размера файлов"""
+
+
+def to_png(frame, compression=PNG_COMPRESSION):
+    """Кадр (height, width, 3) uint8 -> данные PNG (RGB, 8 бит, без фильтров)."""
+    height, width = frame.shape[:2]
+    rows = np.zeros((height, width * 3 + 1), dtype=np.uint8)  # байт фильтра 0 в начале строки
+    rows[:, 1:] = frame.reshape(height, width * 3)
+
+    def chunk(kind, data):
+        return (struct.pack(">I", len(data)) + kind + data +
+                struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) +
+            chunk(b"IDAT", zlib.compress(rows.tobytes(), compression)) + chunk(b"IEND", b""))
+
+
+def _write_image(path, frame, frame_format):
+    data = to_png(frame) if frame_format == "png" else to_ppm(frame)
+    with open(path, 'wb') as output_file:
+        output_file.write(data)
+    return path
+
+
+class ImageSequenceSink:
+    """Записывает кадры в каталог файлами frame_000000.png и т.д.
+
+    Кадры кодируются в пуле из workers потоков (или процессов при
+    processes=True); одновременно в работе не больше max_pending кадров,
+    поэтому память ограничена, а расчёт ждёт, только если кодирование
+    не успевает.
+    """
+    def __init__(self, directory, frame_format="png", workers=None, processes=False,
+                 max_pending=None):
+        if frame_format not in FRAME_FORMATS:
+            raise ValueError(f"Неизвестный формат кадров: {frame_format}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.frame_format = frame_format
+        workers = workers or os.cpu_count() or 1
+        executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        self.pool = executor(max_workers=workers)
+        self.max_pending = max_pending or 2 * workers
+        self.pending = []
+        self.frames = 0
+
+    def write(self, frame):
+        while len(self.pending) >= self.max_pending:
+            self.pending.pop(0).result()
+        path = os.path.join(self.directory, f"frame_{self.frames:06d}.{self.frame_format}")
+        self.pending.append(self.pool.submit(_write_image, path, frame.copy(), self.frame_format))
+        self.frames += 1
+
+    def close(self):
+        for future in self.pending:
+            future.result()
+        self.pending = []
+        self.pool.shutdown()
+
+
+class PipeSink:
+    """Передаёт кадры сырым RGB (rgb24) на стандартный ввод внешней программы.
+    Запись в канал идёт в отдельном потоке через очередь из max_pending кадров."""
+    def __init__(self, command, max_pending=8):
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.frames = 0
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            data = self.queue.get()
+            if data is None:
+                break
+            try:
+                self.process.stdin.write(data)
+            except OSError as error:
+                self.error = error
+                break
+
+    def write(self, frame):
+        if self.error is not None:
+            raise self.error
+        self.queue.put(np.ascontiguousarray(frame).tobytes())
+        self.frames += 1
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.process.stdin.close()
+        self.process.wait()
+        if self.error is not None:
+            raise self.error
+
+
+def ffmpeg_command(output_filename, width, height, fps=30):
+    """Команда ffmpeg, кодирующая поток PipeSink в видеофайл."""
+    return ["ffmpeg", "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps),
+            "-i", "-", "-pix_fmt", "yuv420p", output_filename]
+
+
+def fit_view(xs, ys, width, height):
+    """Вид, в который помещается вся система (как calculate_scale_factor)."""
+    max_distance = float(np.sqrt(np.max(xs ** 2 + ys ** 2, initial=0.0))) * 1.3
+    view = solar_vis.ViewTransform(min(width, height) / max_distance if max_distance > 0 else 1.0)
+    view.origin_x, view.origin_y = float(width // 2), float(height // 2)
+    return view
+
+
+def export_frames(state, sink, frames, dt, steps_per_frame=1, width=solar_vis.window_width,
+                  height=solar_vis.window_height, density=False, view=None, progress=None):
+    """Рассчитывает state (solar_state.SpaceState) и отдаёт в sink каждый
+    steps_per_frame-й шаг, всего frames кадров. Возвращает кадров в секунду."""
+    from solar_state import recalculate_state_positions
+
+    bodies = RasterBodies.from_state(state)
+    view = view or fit_view(state.x, state.y, width, height)
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    start = time.perf_counter()
+    for number in range(frames):
+        if number:
+            for _ in range(steps_per_frame):
+                recalculate_state_positions(state, dt)
+        render_frame(state.x, state.y, bodies, width, height, density, out=frame, view=view)
+        sink.write(frame)
+        if progress:
+            progress((number + 1) / frames)
+    sink.close()
+    return frames / max(time.perf_counter() - start, 1E-9)
+
+
+def main(argv=None):
+    """Вывод кадров сценария из командной строки."""
+    from solar_cache import load_space_state, DEFAULT_SEED
+
+    parser = argparse.ArgumentParser(description="Вывод кадров моделирования без экрана")
+    parser.add_argument("scenario", help="файл сценария")
+    parser.add_argument("output", help="каталог кадров или видеофайл при --ffmpeg")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--dt", type=float, default=1.0)
+    parser.add_argument("--steps-per-frame", type=int, default=1)
+    parser.add_argument("--size", default=f"{solar_vis.window_width}x{solar_vis.window_height}")
+    parser.add_argument("--format", choices=FRAME_FORMATS, default="png")
+    parser.add_argument("--ffmpeg", action="store_true", help="кодировать видео через ffmpeg")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--processes", action="store_true", help="кодировать в пуле процессов")
+    parser.add_argument("--density", action="store_true")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args(argv)
+
+    width, height = (int(value) for value in args.size.lower().split("x"))
+    state = load_space_state(args.scenario, args.seed)
+    if args.ffmpeg:
+        sink = PipeSink(ffmpeg_command(args.output, width, height, args.fps))
+    else:
+        sink = ImageSequenceSink(args.output, args.format, args.workers, args.processes)
+    fps = export_frames(state, sink, args.frames, args.dt, args.steps_per_frame,
+                        width, height, args.density)
+    print(f"{args.frames} кадров, {fps:.1f} кадров/с ({len(state)} тел)")
+
+
+if __name__ == "__main__":
+    main()
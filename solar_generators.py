@@ -0,0 +1,273 @@
+# coding: utf-8
+# license: GPLv3
+
+"""
+Векторные генераторы систем для SpaceState.
+Директива $generate_planets и синтетические директивы ($exponential_disk,
+$plummer_sphere, $asteroid_belt, $binary_population) создают тела целыми
+массивами NumPy. Модуль загружается только при чтении сценария в SpaceState,
+поэтому разбор файлов в объекты CelestialBody не требует NumPy.
+"""
+import numpy as np
+
+from solar_input import PLANET_PALETTES, DEFAULT_PLANET_PALETTE, MOON_COLOR
+from solar_model import gravitational_constant
+from solar_state import KIND_STAR, KIND_PLANET, KIND_MOON
+
+
+def generate_planets_batch(state, star_index, count, min_r, max_r, orbit_num=None, seed=None):
+    """Векторный вариант generate_planets.
+    Планеты (и спутники) звезды state[star_index] создаются одним набором
+    массивов и дописываются прямо в состояние state.
+    seed — зерно генератора или готовый numpy.random.Generator.
+    Возвращает срез индексов созданных планет.
+    """
+    rng = np.random.default_rng(seed)
+    star_color = str(state.color[star_index]).lower().strip()
+    star_x, star_y = state.x[star_index], state.y[star_index]
+    star_vx, star_vy = state.Vx[star_index], state.Vy[star_index]
+
+    i = np.arange(count)
+    radius = 8 + i % 5
+    palette = np.array(PLANET_PALETTES.get(star_color, DEFAULT_PLANET_PALETTE))
+    color = palette[rng.integers(len(palette), size=count)]
+    mass = rng.uniform(1E24, 1E26, size=count)
+
+    # Позиционирование планет
+    angle = 2 * np.pi * i / count
+    distance = rng.uniform(min_r, max_r, size=count)
+    cos_a, sin_a = np.cos(angle), np.sin(angle)
+    x = star_x + distance * cos_a
+    y = star_y + distance * sin_a
+
+    # Орбитальная скорость планет
+    orbital_speed = np.sqrt(gravitational_constant * state.m[star_index] / distance) * 0.8
+    vx = star_vx - orbital_speed * sin_a
+    vy = star_vy + orbital_speed * cos_a
+
+    planets = state.add_bodies(KIND_PLANET, mass, x, y, vx, vy, radius, color)
+
+    # Спутники только для нужных звезд и четных орбит
+    is_even_orbit = (orbit_num % 2 == 0) if orbit_num is not None else False
+    if star_color in ('red', 'yellow') and is_even_orbit:
+        moon_angle = rng.random(count) * 2 * np.pi
+        moon_distance = radius * 20
+        cos_m, sin_m = np.cos(moon_angle), np.sin(moon_angle)
+        moon_speed = np.sqrt(gravitational_constant * mass / moon_distance)
+        state.add_bodies(
+            KIND_MOON, mass * 0.01,
+            x + moon_distance * cos_m, y + moon_distance * sin_m,
+            vx - moon_speed * sin_m, vy + moon_speed * cos_m,
+            np.maximum(3, (radius * 0.3).astype(int)), MOON_COLOR,
+            parent=np.arange(planets.start, planets.stop)
+        )
+
+    return planets
+
+
+def parse_directive_parameters(parts):
+    """Разбирает параметры директивы вида key=value в словарь строк."""
+    params = {}
+    for part in parts:
+        key, sep, value = part.partition('=')
+        if not sep or not key or not value:
+            raise ValueError(f"Ожидался параметр вида key=value, получено '{part}'")
+        params[key.lower()] = value
+    return params
+
+
+def find_star(state, color):
+    """Индекс первой звезды цвета color (без учёта регистра) или None."""
+    stars = np.flatnonzero((state.kind == KIND_STAR) &
+                           (np.char.lower(state.color) == color.lower()))
+    return stars[0] if len(stars) else None
+
+
+def _directive_center(state, params):
+    """Центр генерации: звезда заданного цвета (star=<цвет>) или явные
+    x, y, vx, vy и mass. Возвращает (x, y, Vx, Vy, масса центра)."""
+    if 'star' in params:
+        target_color = params.pop('star').lower()
+        i = find_star(state, target_color)
+        if i is None:
+            raise ValueError(f"Ошибка: звезда цвета '{target_color}' не найдена")
+        return state.x[i], state.y[i], state.Vx[i], state.Vy[i], state.m[i]
+    return (float(params.pop('x', 0)), float(params.pop('y', 0)),
+            float(params.pop('vx', 0)), float(params.pop('vy', 0)),
+            float(params.pop('mass', 0)))
+
+
+def _solve_kepler(mean_anomaly, e, iterations=8):
+    """Решает уравнение Кеплера E - e sin E = M методом Ньютона."""
+    E = np.where(e < 0.8, mean_anomaly, np.pi)
+    for _ in range(iterations):
+        E -= (E - e * np.sin(E) - mean_anomaly) / (1 - e * np.cos(E))
+    return E
+
+
+def _plummer_speed_fraction(rng, count):
+    """Доля скорости убегания для сферы Пламмера (выборка с отклонением)."""
+    q = np.empty(count)
+    pending = np.arange(count)
+    while len(pending):
+        trial = rng.random(len(pending))
+        accept = rng.random(len(pending)) * 0.1 < trial ** 2 * (1 - trial ** 2) ** 3.5
+        q[pending[accept]] = trial[accept]
+        pending = pending[~accept]
+    return q
+
+
+def _isotropic(rng, count, length):
+    """Векторы заданной длины со случайным направлением в пространстве."""
+    cos_theta = rng.uniform(-1, 1, count)
+    sin_theta = np.sqrt(1 - cos_theta ** 2)
+    phi = rng.uniform(0, 2 * np.pi, count)
+    return length * sin_theta * np.cos(phi), length * sin_theta * np.sin(phi), length * cos_theta
+
+
+def generate_exponential_disk(rng, n, scale, r_min=0, r_max=None, m=1E20,
+                              sigma=0.0, cx=0, cy=0, cvx=0, cvy=0, center_mass=0):
+    """Экспоненциальный диск: поверхностная плотность ~ exp(-r / scale).
+    Скорости круговые вокруг центральной массы с относительным разбросом sigma."""
+    r_max = 10 * scale if r_max is None else r_max
+    r = np.empty(n)
+    pending = np.arange(n)
+    while len(pending):
+        # Радиус при плотности exp(-r/h) распределён по гамма-закону с k=2
+        trial = rng.gamma(2.0, scale, len(pending))
+        accept = (trial >= r_min) & (trial <= r_max)
+        r[pending[accept]] = trial[accept]
+        pending = pending[~accept]
+
+    angle = rng.uniform(0, 2 * np.pi, n)
+    cos_a, sin_a = np.cos(angle), np.sin(angle)
+    speed = np.sqrt(gravitational_constant * center_mass / np.maximum(r, 1E-10))
+    speed *= 1 + sigma * rng.standard_normal(n)
+    return (np.full(n, m), cx + r * cos_a, cy + r * sin_a,
+            cvx - speed * sin_a, cvy + speed * cos_a)
+
+
+def generate_plummer_sphere(rng, n, a, total_mass, r_cut=10.0,
+                            cx=0, cy=0, cvx=0, cvy=0, center_mass=0):
+    """Сфера Пламмера с радиусом ядра a и полной массой total_mass,
+    спроецированная на плоскость xy."""
+    r = np.empty(n)
+    pending = np.arange(n)
+    while len(pending):
+        trial = a / np.sqrt(rng.random(len(pending)) ** (-2 / 3) - 1)
+        accept = trial <= r_cut * a
+        r[pending[accept]] = trial[accept]
+        pending = pending[~accept]
+
+    x, y, _ = _isotropic(rng, n, r)
+    escape = np.sqrt(2 * gravitational_constant * total_mass / np.sqrt(r ** 2 + a ** 2))
+    vx, vy, _ = _isotropic(rng, n, escape * _plummer_speed_fraction(rng, n))
+    return np.full(n, total_mass / n), cx + x, cy + y, cvx + vx, cvy + vy
+
+
+def generate_asteroid_belt(rng, n, a_min, a_max, e_max=0.1, i_max=10.0, m=1E15,
+                           cx=0, cy=0, cvx=0, cvy=0, center_mass=0):
+    """Пояс астероидов: кеплеровы орбиты вокруг центра с большой полуосью
+    в [a_min, a_max], эксцентриситетом до e_max и наклоном до i_max градусов."""
+    a = rng.uniform(a_min, a_max, n)
+    e = rng.uniform(0, e_max, n)
+    incl = np.radians(rng.uniform(0, i_max, n))
+    node, periapsis, mean_anomaly = rng.uniform(0, 2 * np.pi, (3, n))
+
+    E = _solve_kepler(mean_anomaly, e)
+    mu = gravitational_constant * center_mass
+    # Положение и скорость в плоскости орбиты
+    px = a * (np.cos(E) - e)
+    py = a * np.sqrt(1 - e ** 2) * np.sin(E)
+    factor = np.sqrt(mu * a) / (a * (1 - e * np.cos(E)))
+    pvx = -factor * np.sin(E)
+    pvy = factor * np.sqrt(1 - e ** 2) * np.cos(E)
+
+    # Поворот на аргумент перицентра, наклон и долготу узла; берём проекцию на xy
+    cos_w, sin_w = np.cos(periapsis), np.sin(periapsis)
+    cos_o, sin_o = np.cos(node), np.sin(node)
+    cos_i = np.cos(incl)
+
+    def project(u, v):
+        ox = u * cos_w - v * sin_w
+        oy = (u * sin_w + v * cos_w) * cos_i
+        return ox * cos_o - oy * sin_o, ox * sin_o + oy * cos_o
+
+    x, y = project(px, py)
+    vx, vy = project(pvx, pvy)
+    return np.full(n, m), cx + x, cy + y, cvx + vx, cvy + vy
+
+
+def generate_binary_population(rng, n, r_min, r_max, sep_min, sep_max,
+                               m_min=1E29, m_max=1E30,
+                               cx=0, cy=0, cvx=0, cvy=0, center_mass=0):
+    """n двойных систем: центры масс пар равномерно по площади кольца
+    [r_min, r_max] на круговых орбитах вокруг центра, компоненты на
+    круговой взаимной орбите с логарифмически равномерным разделением."""
+    r = np.sqrt(rng.uniform(r_min ** 2, r_max ** 2, n))
+    angle = rng.uniform(0, 2 * np.pi, n)
+    com_x, com_y = cx + r * np.cos(angle), cy + r * np.sin(angle)
+    com_speed = np.sqrt(gravitational_constant * center_mass / np.maximum(r, 1E-10))
+    com_vx = cvx - com_speed * np.sin(angle)
+    com_vy = cvy + com_speed * np.cos(angle)
+
+    m1 = rng.uniform(m_min, m_max, n)
+    m2 = rng.uniform(m_min, m_max, n)
+    total = m1 + m2
+    separation = np.exp(rng.uniform(np.log(sep_min), np.log(sep_max), n))
+    phase = rng.uniform(0, 2 * np.pi, n)
+    ux, uy = np.cos(phase), np.sin(phase)
+    relative_speed = np.sqrt(gravitational_constant * total / separation)
+
+    # Компоненты пары идут в массивах подряд: 2k и 2k+1
+    def interleave(first, second):
+        return np.column_stack((first, second)).ravel()
+
+    return (interleave(m1, m2),
+            interleave(com_x + separation * m2 / total * ux, com_x - separation * m1 / total * ux),
+            interleave(com_y + separation * m2 / total * uy, com_y - separation * m1 / total * uy),
+            interleave(com_vx - relative_speed * m2 / total * uy, com_vx + relative_speed * m1 / total * uy),
+            interleave(com_vy + relative_speed * m2 / total * ux, com_vy - relative_speed * m1 / total * ux))
+
+
+SYNTHETIC_DIRECTIVES = {
+    '$exponential_disk': (generate_exponential_disk, KIND_PLANET, "#AAAAAA", 2),
+    '$plummer_sphere': (generate_plummer_sphere, KIND_PLANET, "#AAAAFF", 2),
+    '$asteroid_belt': (generate_asteroid_belt, KIND_PLANET, "#888888", 1),
+    '$binary_population': (generate_binary_population, KIND_STAR, "white", 3),
+}
+"""Синтетические директивы: генератор, тип тел, цвет и радиус по умолчанию"""
+
+
+def apply_synthetic_directive(state, directive, parts, rng):
+    """Выполняет синтетическую директиву и дописывает тела в state.
+
+    Параметры задаются в строке как key=value, например:
+    $asteroid_belt star=yellow n=100000 a_min=2500 a_max=3500 e_max=0.2 seed=7
+
+    Общие параметры всех директив: n, seed, R, color, kind (star/planet),
+    star (цвет центральной звезды) либо x, y, vx, vy, mass.
+    Возвращает срез индексов созданных тел.
+    """
+    generator, kind, color, radius = SYNTHETIC_DIRECTIVES[directive]
+    params = parse_directive_parameters(parts)
+    if 'seed' in params:
+        rng = np.random.default_rng(int(params.pop('seed')))
+    color = params.pop('color', color)
+    radius = float(params.pop('r', radius))
+    if 'kind' in params:
+        kind = ('star', 'planet').index(params.pop('kind').lower())
+    cx, cy, cvx, cvy, center_mass = _directive_center(state, params)
+
+    try:
+        kwargs = {key: float(value) for key, value in params.items()}
+        kwargs['n'] = int(kwargs['n'])
+        m, x, y, vx, vy = generator(rng, cx=cx, cy=cy, cvx=cvx, cvy=cvy,
+                                    center_mass=center_mass, **kwargs)
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Неверные параметры директивы {directive}: {e}")
+    return state.add_bodies(kind, m, x, y, vx, vy, radius, color)
+
+
+if __name__ == "__main__":
+    print("This module is not for direct call!")
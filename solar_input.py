@@ -1,6 +1,13 @@
 # coding: utf-8
 # license: GPLv3
 
+"""
+Чтение и запись файлов сценариев.
+Модуль не импортирует NumPy: разбор в объекты CelestialBody работает на
+чистом Python, а чтение в SpaceState загружает solar_state и векторные
+генераторы solar_generators только при вызове.
+"""
+import logging
 import math
 import random
 from solar_objects import Star, Planet, Moon
@@ -8,88 +15,323 @@ from solar_model import gravitational_constant
 
 from random import choice
 
+logger = logging.getLogger(__name__)
+
+# Яркие, но гармоничные цвета для планет
+PLANET_PALETTES = {
+    "red": (
+        "#FF6B6B", "#FF8E8E", "#FFAAAA", "#FFC3C3",
+        "#FF5252", "#FF7B7B", "#FF9E9E", "#FFD1D1"
+    ),
+    "blue": (
+        "#6B8CFF", "#8EA7FF", "#AABDFF", "#C3D2FF",
+        "#5282FF", "#7B9BFF", "#9EB4FF", "#D1DEFF"
+    ),
+    "yellow": (
+        "#FFE46B", "#FFE88E", "#FFEBAA", "#FFF0C3",
+        "#FFDD52", "#FFE37B", "#FFE89E", "#FFF2D1"
+    ),
+    "green": (
+        "#6BFF6B", "#8EFF8E", "#AAFFAA", "#C3FFC3",
+        "#52FF52", "#7BFF7B", "#9EFF9E", "#D1FFD1"
+    )
+}
+
+# Если цвет звезды неизвестен - золотой по умолчанию
+DEFAULT_PLANET_PALETTE = ("#FFD700",)
+
+MOON_COLOR = "#FF00FF"
+
+GENERATOR_VERSION = 3
+"""Версия генераторов. Увеличивается при любом изменении результата генерации,
+чтобы кэш сценариев не выдавал устаревшие системы."""
+
+PARENT_SEARCH_RADII = 5
+"""Спутник относится к планете, если он ближе этого числа её радиусов."""
+
 def read_space_objects_data_from_file(input_filename):
     """
     Читает данные о космических объектах из файла.
     Возвращает список объектов системы в правильном порядке:
     [звезды, планеты, спутники]
+    Ошибки в строках файла, как и в read_space_state_from_file,
+    вызывают ValueError.
     """
     objects = []
+    line_bodies = []  # Тела строк Star/Planet/Moon: на них ссылаются строки Moon
+    loose_moons = []
     star_index = 0  # Индекс текущей звезды (0-3)
-
-    try:
-        with open(input_filename, 'r', encoding='utf-8') as input_file:
-            for line in input_file:
-                line = line.strip()
-                if not line or line.startswith('#'):
-                    continue
-
-                if line.startswith('Star'):
-                    # Обработка звезды
-                    star = Star()
-                    parse_star_parameters(line, star)
-                    objects.append(star)
-                    star_index += 1
-                    orbit_counter = 0  # Счетчик орбит для текущей звезды
-
-                elif line.startswith('$generate_planets'):
-                    # Генерация планет для текущей звезды
-                    parts = line.split()
-                    if len(parts) < 8:
-                        print(f"Ошибка формата строки: {line}")
-                        continue
-
-                    try:
-                        # Находим звезду по цвету
-                        target_color = parts[1].lower()
-                        parent_star = next(
-                            obj for obj in objects
-                            if obj.type == 'star' and obj.color.lower() == target_color
-                        )
-
-                        # Генерируем планеты для этой звезды
-                        planets = generate_planets(
-                            parent_star=parent_star,
-                            count=int(parts[2]),
-                            min_r=float(parts[6]),
-                            max_r=float(parts[7]),
-                            star_index=star_index - 1,  # Текущий индекс звезды
-                            orbit_num=orbit_counter
-                        )
-                        objects.extend(planets)
-                        orbit_counter += 1
-
-                    except StopIteration:
-                        print(f"Ошибка: звезда цвета '{parts[1]}' не найдена")
-                    except ValueError as e:
-                        print(f"Ошибка обработки строки '{line}': {e}")
-
-        # После загрузки всех данных добавляем спутники в общий список
-        all_moons = []
-        for planet in [obj for obj in objects if obj.type == 'planet']:
-            if hasattr(planet, 'moons') and planet.moons:
-                all_moons.extend(planet.moons)
-
-        objects.extend(all_moons)
-        return objects
-
-    except FileNotFoundError:
-        print(f"Файл не найден: {input_filename}")
-        return []
-    except Exception as e:
-        print(f"Критическая ошибка при чтении файла: {e}")
+    orbit_counter = 0
+
+    with open(input_filename, 'r', encoding='utf-8') as input_file:
+        for line in input_file:
+            parts = _line_fields(line)
+            if not parts:
+                continue
+            line = ' '.join(parts)
+            object_type = parts[0].lower()
+
+            if object_type == 'star':
+                # Обработка звезды
+                star = Star()
+                parse_star_parameters(line, star)
+                objects.append(star)
+                line_bodies.append(star)
+                star_index += 1
+                orbit_counter = 0  # Счетчик орбит для текущей звезды
+
+            elif object_type == 'planet':
+                planet = Planet()
+                parse_planet_parameters(line, planet)
+                objects.append(planet)
+                line_bodies.append(planet)
+
+            elif object_type == 'moon':
+                # Родитель назначается после чтения всех планет
+                moon = Moon()
+                parent_line = parse_moon_parameters(line, moon)
+                line_bodies.append(moon)
+                loose_moons.append((moon, parent_line))
+
+            elif object_type == '$generate_planets':
+                # Генерация планет для текущей звезды
+                if len(parts) < 8:
+                    raise ValueError(f"Ошибка формата строки: {line}")
+
+                # Находим звезду по цвету
+                target_color = parts[1].lower()
+                parent_star = next(
+                    (obj for obj in objects
+                     if obj.type == 'star' and obj.color.lower() == target_color),
+                    None
+                )
+                if parent_star is None:
+                    raise ValueError(f"Ошибка: звезда цвета '{parts[1]}' не найдена")
+
+                # Генерируем планеты для этой звезды
+                planets = generate_planets(
+                    parent_star=parent_star,
+                    count=int(parts[2]),
+                    min_r=float(parts[6]),
+                    max_r=float(parts[7]),
+                    star_index=star_index - 1,  # Текущий индекс звезды
+                    orbit_num=orbit_counter
+                )
+                objects.extend(planets)
+                orbit_counter += 1
+
+            else:
+                logger.warning("Unknown space object: %s", object_type)
+
+    if loose_moons:
+        unnamed = []
+        for moon, parent_line in loose_moons:
+            if parent_line is None:
+                unnamed.append(moon)
+            elif (0 <= parent_line < len(line_bodies)
+                    and line_bodies[parent_line].type == 'planet'):
+                line_bodies[parent_line].add_moon(moon)
+            else:
+                logger.warning("Строка %d не планета: родитель спутника ищется по расстоянию",
+                               parent_line)
+                unnamed.append(moon)
+        if unnamed:
+            assign_parent_planets(unnamed, objects)
+
+    # После загрузки всех данных добавляем спутники в общий список
+    all_moons = []
+    for planet in [obj for obj in objects if obj.type == 'planet']:
+        if hasattr(planet, 'moons') and planet.moons:
+            all_moons.extend(planet.moons)
+
+    objects.extend(all_moons)
+    return objects
+
+
+def _line_fields(line):
+    """Поля строки файла сценария без комментария. Комментарий — строка,
+    начинающаяся с '#', или конец строки после отдельного символа '#';
+    цвет вида #FF6B6B остаётся частью данных. Для пустой строки и
+    строки-комментария возвращает пустой список."""
+    if line.lstrip().startswith('#'):
         return []
+    parts = line.split()
+    if '#' in parts:
+        parts = parts[:parts.index('#')]
+    return parts
+
+def read_space_state_from_file(input_filename, seed=None, progress=None):
+    """
+    Читает данные о космических объектах из файла в состояние SpaceState.
+    Директивы генерации выполняются векторно, поэтому файл из нескольких
+    строк может описывать миллионы тел. При одинаковом seed результат
+    полностью воспроизводится.
+    progress(доля) вызывается после каждой строки файла.
+    """
+    import numpy as np
+    from solar_state import SpaceState, KIND_STAR, KIND_PLANET, KIND_MOON
+    from solar_spatial import find_parents
+    from solar_generators import (SYNTHETIC_DIRECTIVES, apply_synthetic_directive,
+                                  find_star, generate_planets_batch)
+
+    state = SpaceState()
+    rng = np.random.default_rng(seed)
+    orbit_counter = 0
+    line_rows = []  # Номера в state тел строк Star/Planet/Moon
+    loose_moons = []
+
+    with open(input_filename, 'r', encoding='utf-8') as input_file:
+        lines = input_file.readlines()
+
+    for line_number, line in enumerate(lines, 1):
+        if progress:
+            progress(line_number / len(lines))
+        parts = _line_fields(line)
+        if not parts:
+            continue
+        line = ' '.join(parts)
+        object_type = parts[0].lower()
+        if object_type == 'star':
+            star = Star()
+            parse_star_parameters(line, star)
+            state.add_bodies(KIND_STAR, star.m, star.x, star.y, star.Vx, star.Vy,
+                             star.R, star.color)
+            line_rows.append(len(state) - 1)
+            orbit_counter = 0  # Счетчик орбит для текущей звезды
+
+        elif object_type == 'planet':
+            planet = Planet()
+            parse_planet_parameters(line, planet)
+            state.add_bodies(KIND_PLANET, planet.m, planet.x, planet.y,
+                             planet.Vx, planet.Vy, planet.R, planet.color)
+            line_rows.append(len(state) - 1)
+
+        elif object_type == 'moon':
+            # Родитель назначается после чтения всех планет
+            moon = Moon()
+            parent_line = parse_moon_parameters(line, moon)
+            state.add_bodies(KIND_MOON, moon.m, moon.x, moon.y, moon.Vx, moon.Vy,
+                             moon.R, moon.color)
+            line_rows.append(len(state) - 1)
+            loose_moons.append((len(state) - 1, -1 if parent_line is None else parent_line))
+
+        elif object_type == '$generate_planets':
+            if len(parts) < 8:
+                raise ValueError(f"Ошибка формата строки: {line}")
+
+            star_index = find_star(state, parts[1])
+            if star_index is None:
+                raise ValueError(f"Ошибка: звезда цвета '{parts[1]}' не найдена")
+
+            generate_planets_batch(
+                state, star_index,
+                count=int(parts[2]),
+                min_r=float(parts[6]),
+                max_r=float(parts[7]),
+                orbit_num=orbit_counter,
+                seed=rng
+            )
+            orbit_counter += 1
+
+        elif object_type in SYNTHETIC_DIRECTIVES:
+            apply_synthetic_directive(state, object_type, parts[1:], rng)
+
+        else:
+            logger.warning("Unknown space object: %s", object_type)
+
+    if loose_moons:
+        moons, parent_line = (np.array(column, dtype=np.int64) for column in zip(*loose_moons))
+        # Родитель, указанный в строке, должен быть планетой
+        rows = np.array(line_rows, dtype=np.int64)
+        named = (parent_line >= 0) & (parent_line < len(rows))
+        parent = np.full(len(moons), -1, dtype=np.int64)
+        parent[named] = rows[parent_line[named]]
+        named[named] = state.kind[parent[named]] == KIND_PLANET
+        parent[~named] = -1
+        if np.count_nonzero(parent_line >= 0) > np.count_nonzero(named):
+            logger.warning("Родители спутников не планеты: %d, ищутся по расстоянию",
+                           np.count_nonzero(parent_line >= 0) - np.count_nonzero(named))
+
+        unnamed = np.flatnonzero(~named)
+        planets = np.flatnonzero(state.kind == KIND_PLANET)
+        nearest, matches = find_parents(state.x[moons[unnamed]], state.y[moons[unnamed]],
+                                        state.x[planets], state.y[planets],
+                                        state.R[planets] * PARENT_SEARCH_RADII)
+        found = _report_parents(matches)
+        parent[unnamed[found]] = planets[nearest[found]]
+        state.parent[moons] = parent
+        if np.any(parent < 0):
+            _drop_bodies(state, moons[parent < 0])
+
+    return state
+
+
+def _drop_bodies(state, indices):
+    """Удаляет тела indices из состояния, сохраняя ссылки parent остальных."""
+    import numpy as np
+    from solar_state import STATE_FIELDS
+
+    keep = np.ones(len(state), dtype=bool)
+    keep[indices] = False
+    new_index = np.cumsum(keep) - 1
+    for name in STATE_FIELDS:
+        setattr(state, name, getattr(state, name)[keep])
+    moons = state.parent >= 0
+    state.parent[moons] = new_index[state.parent[moons]]
+
 
 def find_parent_planet(moon, space_objects):
     """Находит планету-родителя для спутника"""
     for obj in space_objects:
         if obj.type == 'planet':
             distance = ((moon.x - obj.x)**2 + (moon.y - obj.y)**2)**0.5
-            if distance < obj.R * 5:  # Если спутник близко к планете
+            if distance < obj.R * PARENT_SEARCH_RADII:  # Если спутник близко к планете
                 return obj
     return None
 
 
+def assign_parent_planets(moons, space_objects):
+    """Назначает родителей всем спутникам moons сразу: то же правило, что и
+    find_parent_planet, но планеты раскладываются по сетке solar_spatial,
+    а не перебираются для каждого спутника.
+    Спутники без планеты поблизости пропускаются. Возвращает список
+    спутников, получивших родителя."""
+    import numpy as np
+    from solar_spatial import find_parents
+
+    planets = [obj for obj in space_objects if obj.type == 'planet']
+    parent, matches = find_parents(
+        np.fromiter((moon.x for moon in moons), float, len(moons)),
+        np.fromiter((moon.y for moon in moons), float, len(moons)),
+        np.fromiter((planet.x for planet in planets), float, len(planets)),
+        np.fromiter((planet.y for planet in planets), float, len(planets)),
+        np.fromiter((planet.R * PARENT_SEARCH_RADII for planet in planets), float, len(planets)))
+    assigned = []
+    for i in _report_parents(matches).tolist():
+        planets[parent[i]].add_moon(moons[i])
+        assigned.append(moons[i])
+    return assigned
+
+
+def _report_parents(matches):
+    """Сообщает о спутниках без родителя и с несколькими подходящими
+    планетами. Возвращает номера спутников, у которых родитель найден."""
+    import numpy as np
+
+    orphans = np.flatnonzero(matches == 0)
+    ambiguous = np.flatnonzero(matches > 1)
+    if len(orphans):
+        logger.warning("Спутники без планеты ближе %d радиусов пропущены: %d "
+                       "(номера среди спутников без указанного родителя: %s)",
+                       PARENT_SEARCH_RADII, len(orphans), orphans[:5].tolist())
+    if len(ambiguous):
+        logger.warning("Спутники рядом с несколькими планетами: %d "
+                       "(номера среди спутников без указанного родителя: %s); "
+                       "выбрана первая по порядку планета",
+                       len(ambiguous), ambiguous[:5].tolist())
+    return np.flatnonzero(matches > 0)
+
+
 def generate_planets(parent_star, count, min_r, max_r, star_index=None, orbit_num=None):
     """Генерирует планеты для звезды с возможными спутниками"""
     planets = []
@@ -119,7 +361,7 @@ def generate_planets(parent_star, count, min_r, max_r, star_index=None, orbit_nu
         if create_moons:
             moon = Moon(parent_planet=planet)
             moon.R = max(3, int(planet.R * 0.3))  # Размер спутника
-            moon.color = "#FF00FF"  # Серый цвет спутника
+            moon.color = MOON_COLOR  # Цвет спутника
             moon.m = planet.m * 0.01  # Масса спутника (1% от массы планеты)
 
             # Позиция спутника на орбите вокруг планеты
@@ -143,36 +385,8 @@ def generate_planets(parent_star, count, min_r, max_r, star_index=None, orbit_nu
 
 
 def get_planet_color(star_color):
-    star_color = star_color.lower().strip()
-
-    # Яркие, но гармоничные цвета для планет
-    color_palettes = {
-        "red": [
-            "#FF6B6B", "#FF8E8E", "#FFAAAA", "#FFC3C3",
-            "#FF5252", "#FF7B7B", "#FF9E9E", "#FFD1D1"
-        ],
-        "blue": [
-            "#6B8CFF", "#8EA7FF", "#AABDFF", "#C3D2FF",
-            "#5282FF", "#7B9BFF", "#9EB4FF", "#D1DEFF"
-        ],
-        "yellow": [
-            "#FFE46B", "#FFE88E", "#FFEBAA", "#FFF0C3",
-            "#FFDD52", "#FFE37B", "#FFE89E", "#FFF2D1"
-        ],
-        "green": [
-            "#6BFF6B", "#8EFF8E", "#AAFFAA", "#C3FFC3",
-            "#52FF52", "#7BFF7B", "#9EFF9E", "#D1FFD1"
-        ]
-    }
-
-    # Если цвет звезды неизвестен - золотой по умолчанию
-    palette = color_palettes.get(star_color, ["#FFD700"])
-
-    # Убедимся, что все цвета начинаются с одного #
-    clean_palette = [color.replace("##", "#") for color in palette]
-
-    return random.choice(clean_palette)
-
+    palette = PLANET_PALETTES.get(star_color.lower().strip(), DEFAULT_PLANET_PALETTE)
+    return random.choice(palette)
 
 
 def parse_star_parameters(line, star):
@@ -205,14 +419,62 @@ def parse_planet_parameters(line, planet):
     planet.Vy = float(parts[7])
 
 
+def parse_moon_parameters(line, moon):
+    """Считывает данные о спутнике из строки (формат как у планеты).
+    Необязательное девятое поле — номер строки планеты-родителя среди строк
+    тел файла (Star, Planet, Moon; с нуля). Возвращает этот номер или None."""
+    parts = line.split()
+    if len(parts) not in (8, 9):
+        raise ValueError(f"Invalid Moon format: expected 8 or 9 parts, got {len(parts)}")
+
+    moon.R = float(parts[1])
+    moon.color = parts[2]
+    moon.m = float(parts[3])
+    moon.x = float(parts[4])
+    moon.y = float(parts[5])
+    moon.Vx = float(parts[6])
+    moon.Vy = float(parts[7])
+    return int(parts[8]) if len(parts) == 9 else None
+
+
 def write_space_objects_data_to_file(output_filename, space_objects):
-    """Сохраняет данные о космических объектах в файл."""
+    """Сохраняет данные о космических объектах в файл.
+    Строка спутника заканчивается номером строки его планеты."""
+    index = {id(obj): i for i, obj in enumerate(space_objects)}
     with open(output_filename, 'w') as out_file:
         for obj in space_objects:
+            parent = index.get(id(getattr(obj, 'parent', None)))
             out_file.write(
                 f"{obj.type} {obj.R} {obj.color} {obj.m} "
-                f"{obj.x} {obj.y} {obj.Vx} {obj.Vy}\n"
+                f"{obj.x} {obj.y} {obj.Vx} {obj.Vy}"
+                f"{'' if parent is None else f' {parent}'}\n"
+            )
+
+
+def write_space_state_to_file(output_filename, state, progress=None, chunk_size=10000):
+    """Сохраняет состояние SpaceState в файл в том же формате, что и
+    write_space_objects_data_to_file (у спутников — с номером строки родителя).
+    Строки формируются порциями по chunk_size,
+    после каждой порции вызывается progress(доля).
+    """
+    from solar_state import TYPE_NAMES
+
+    n = len(state)
+    with open(output_filename, 'w') as out_file:
+        for start in range(0, n, chunk_size):
+            block = slice(start, start + chunk_size)
+            columns = (state.kind[block].tolist(), state.R[block].tolist(),
+                       state.color[block].tolist(), state.m[block].tolist(),
+                       state.x[block].tolist(), state.y[block].tolist(),
+                       state.Vx[block].tolist(), state.Vy[block].tolist(),
+                       state.parent[block].tolist())
+            out_file.writelines(
+                f"{TYPE_NAMES[kind]} {R} {color} {m} {x} {y} {Vx} {Vy}"
+                f"{f' {parent}' if parent >= 0 else ''}\n"
+                for kind, R, color, m, x, y, Vx, Vy, parent in zip(*columns)
             )
+            if progress:
+                progress(min(start + chunk_size, n) / n)
 
 
 if __name__ == "__main__":
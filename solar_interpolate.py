@@ -0,0 +1,138 @@
+# coding: utf-8
+# license: GPLv3
+
+"""
+Плавная отрисовка между снимками расчёта.
+Если расчёт идёт реже, чем обновляется экран (большой шаг по времени),
+положение тел в промежуточных кадрах восстанавливается либо линейной
+интерполяцией между двумя последними снимками, либо кеплеровой
+экстраполяцией от последнего снимка для тел на связанных орбитах.
+"""
+import time
+
+import numpy as np
+
+from solar_model import gravitational_constant
+
+INTERPOLATION_MODES = ("off", "linear", "kepler")
+
+
+def find_primaries(types, masses, parents, xs, ys):
+    """Индекс центрального тела для каждого тела или -1.
+    Для спутников это родительская планета, для планет — звезда с наибольшим
+    притяжением m / r^2, у звёзд центрального тела нет."""
+    types = np.asarray(types)
+    primary = np.full(len(types), -1, dtype=np.int64)
+    stars = np.flatnonzero(types == "star")
+    bodies = np.flatnonzero(types == "planet")
+    if len(stars) and len(bodies):
+        dx = xs[stars][None, :] - xs[bodies][:, None]
+        dy = ys[stars][None, :] - ys[bodies][:, None]
+        pull = masses[stars][None, :] / (dx ** 2 + dy ** 2 + 1E-10)
+        primary[bodies] = stars[pull.argmax(axis=1)]
+    moons = np.flatnonzero((types == "moon") & (np.asarray(parents) >= 0))
+    primary[moons] = np.asarray(parents)[moons]
+    return primary
+
+
+def kepler_propagate(rx, ry, vx, vy, mu, dt, iterations=6):
+    """Положение через время dt на эллиптической орбите с параметром mu
+    (r, v — относительно центрального тела). Возвращает (rx, ry, bound):
+    для незамкнутых орбит bound=False и положение не вычисляется."""
+    r0 = np.sqrt(rx ** 2 + ry ** 2)
+    v2 = vx ** 2 + vy ** 2
+    inverse_a = 2 / r0 - v2 / mu
+    bound = inverse_a > 0
+    a = np.where(bound, 1 / np.where(bound, inverse_a, 1), 1.0)
+    n = np.sqrt(mu / a ** 3)
+
+    e_cos = 1 - r0 / a
+    e_sin = (rx * vx + ry * vy) / np.sqrt(mu * a)
+    E0 = np.arctan2(e_sin, e_cos)
+    M = E0 - e_sin + n * dt
+    e = np.minimum(np.sqrt(e_cos ** 2 + e_sin ** 2), 0.99)
+
+    E = M + e * np.sin(M)
+    for _ in range(iterations):
+        E -= (E - e * np.sin(E) - M) / (1 - e * np.cos(E))
+    dE = E - E0
+
+    f = 1 - a / r0 * (1 - np.cos(dE))
+    g = dt - (dE - np.sin(dE)) / n
+    return f * rx + g * vx, f * ry + g * vy, bound
+
+
+class Interpolator:
+    """Хранит два последних снимка и вычисляет положения тел на момент кадра.
+
+    Снимки — объекты с полями time, steps, xs, ys, vxs, vys, wall
+    (solar_scheduler.Snapshot).
+    """
+    def __init__(self, types, masses, parents):
+        self.types = np.asarray(types)
+        self.masses = np.asarray(masses, dtype=float)
+        self.parents = np.asarray(parents, dtype=np.int64)
+        self.previous = None
+        self.current = None
+        self.primary = None
+
+    @classmethod
+    def from_objects(cls, space_objects):
+        index = {id(obj): i for i, obj in enumerate(space_objects)}
+        parents = [index.get(id(getattr(obj, 'parent', None)), -1) for obj in space_objects]
+        return cls([obj.type for obj in space_objects],
+                   [obj.m for obj in space_objects], parents)
+
+    def push(self, snapshot):
+        """Принимает снимок; повторная передача того же снимка игнорируется."""
+        if snapshot is None or (self.current is not None and snapshot.steps == self.current.steps):
+            return
+        self.previous, self.current = self.current, snapshot
+        if self.primary is None:
+            self.primary = find_primaries(self.types, self.masses, self.parents,
+                                          snapshot.xs, snapshot.ys)
+
+    def positions(self, mode, now=None):
+        """Координаты (xs, ys) на момент now (по time.perf_counter)."""
+        current, previous = self.current, self.previous
+        if current is None:
+            return None
+        if mode == "off" or previous is None or current.wall <= previous.wall:
+            return current.xs, current.ys
+
+        now = time.perf_counter() if now is None else now
+        interval = current.wall - previous.wall
+        alpha = min(max((now - current.wall) / interval, 0.0), 1.0)
+
+        if mode == "linear":
+            # Отображение отстаёт на один интервал, зато движение без рывков
+            return (previous.xs + alpha * (current.xs - previous.xs),
+                    previous.ys + alpha * (current.ys - previous.ys))
+        return self._extrapolate(current, alpha * (current.time - previous.time))
+
+    def _extrapolate(self, snapshot, dt):
+        xs = snapshot.xs + snapshot.vxs * dt
+        ys = snapshot.ys + snapshot.vys * dt
+        bodies = np.flatnonzero(self.primary >= 0)
+        if not len(bodies):
+            return xs, ys
+
+        center = self.primary[bodies]
+        mu = gravitational_constant * (self.masses[center] + self.masses[bodies])
+        rx, ry, bound = kepler_propagate(
+            snapshot.xs[bodies] - snapshot.xs[center], snapshot.ys[bodies] - snapshot.ys[center],
+            snapshot.vxs[bodies] - snapshot.vxs[center], snapshot.vys[bodies] - snapshot.vys[center],
+            mu, dt)
+        # Центр орбиты сам смещается; незамкнутые орбиты остаются линейными.
+        # Сначала смещаются центры без собственного центра (звёзды), затем
+        # их спутники, поэтому порядок обработки — по глубине вложенности.
+        for level in (self.primary[center] < 0, self.primary[center] >= 0):
+            selected = level & bound
+            target = bodies[selected]
+            xs[target] = xs[center[selected]] + rx[selected]
+            ys[target] = ys[center[selected]] + ry[selected]
+        return xs, ys
+
+
+if __name__ == "__main__":
+    print("This module is not for direct call!")
@@ -1,13 +1,31 @@
 # coding: utf-8
 # license: GPLv3
 
+import logging
+import time
 import tkinter
-from tkinter.filedialog import *
-from solar_vis import *
-from solar_vis import scale_factor
-from solar_model import *
-from solar_input import *
-from tkinter.filedialog import askopenfilename
+from tkinter.filedialog import askopenfilename, asksaveasfilename
+
+import numpy as np
+
+from solar_vis import (ORBIT_COLORS, view, calculate_scale_factor,
+                       apply_view_change, draw_orbit, draw_moon_orbit)
+from solar_model import recalculate_space_objects_positions
+from solar_input import write_space_state_to_file
+from solar_cache import load_space_objects, DEFAULT_SEED
+from solar_state import SpaceState, object_positions, object_velocities
+from solar_interpolate import Interpolator, INTERPOLATION_MODES
+from solar_scheduler import PhysicsScheduler, FrameCounter, Snapshot
+from solar_process import PhysicsProcess
+from solar_tasks import BackgroundTask, TaskCancelled, run_in_batches
+from solar_raster import RasterLayer, RasterBodies
+from solar_canvas import CanvasUpdater, CanvasItemPool, LodRenderer
+from solar_trails import TrailBuffer, TrailRenderer, splat_trails
+from solar_profile import FrameProfiler
+from solar_replay import KeyframeRecorder
+from solar_spatial import SpatialIndex
+
+logger = logging.getLogger(__name__)
 
 
 perform_execution = False
@@ -34,148 +52,883 @@ space = None
 start_button = None
 """Кнопка запуска/паузы."""
 
+cancel_button = None
+"""Кнопка отмены фоновой загрузки/сохранения."""
+
+status_text = None
+"""Ход выполнения фоновой операции."""
+
+current_task = None
+"""Выполняемая фоновая задача (BackgroundTask) или None."""
+
+pending_drawing = None
+"""Функция отмены порционной отрисовки загруженной системы или None."""
+
+render_mode = None
+"""Способ отрисовки тел: "items", "raster" или "lod" (переменная tkinter)."""
+
+density_mode = None
+"""Включено ли аддитивное затенение плотности в растровом режиме."""
+
+raster_layer = None
+"""Слой холста с растровым изображением (RasterLayer) или None."""
+
+raster_bodies = None
+"""Цвета и радиусы тел для растровой отрисовки и LOD (RasterBodies)."""
+
+lod_renderer = None
+"""Отрисовка с отсечением и уровнями детализации (LodRenderer) или None."""
+
+canvas_updater = None
+"""Пакетное обновление изображений тел на холсте (CanvasUpdater)."""
+
+item_pool = None
+"""Овалы холста, переиспользуемые между загрузками (CanvasItemPool)."""
+
+scheduler = None
+"""Поток расчёта (PhysicsScheduler), пока симуляция запущена."""
+
+target_fps = 60
+"""Частота кадров отрисовки."""
+
+frame_counter = FrameCounter()
+"""Счётчик фактической частоты кадров."""
+
+sim_rate = None
+"""Заданная скорость модельного времени, с/с (0 — максимально быстро)."""
+
+performance_text = None
+"""Достигнутые шагов/с и кадров/с."""
+
+last_drawn_steps = -1
+"""Номер шага последнего нарисованного снимка."""
+
+interpolation_mode = None
+"""Сглаживание между снимками: "off", "linear" или "kepler" (переменная tkinter)."""
+
+interpolator = None
+"""Интерполяция положений между снимками расчёта (Interpolator)."""
+
+process_mode = None
+"""Вести ли расчёт в отдельном процессе (переменная tkinter)."""
+
+physics_process = None
+"""Процесс расчёта (PhysicsProcess) или None."""
+
+current_scenario = None
+"""Имя файла и зерно загруженного сценария."""
+
+trails_mode = None
+"""Рисовать ли следы движения тел (переменная tkinter)."""
+
+trails = None
+"""Кольцевой буфер следов (TrailBuffer) или None."""
+
+trail_renderer = None
+"""Отрисовка следов ломаными на холсте (TrailRenderer) или None."""
+
+drag_start = None
+"""Экранная точка, от которой отсчитывается сдвиг изображения мышью."""
+
+redraw_pending = False
+"""Запланирована ли перерисовка после изменения вида."""
+
+profiler = FrameProfiler()
+"""Замеры времени по фазам кадра."""
+
+profile_mode = None
+"""Показывать ли замеры фаз поверх холста (переменная tkinter)."""
+
+overlay_item = None
+"""Текст замеров на холсте или None."""
+
+SEEK_MAX_STEPS = 20000
+"""Наибольшее число шагов досчёта от опорного кадра при перемотке."""
+
+SEEK_TIMEOUT = 30
+"""Сколько секунд ждать кадра перемотки от процесса расчёта."""
+
+CAPTURE_FRAMES = 300
+"""Сколько кадров охватывает снимок cProfile или tracemalloc."""
+
+replay = None
+"""Опорные кадры расчёта для перемотки (KeyframeRecorder) или None."""
+
+timeline = None
+"""Шкала времени записанного расчёта (tkinter.Scale)."""
+
+timeline_time = None
+"""Положение шкалы времени, модельные секунды (переменная tkinter)."""
+
+scrubbing = False
+"""Перетаскивается ли сейчас шкала времени."""
+
+seeking = False
+"""Идёт ли досчёт от опорного кадра после перемотки."""
+
+drawn_positions = None
+"""Координаты тел (xs, ys) в последнем нарисованном кадре."""
+
+spatial_index = None
+"""Индекс нарисованных положений для выбора тел мышью (SpatialIndex) или None."""
+
+index_stale = True
+"""Изменились ли положения с последнего обновления индекса."""
+
+click_start = None
+"""Экранная точка нажатия кнопки мыши: щелчок без сдвига выбирает тело."""
+
+pinned_body = None
+"""Номер тела, выбранного щелчком, или None."""
+
+hover_item = None
+"""Подсказка о теле под курсором на холсте или None."""
+
+pinned_item = None
+"""Сведения о выбранном теле в углу холста или None."""
+
+PICK_PIXELS = 4
+"""Допуск при наведении на тело, пикселов сверх его радиуса."""
+
 
 def execution():
-    """Основной цикл выполнения вычислений и обновления экрана."""
-    global physical_time, displayed_time, scale_factor
+    """Цикл отрисовки: с постоянной частотой кадров рисует последний готовый
+    снимок расчёта, который выполняется в отдельном потоке."""
+    global physical_time, last_drawn_steps
+    profiler.begin_frame()
+
+    # Параметры передаются в поток расчёта отсюда: переменные tkinter
+    # нельзя читать из другого потока
+    scheduler.dt = time_step.get()
+    scheduler.budget_fraction = time_speed.get() / 100
+    scheduler.rate = sim_rate.get()
+
+    snapshot = scheduler.latest()
+    if snapshot is not None and len(snapshot.xs) != len(space_objects):
+        snapshot = None  # процесс расчёта ещё не перешёл на новый сценарий
+    profiler.mark("poll")
+    if snapshot is not None and snapshot.steps != last_drawn_steps:
+        record_trails(snapshot.xs, snapshot.ys)
+        if replay is not None and replay.record(snapshot):
+            update_timeline()
+    profiler.mark("trails")
+    mode = interpolation_mode.get()
+    drawn = 0
+    if mode != "off" and snapshot is not None:
+        # Промежуточные положения рисуются в каждом кадре, даже без нового снимка
+        interpolator.push(snapshot)
+        drawn = draw_bodies(*interpolator.positions(mode))
+    elif snapshot is not None and snapshot.steps != last_drawn_steps:
+        drawn = draw_bodies(snapshot.xs, snapshot.ys)
+    profiler.mark("render")
+    if snapshot is not None and snapshot.steps != last_drawn_steps:
+        last_drawn_steps = snapshot.steps
+        physical_time = snapshot.time
+        displayed_time.set(f"{physical_time:.1f} seconds gone")
+        if not scrubbing:
+            timeline_time.set(physical_time)
+
+    frame_counter.tick()
+    performance_text.set(f"{scheduler.steps_per_second:.0f} steps/s, {frame_counter.fps:.0f} FPS")
+    profiler.mark("labels")
+    profiler.end_frame(scheduler.physics_time * 1000, drawn)
+    if profiler.enabled:
+        draw_overlay()
+
+    if perform_execution:
+        space.after(max(1, int(1000 / target_fps)), execution)
+
+
+def draw_bodies(xs=None, ys=None):
+    """Перерисовывает тела выбранным способом.
+    xs, ys — координаты из снимка расчёта; по умолчанию берутся из объектов.
+    Возвращает число нарисованных тел (для LOD — элементов холста)."""
+    global raster_layer, lod_renderer, raster_bodies, trail_renderer
+    if xs is None:
+        xs, ys = object_positions(space_objects)
+    if raster_bodies is None:
+        raster_bodies = RasterBodies.from_objects(space_objects)
+
+    mode = render_mode.get()
+    if mode == "raster":
+        if raster_layer is None:
+            raster_layer = RasterLayer(space)
+        overlay = None
+        if trails is not None:
+            overlay = lambda frame: splat_trails(frame, trails, raster_bodies)
+        raster_layer.draw(xs, ys, raster_bodies, density=density_mode.get(), overlay=overlay)
+        drawn = len(xs)
+    elif mode == "lod":
+        if lod_renderer is None:
+            lod_renderer = LodRenderer(space)
+        drawn = lod_renderer.draw(xs, ys, raster_bodies)
+    else:
+        canvas_updater.update(xs, ys)
+        drawn = canvas_updater.visible
+    if trails is not None and mode != "raster":
+        if trail_renderer is None:
+            trail_renderer = TrailRenderer(space)
+        trail_renderer.draw(trails, raster_bodies)
+    remember_positions(xs, ys)
+    return drawn
+
+
+def remember_positions(xs, ys):
+    """Запоминает нарисованные положения; индекс обновится при первом запросе."""
+    global drawn_positions, index_stale
+    drawn_positions = (xs, ys)
+    index_stale = True
+    if pinned_body is not None:
+        show_pinned()
+
+
+def body_at(px, py):
+    """Номер тела под экранной точкой (px, py) или None."""
+    global spatial_index, index_stale
+    if drawn_positions is None or raster_bodies is None:
+        return None
+    if spatial_index is None or len(spatial_index) != len(drawn_positions[0]):
+        spatial_index = SpatialIndex(*drawn_positions)
+    elif index_stale:
+        spatial_index.update(*drawn_positions)
+    index_stale = False
+
+    x, y = view.unproject(px, py)
+    radius = raster_bodies.radius
+    found = spatial_index.within(x, y, (int(radius.max(initial=0)) + PICK_PIXELS) / view.scale)
+    if not len(found):
+        return None
+    xs, ys = drawn_positions
+    pixels = np.hypot(xs[found] - x, ys[found] - y) * view.scale
+    # Из перекрывающихся тел выбирается то, к центру которого курсор ближе
+    hit = pixels <= radius[found] + PICK_PIXELS
+    if not hit.any():
+        return None
+    return int(found[hit][pixels[hit].argmin()])
+
+
+def describe_body(i):
+    """Текст сведений о теле i: имя, масса, скорость, родитель."""
+    body = space_objects[i]
+    vx, vy = body.Vx, body.Vy
+    snapshot = scheduler.latest() if scheduler is not None else None
+    if snapshot is not None and snapshot.vxs is not None and len(snapshot.vxs) == len(space_objects):
+        vx, vy = float(snapshot.vxs[i]), float(snapshot.vys[i])
+    parent = getattr(body, "parent", None)
+    lines = [getattr(body, "name", f"{body.type} #{i}"),
+             f"type {body.type}, mass {body.m:.4g} kg",
+             f"velocity {np.hypot(vx, vy):.4g} m/s ({vx:.4g}, {vy:.4g})"]
+    if parent is not None:
+        lines.append(f"parent {getattr(parent, 'name', parent.type)}")
+    return "\n".join(lines)
+
+
+def on_mouse_motion(event):
+    """Подсказка о теле под курсором."""
+    global hover_item
+    i = body_at(event.x, event.y) if drag_start is None else None
+    if i is None:
+        if hover_item is not None:
+            space.delete(hover_item)
+            hover_item = None
+        return
+    if hover_item is None:
+        hover_item = space.create_text(0, 0, anchor=tkinter.NW, fill="white",
+                                       font=("Courier", 10), tags="inspect")
+    space.coords(hover_item, event.x + 12, event.y + 12)
+    space.itemconfigure(hover_item, text=describe_body(i))
+    space.tag_raise(hover_item)
+
+
+def show_pinned():
+    """Обновляет сведения о выбранном теле в правом верхнем углу холста."""
+    global pinned_item
+    if pinned_item is None:
+        pinned_item = space.create_text(space.winfo_width() - 10, 10, anchor=tkinter.NE,
+                                        fill="white", font=("Courier", 10), tags="inspect")
+    x, y = drawn_positions[0][pinned_body], drawn_positions[1][pinned_body]
+    space.coords(pinned_item, space.winfo_width() - 10, 10)
+    space.itemconfigure(pinned_item, text=f"{describe_body(pinned_body)}\n"
+                                          f"position ({x:.4g}, {y:.4g}) m")
+    space.tag_raise(pinned_item)
+
+
+def select_body(i):
+    """Выбирает тело i для постоянного показа сведений (None — снять выбор)."""
+    global pinned_body, pinned_item
+    pinned_body = i
+    if i is None:
+        if pinned_item is not None:
+            space.delete(pinned_item)
+            pinned_item = None
+    else:
+        show_pinned()
+
+
+def change_render_mode():
+    """Переключает способ отрисовки тел: отдельные овалы, растр или LOD."""
+    global raster_layer, lod_renderer
+    mode = render_mode.get()
+    if mode != "raster" and raster_layer is not None:
+        raster_layer.clear()
+        raster_layer = None
+    if mode != "lod" and lod_renderer is not None:
+        lod_renderer.clear()
+        lod_renderer = None
+    if mode == "raster" and trail_renderer is not None:
+        clear_trail_lines()
+
+    if mode == "items":
+        space.itemconfigure("star||planet||moon", state=tkinter.NORMAL)
+        canvas_updater.set_bodies(space_objects)
+    else:
+        space.itemconfigure("star||planet||moon", state=tkinter.HIDDEN)
+    draw_bodies()
+
+
+def record_trails(xs, ys):
+    """Добавляет положения тел в следы, если следы включены."""
+    global trails
+    if not trails_mode.get():
+        return
+    if trails is None or len(trails) != len(xs):
+        trails = TrailBuffer(len(xs))
+    trails.record(xs, ys)
+
+
+def clear_trail_lines():
+    """Удаляет ломаные следов с холста; сами следы сохраняются."""
+    global trail_renderer
+    if trail_renderer is not None:
+        trail_renderer.clear()
+        trail_renderer = None
+
+
+def change_trails_mode():
+    """Включает и выключает следы движения тел."""
+    global trails
+    if not trails_mode.get():
+        trails = None
+        clear_trail_lines()
+    draw_bodies()
+
+
+def draw_overlay():
+    """Выводит замеры фаз кадра в углу холста."""
+    global overlay_item
+    if overlay_item is None:
+        overlay_item = space.create_text(10, 10, anchor=tkinter.NW, fill="white",
+                                         font=("Courier", 10), tags="overlay")
+    space.itemconfigure(overlay_item, text=profiler.summary(frame_counter.fps))
+    space.tag_raise(overlay_item)
+
+
+def change_profile_mode():
+    """Включает и выключает замеры фаз и их вывод на холст."""
+    global overlay_item
+    profiler.enabled = profile_mode.get()
+    if not profiler.enabled and overlay_item is not None:
+        space.delete(overlay_item)
+        overlay_item = None
+
+
+def capture_profile():
+    """Снимает cProfile (*.prof) или tracemalloc (*.tracemalloc) следующих кадров."""
+    filename = asksaveasfilename(filetypes=(("cProfile", "*.prof"),
+                                            ("tracemalloc", "*.tracemalloc")))
+    if not filename:
+        return
+    kind = "tracemalloc" if filename.endswith(".tracemalloc") else "cprofile"
+    status_text.set(f"Профиль {kind}: {CAPTURE_FRAMES} кадров")
+    profiler.capture(kind, CAPTURE_FRAMES, filename,
+                     on_done=lambda name: status_text.set(f"Профиль записан: {name}"))
+
+
+def update_timeline():
+    """Растягивает шкалу времени на весь записанный отрезок."""
+    timeline.configure(from_=replay.start_time, to=replay.end_time)
+
+
+def on_timeline_press(event):
+    """Начало перемотки: расчёт ставится на паузу."""
+    global scrubbing
+    if replay is None or not len(replay) or seeking:
+        return
+    if perform_execution:
+        stop_execution()
+    scrubbing = True
+
+
+def on_timeline_move(value):
+    """Во время перетаскивания шкалы тела рисуются по интерполяции
+    между опорными кадрами, без пересчёта."""
+    if not scrubbing:
+        return
+    sim_time = timeline_time.get()
+    draw_bodies(*replay.positions(sim_time))
+    displayed_time.set(f"{sim_time:.1f} seconds gone")
+
+
+def on_timeline_release(event):
+    global scrubbing
+    if not scrubbing:
+        return
+    scrubbing = False
+    seek(timeline_time.get())
+
+
+def seek(sim_time):
+    """Восстанавливает систему на момент sim_time: берёт ближайший более
+    ранний опорный кадр и досчитывает от него текущим шагом по времени
+    (не больше SEEK_MAX_STEPS шагов). Досчёт идёт в процессе расчёта, если
+    он запущен, иначе — фоновой задачей; кнопка запуска на это время
+    выключается."""
+    global seeking
+    seeking = True
+    keyframe = replay.keyframe(sim_time)
+    apply_snapshot(keyframe)
+    dt = time_step.get()
+    steps = max(0, int(round((sim_time - keyframe.time) / dt))) if dt > 0 else 0
+    if steps > SEEK_MAX_STEPS:
+        logger.info("Перемотка ограничена %d шагами от опорного кадра", SEEK_MAX_STEPS)
+        steps = SEEK_MAX_STEPS
+    start_button['state'] = tkinter.DISABLED
+
+    if physics_process is not None:
+        requested = time.perf_counter()
+        physics_process.restore(keyframe.time, keyframe.xs, keyframe.ys, keyframe.vxs,
+                                keyframe.vys, steps=steps, dt=dt)
+        wait_for_seek(keyframe.time, keyframe.time + steps * dt, requested)
+        return
+
+    # Досчёт идёт по копиям объектов: до конца перемотки интерфейс рисует
+    # и выбирает тела по опорному кадру и не видит недосчитанных шагов
+    source = space_objects
+    bodies = SpaceState.from_objects(source).to_objects()
+    completed = 0
 
-    current_scale = scale_factor
-    recalculate_space_objects_positions(space_objects, time_step.get())
-    scale_factor = current_scale
+    def work(task):
+        nonlocal completed
+        for completed in range(steps):
+            if completed % 100 == 0:
+                task.report(completed / steps, "Перемотка")
+            elif task.cancelled:
+                raise TaskCancelled()
+            recalculate_space_objects_positions(bodies, dt)
+        completed = steps
+
+    def done(result=None):
+        if space_objects is not source:
+            # Пока шла перемотка, загружен другой сценарий
+            finish_seek(physical_time)
+            return
+        apply_snapshot(Snapshot(keyframe.time + completed * dt, completed,
+                                *object_positions(bodies), *object_velocities(bodies), None))
+        finish_seek(keyframe.time + completed * dt)
+
+    def failed(error):
+        # После отмены копии стоят между шагами, после ошибки — неизвестно где
+        if isinstance(error, TaskCancelled):
+            done()
+        else:
+            finish_seek(keyframe.time)
+
+    start_task(work, done, on_error=failed)
+
+
+def wait_for_seek(keyframe_time, sim_time, requested):
+    """Ждёт кадра процесса расчёта на момент sim_time, опубликованного
+    после запроса перемотки (в момент requested), и переносит его в объекты.
+    Если кадра нет дольше SEEK_TIMEOUT, система остаётся в опорном кадре."""
+    snapshot = physics_process.latest() if physics_process is not None else None
+    if snapshot is not None and snapshot.wall >= requested and snapshot.time == sim_time:
+        apply_snapshot(snapshot)
+        finish_seek(sim_time)
+    elif physics_process is not None and time.perf_counter() < requested + SEEK_TIMEOUT:
+        space.after(20, wait_for_seek, keyframe_time, sim_time, requested)
+    else:
+        logger.warning("Процесс расчёта не выполнил перемотку")
+        finish_seek(keyframe_time)
 
-    for body in space_objects:
-        update_object_position(space, body)
 
-    physical_time += time_step.get()
+def finish_seek(sim_time):
+    """Показывает систему после перемотки на момент sim_time."""
+    global physical_time, last_drawn_steps, trails, seeking
+    seeking = False
+    physical_time = sim_time
+    # Следы относятся к другому участку траектории
+    if trails is not None:
+        trails = None
+        clear_trail_lines()
+    last_drawn_steps = -1
+    timeline_time.set(physical_time)
     displayed_time.set(f"{physical_time:.1f} seconds gone")
+    start_button['state'] = tkinter.NORMAL
+    draw_bodies()
+
+
+def on_mouse_wheel(event):
+    """Приближает или отдаляет изображение относительно курсора."""
+    zoom_in = event.num == 4 or event.delta > 0
+    factor = view.zoom(1.25 if zoom_in else 0.8, event.x, event.y)
+    apply_view_change(space, factor, (event.x, event.y), (0, 0))
+    view_changed()
+
+
+def on_drag_start(event):
+    global drag_start, click_start
+    drag_start = click_start = (event.x, event.y)
+
+
+def on_drag_end(event):
+    """Отпускание кнопки без сдвига — щелчок: выбирает тело под курсором."""
+    global drag_start
+    drag_start = None
+    if click_start is not None and abs(event.x - click_start[0]) + abs(event.y - click_start[1]) <= 2:
+        select_body(body_at(event.x, event.y))
 
+
+def on_drag(event):
+    """Сдвигает изображение вслед за мышью."""
+    global drag_start
+    if drag_start is None:
+        return
+    dx, dy = event.x - drag_start[0], event.y - drag_start[1]
+    drag_start = (event.x, event.y)
+    view.pan(dx, dy)
+    apply_view_change(space, 1, (0, 0), (dx, dy))
+    view_changed()
+
+
+def view_changed():
+    """Планирует перерисовку тел и следов в новом виде.
+    Серия событий мыши до ближайшего простоя даёт одну перерисовку."""
+    global redraw_pending
+    if trails is not None:
+        trails.dirty[:] = True
+    if not redraw_pending:
+        redraw_pending = True
+        space.after_idle(redraw_view)
+
+
+def redraw_view():
+    global redraw_pending, last_drawn_steps
+    redraw_pending = False
     if perform_execution:
-        space.after(101 - int(time_speed.get()), execution)
+        last_drawn_steps = -1  # следующий кадр перерисует последний снимок
+    else:
+        draw_bodies()
 
 
 def start_execution():
     """Обработчик запуска симуляции."""
-    global perform_execution
+    global perform_execution, scheduler, interpolator
     perform_execution = True
     start_button['text'] = "Pause"
     start_button['command'] = stop_execution
+    interpolator = Interpolator.from_objects(space_objects)
+    if replay is not None:
+        # После перемотки назад расчёт пойдёт по новой траектории
+        replay.truncate(physical_time)
+        update_timeline()
+    if process_mode.get() and current_scenario is not None:
+        start_process()
+        execution()
+        return
+    # Состояние процесса расчёта отстанет от расчёта в потоке
+    stop_process()
+    scheduler = PhysicsScheduler(
+        step=lambda dt: recalculate_space_objects_positions(space_objects, dt),
+        snapshot=lambda: object_positions(space_objects) + object_velocities(space_objects),
+        dt=time_step.get(), sim_time=physical_time, target_fps=target_fps
+    ).start()
     execution()
-    print('Started execution...')
+    logger.info('Started execution...')
 
 
 def stop_execution():
     """Обработчик паузы симуляции."""
-    global perform_execution
+    global perform_execution, scheduler
     perform_execution = False
+    if scheduler is physics_process and scheduler is not None:
+        start_button['state'] = tkinter.DISABLED
+        wait_for_pause(physics_process.pause(), space_objects, time.perf_counter())
+    elif scheduler is not None:
+        scheduler.stop()
+    scheduler = None
+    draw_bodies()
     start_button['text'] = "Start"
     start_button['command'] = start_execution
-    print('Paused execution.')
+    logger.info('Paused execution.')
 
 
-def open_file_dialog():
-    """Открывает диалог выбора файла и загружает космические объекты"""
-    global space_objects, perform_execution, scale_factor
+def wait_for_pause(request, source, requested):
+    """Ждёт, пока процесс расчёта подтвердит паузу по запросу request, и
+    переносит его последний кадр в объекты source. Процесс расчёта не меняет
+    объекты интерфейса, а до подтверждения может досчитать ещё кадр; после
+    переноса пауза, сохранение и расчёт в потоке продолжаются с того же
+    состояния. Если подтверждения нет дольше SEEK_TIMEOUT, объекты не меняются."""
+    global physical_time
+    if physics_process is not None and not physics_process.paused(request):
+        if time.perf_counter() < requested + SEEK_TIMEOUT:
+            space.after(20, wait_for_pause, request, source, requested)
+            return
+        logger.warning("Процесс расчёта не подтвердил паузу")
+    # Перемотка переносит свой кадр сама; после загрузки другого
+    # сценария кадр процесса к объектам не относится
+    elif physics_process is not None and not seeking and space_objects is source:
+        snapshot = physics_process.latest()
+        if snapshot is not None and len(snapshot.xs) == len(space_objects):
+            apply_snapshot(snapshot)
+            physical_time = snapshot.time
+            displayed_time.set(f"{physical_time:.1f} seconds gone")
+            timeline_time.set(physical_time)
+            draw_bodies()
+    if not seeking:
+        start_button['state'] = tkinter.NORMAL
 
-    # Сброс состояния симуляции
-    perform_execution = False
-    space.delete("all")
-    space_objects = []
 
-    # Выбор файла
+def start_process():
+    """Запускает расчёт загруженного сценария в отдельном процессе."""
+    global physics_process, scheduler
+    if physics_process is None:
+        physics_process = PhysicsProcess(*current_scenario, dt=time_step.get())
+        physics_process.wait_loaded()
+        # Процесс загрузил сценарий с начала: продолжаем с текущего состояния
+        loaded = physics_process.latest()
+        if loaded is not None and len(loaded.xs) == len(space_objects):
+            physics_process.restore(physical_time, *object_positions(space_objects),
+                                    *object_velocities(space_objects))
+    scheduler = physics_process.start()
+
+
+def stop_process():
+    """Завершает процесс расчёта, если он запущен."""
+    global physics_process
+    if physics_process is not None:
+        physics_process.stop()
+        physics_process = None
+
+
+def apply_snapshot(snapshot):
+    """Переносит координаты и скорости из кадра процесса расчёта в объекты."""
+    if snapshot is None or len(snapshot.xs) != len(space_objects):
+        return
+    for body, x, y, vx, vy in zip(space_objects, snapshot.xs.tolist(), snapshot.ys.tolist(),
+                                  snapshot.vxs.tolist(), snapshot.vys.tolist()):
+        body.x, body.y, body.Vx, body.Vy = x, y, vx, vy
+
+
+def open_file_dialog():
+    """Открывает диалог выбора файла и загружает космические объекты в фоне"""
     in_filename = askopenfilename(filetypes=(("Text files", "*.txt"),))
     if not in_filename:
         return
 
-    try:
-        # Загрузка объектов из файла
-        space_objects = read_space_objects_data_from_file(in_filename)
-        if not space_objects:
-            print("Файл не содержит объектов")
-            return
+    def work(task):
+        return load_space_objects(in_filename, DEFAULT_SEED,
+                                  progress=lambda f: task.report(f, "Загрузка"))
+
+    def done(new_objects):
+        global current_scenario
+        current_scenario = (in_filename, DEFAULT_SEED)
+        install_space_objects(new_objects)
+        # Процесс расчёта загружает тот же сценарий из того же кэша
+        if physics_process is not None:
+            physics_process.load(*current_scenario)
+
+    start_task(work, done)
+
 
-        # Добавляем спутники в общий список объектов
-        all_moons = []
-        for planet in [obj for obj in space_objects if getattr(obj, 'type', None) == 'planet']:
-            if hasattr(planet, 'moons') and planet.moons:
-                all_moons.extend(planet.moons)
-        space_objects.extend(all_moons)
-
-        all_moons = []
-        for planet in [obj for obj in space_objects if getattr(obj, 'type', None) == 'planet']:
-            if hasattr(planet, 'moons') and planet.moons:
-                all_moons.extend(planet.moons)
-        space_objects.extend(all_moons)
-
-        # Рассчитываем масштаб
-        max_distance = max(
-            ((obj.x ** 2 + obj.y ** 2) ** 0.5 for obj in space_objects),
-            default=3000
-        )
-        calculate_scale_factor(max_distance * 1.3)
-        print(f"Масштаб установлен: {scale_factor}")
-
-
-        # Разделяем объекты по типам с защитой от отсутствия атрибута type
-        stars = [obj for obj in space_objects if getattr(obj, 'type', None) == 'star']
-        planets = [obj for obj in space_objects if getattr(obj, 'type', None) == 'planet']
-        moons = [obj for obj in space_objects if getattr(obj, 'type', None) == 'moon']
-
-        # Порядок отрисовки (сначала фоновые элементы, потом объекты)
-        # 1. Сначала рисуем орбиты планет (самые задние элементы)
-        for star in stars:
-            for r in [900, 1500, 1990]:
-                draw_orbit(space, star, r, color=ORBIT_COLORS.get(star.color.lower()))
-        # 2. Затем рисуем орбиты спутников
-        for planet in planets:
-            if hasattr(planet, 'moons') and planet.moons:
-                draw_moon_orbit(space, planet, planet.R * 4)
-
-        # 3. Рисуем планеты
-            for planet in planets:
-                create_planet_image(space, planet)
-        # 4. Рисуем спутники
-        for moon in moons:
-            create_moon_image(space, moon)
-        print(f"Total objects: {len(space_objects)}")
-        print(f"Moons count: {len(all_moons)}")
-        for i, moon in enumerate(all_moons[:3]):  # Вывести первые 3 спутника для примера
-            parent_name = getattr(moon.parent, 'name', 'Unnamed planet')
-            print(f"Moon {i}: pos=({moon.x:.1f}, {moon.y:.1f}), parent={parent_name}")
-
-
-
-        # 5. В самом конце рисуем звёзды поверх всего
-        for star in stars:
-            create_star_image(space, star)
-            space.tag_raise(star.image)
-        # Обновляем время
-        displayed_time.set("0.0 seconds gone")
+def install_space_objects(new_objects):
+    """Заменяет текущую систему загруженной и создаёт её изображения порциями."""
+    global space_objects, perform_execution, pending_drawing
+    global physical_time, replay
 
+    if not new_objects:
+        logger.warning("Файл не содержит объектов")
+        return
+
+    # Сброс состояния симуляции
+    if perform_execution:
+        stop_execution()
+    clear_canvas()
+    space_objects = new_objects
+    canvas_updater.set_bodies([])
+    reset_raster()
+    select_body(None)
+    physical_time = 0
+    replay = KeyframeRecorder(len(space_objects))
+    replay.add(0.0, *object_positions(space_objects), *object_velocities(space_objects))
+    update_timeline()
+    timeline_time.set(0.0)
+
+    # Рассчитываем масштаб
+    max_distance = max(
+        ((obj.x ** 2 + obj.y ** 2) ** 0.5 for obj in space_objects),
+        default=3000
+    )
+    calculate_scale_factor(max_distance * 1.3)
+    logger.debug("Масштаб установлен: %s", view.scale)
+
+    # Разделяем объекты по типам с защитой от отсутствия атрибута type
+    stars = [obj for obj in space_objects if getattr(obj, 'type', None) == 'star']
+    planets = [obj for obj in space_objects if getattr(obj, 'type', None) == 'planet']
+    moons = [obj for obj in space_objects if getattr(obj, 'type', None) == 'moon']
+
+    # Порядок отрисовки (сначала фоновые элементы, потом объекты).
+    # Овалы берутся из пула, оставшегося от прошлой загрузки.
+    actions = []
+    # 1. Сначала рисуем орбиты планет (самые задние элементы)
+    for star in stars:
+        for r in [900, 1500, 1990]:
+            actions.append(lambda star=star, r=r: draw_orbit(
+                item_pool, star, r, color=ORBIT_COLORS.get(star.color.lower())))
+    # 2. Затем рисуем орбиты спутников
+    for planet in planets:
+        if hasattr(planet, 'moons') and planet.moons:
+            actions.append(lambda planet=planet: draw_moon_orbit(item_pool, planet, planet.R * 4))
+    # 3. Изображения тел создаются при первой отрисовке и только для
+    # тел, попавших на холст (см. CanvasUpdater)
+
+    def finished():
+        global pending_drawing
+        pending_drawing = None
+        finish_task()
+        # Переиспользованные овалы могли оказаться выше тел
+        space.tag_lower("moon_orbit")
+        space.tag_lower("orbit")
+        canvas_updater.set_bodies(space_objects)
+        if render_mode.get() != "items":
+            change_render_mode()
+        else:
+            draw_bodies()
         # Отладочная информация
-        print(f"Загружено: {len(stars)} звёзд, {len(planets)} планет, {len(moons)} спутников")
-        print("Цвета звёзд:", [star.color for star in stars])
-        print("Цвета планет:", [planet.color for planet in planets])
+        logger.debug("Total objects: %d", len(space_objects))
+        logger.info("Загружено: %d звёзд, %d планет, %d спутников", len(stars), len(planets), len(moons))
 
-    except Exception as e:
-        print(f"Ошибка при загрузке файла: {str(e)}")
+    displayed_time.set("0.0 seconds gone")
+    if pending_drawing:
+        pending_drawing()
+    cancel_button['state'] = tkinter.NORMAL
+    pending_drawing = run_in_batches(
+        space, actions, on_done=finished,
+        on_progress=lambda f: status_text.set(f"Отрисовка {f:.0%}")
+    )
+
+
+def clear_canvas():
+    """Убирает с холста изображения системы: овалы тел и орбит возвращаются
+    в пул, слои растра, LOD и следов удаляются."""
+    item_pool.release_all()
+    space.delete("raster", "lod", "trail")
+
+
+def reset_raster():
+    """Сбрасывает растровый слой и LOD после очистки холста."""
+    global raster_layer, raster_bodies, lod_renderer, trails, trail_renderer
+    global spatial_index, drawn_positions
+    raster_layer = None
+    raster_bodies = None
+    lod_renderer = None
+    trails = None
+    trail_renderer = None
+    spatial_index = None
+    drawn_positions = None
 
-        # Очищаем холст при ошибке
-        space.delete("all")
-        space_objects = []
 
 def save_file_dialog():
-    """Сохранение текущего состояния системы в файл."""
+    """Сохранение текущего состояния системы в файл (запись в фоне)."""
     out_filename = asksaveasfilename(filetypes=(("Text file", ".txt"),))
-    if out_filename:
-        write_space_objects_data_to_file(out_filename, space_objects)
+    if not out_filename:
+        return
+
+    # Запущенный процесс расчёта сохраняет своё состояние сам
+    if scheduler is not None and scheduler is physics_process:
+        physics_process.save(out_filename)
+        return
+
+    # Снимок берётся в потоке tkinter под блокировкой расчёта,
+    # чтобы поток расчёта не изменил объекты посреди копирования
+    if scheduler is not None:
+        with scheduler.lock:
+            snapshot = SpaceState.from_objects(space_objects)
+    else:
+        snapshot = SpaceState.from_objects(space_objects)
+
+    def work(task):
+        write_space_state_to_file(out_filename, snapshot,
+                                  progress=lambda f: task.report(f, "Сохранение"))
+
+    start_task(work, lambda result: logger.info("Сохранено: %s", out_filename))
+
+
+def start_task(work, on_done, on_error=None):
+    """Запускает фоновую задачу, показывая ход выполнения и кнопку отмены.
+    on_error(ошибка) вызывается после отмены или ошибки задачи."""
+    global current_task
+
+    if current_task:
+        current_task.cancel()
+
+    # Отменённая задача сообщает о завершении позже, когда уже идёт
+    # следующая: её строку хода и кнопку отмены не трогаем
+    def done(result):
+        if current_task is task:
+            finish_task()
+        on_done(result)
+
+    def failed(error):
+        if current_task is task:
+            finish_task()
+        if isinstance(error, TaskCancelled):
+            logger.info("Операция отменена")
+        else:
+            logger.error("Ошибка фоновой операции: %s", error)
+        if on_error:
+            on_error(error)
+
+    def report(fraction, message):
+        if current_task is task:
+            status_text.set(f"{message} {fraction:.0%}")
+
+    task = current_task = BackgroundTask(space, work, done, failed, report).start()
+    cancel_button['state'] = tkinter.NORMAL
+
+
+def finish_task():
+    global current_task
+    current_task = None
+    status_text.set("")
+    cancel_button['state'] = tkinter.DISABLED
+
+
+def cancel_task():
+    """Обработчик кнопки отмены фоновой операции."""
+    global space_objects, pending_drawing
+    if current_task:
+        current_task.cancel()
+    if pending_drawing:
+        # Недорисованную систему не оставляем: у части тел ещё нет изображений
+        pending_drawing()
+        pending_drawing = None
+        clear_canvas()
+        space_objects = []
+        canvas_updater.set_bodies([])
+        reset_raster()
+        finish_task()
 
 
 def main():
     """Основная функция, создающая интерфейс программы."""
     global physical_time, displayed_time, time_step, time_speed
-    global space, start_button, space_objects
+    global space, start_button, space_objects, cancel_button, status_text
+    global render_mode, density_mode, canvas_updater, sim_rate, performance_text
+    global interpolation_mode, process_mode, trails_mode, item_pool, profile_mode
+    global timeline, timeline_time
 
-    print('Modelling started!')
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    logger.info('Modelling started!')
     physical_time = 0
 
     root = tkinter.Tk()
@@ -185,15 +938,36 @@ def main():
     # Настройка главного окна
     root.grid_rowconfigure(0, weight=1)
     root.grid_rowconfigure(1, weight=0)
+    root.grid_rowconfigure(2, weight=0)
     root.grid_columnconfigure(0, weight=1)
 
     # Холст для отрисовки
     space = tkinter.Canvas(root, bg="black")
     space.grid(row=0, column=0, sticky="nsew")
+    item_pool = CanvasItemPool(space)
+    canvas_updater = CanvasUpdater(space, item_pool)
+
+    # Приближение колесом мыши и сдвиг перетаскиванием
+    space.bind("<MouseWheel>", on_mouse_wheel)
+    space.bind("<Button-4>", on_mouse_wheel)
+    space.bind("<Button-5>", on_mouse_wheel)
+    space.bind("<ButtonPress-1>", on_drag_start)
+    space.bind("<B1-Motion>", on_drag)
+    space.bind("<ButtonRelease-1>", on_drag_end)
+    space.bind("<Motion>", on_mouse_motion)
+
+    # Шкала времени для перемотки записанного расчёта
+    timeline_time = tkinter.DoubleVar(value=0.0)
+    timeline = tkinter.Scale(root, variable=timeline_time, orient=tkinter.HORIZONTAL,
+                             from_=0, to=0, resolution=0, showvalue=False,
+                             command=on_timeline_move)
+    timeline.grid(row=1, column=0, sticky="ew")
+    timeline.bind("<ButtonPress-1>", on_timeline_press, add="+")
+    timeline.bind("<ButtonRelease-1>", on_timeline_release, add="+")
 
     # Фрейм для кнопок
     frame = tkinter.Frame(root, height=50, bg="lightgray")
-    frame.grid(row=1, column=0, sticky="ew")
+    frame.grid(row=2, column=0, sticky="ew")
 
     # Кнопка Start/Pause
     start_button = tkinter.Button(frame, text="Start", command=start_execution, width=6)
@@ -204,12 +978,27 @@ def main():
     time_step_entry = tkinter.Entry(frame, textvariable=time_step, width=5)
     time_step_entry.pack(side=tkinter.LEFT, padx=5, pady=5)
 
-    # Шкала скорости
-    time_speed = tkinter.DoubleVar(value=50)
+    # Шкала скорости: доля кадра, отдаваемая расчёту, %
+    time_speed = tkinter.DoubleVar(value=80)
     scale = tkinter.Scale(frame, variable=time_speed, orient=tkinter.HORIZONTAL,
                           from_=1, to=100, length=150)
     scale.pack(side=tkinter.LEFT, padx=5, pady=5)
 
+    # Заданная скорость модельного времени (0 — сколько успевает расчёт)
+    sim_rate = tkinter.DoubleVar(value=0)
+    sim_rate_entry = tkinter.Entry(frame, textvariable=sim_rate, width=7)
+    sim_rate_entry.pack(side=tkinter.LEFT, padx=5, pady=5)
+
+    # Расчёт в отдельном процессе (действует при следующем запуске)
+    process_mode = tkinter.BooleanVar(value=False)
+    process_check = tkinter.Checkbutton(frame, text="Process", variable=process_mode)
+    process_check.pack(side=tkinter.LEFT, padx=5, pady=5)
+
+    # Сглаживание движения между шагами расчёта
+    interpolation_mode = tkinter.StringVar(value="off")
+    interpolation_menu = tkinter.OptionMenu(frame, interpolation_mode, *INTERPOLATION_MODES)
+    interpolation_menu.pack(side=tkinter.LEFT, padx=5, pady=5)
+
     # Кнопки загрузки/сохранения
     load_file_button = tkinter.Button(frame, text="Open file...", command=open_file_dialog)
     load_file_button.pack(side=tkinter.LEFT, padx=5, pady=5)
@@ -217,14 +1006,55 @@ def main():
     save_file_button = tkinter.Button(frame, text="Save to file...", command=save_file_dialog)
     save_file_button.pack(side=tkinter.LEFT, padx=5, pady=5)
 
+    # Режимы отрисовки
+    render_mode = tkinter.StringVar(value="items")
+    for text, mode in (("Items", "items"), ("Raster", "raster"), ("LOD", "lod")):
+        mode_button = tkinter.Radiobutton(frame, text=text, value=mode, variable=render_mode,
+                                          command=change_render_mode)
+        mode_button.pack(side=tkinter.LEFT, padx=2, pady=5)
+
+    density_mode = tkinter.BooleanVar(value=False)
+    density_check = tkinter.Checkbutton(frame, text="Density", variable=density_mode,
+                                        command=draw_bodies)
+    density_check.pack(side=tkinter.LEFT, padx=5, pady=5)
+
+    # Следы движения тел
+    trails_mode = tkinter.BooleanVar(value=False)
+    trails_check = tkinter.Checkbutton(frame, text="Trails", variable=trails_mode,
+                                       command=change_trails_mode)
+    trails_check.pack(side=tkinter.LEFT, padx=5, pady=5)
+
+    # Замеры фаз кадра и снимок профиля
+    profile_mode = tkinter.BooleanVar(value=False)
+    profile_check = tkinter.Checkbutton(frame, text="Profile", variable=profile_mode,
+                                        command=change_profile_mode)
+    profile_check.pack(side=tkinter.LEFT, padx=5, pady=5)
+
+    capture_button = tkinter.Button(frame, text="Capture...", command=capture_profile)
+    capture_button.pack(side=tkinter.LEFT, padx=5, pady=5)
+
+    # Ход и отмена фоновой загрузки/сохранения
+    cancel_button = tkinter.Button(frame, text="Cancel", command=cancel_task,
+                                   state=tkinter.DISABLED)
+    cancel_button.pack(side=tkinter.LEFT, padx=5, pady=5)
+
+    status_text = tkinter.StringVar()
+    status_label = tkinter.Label(frame, textvariable=status_text)
+    status_label.pack(side=tkinter.LEFT, padx=5, pady=5)
+
     # Метка времени
     displayed_time = tkinter.StringVar()
     displayed_time.set("0.0 seconds gone")
     time_label = tkinter.Label(frame, textvariable=displayed_time)
     time_label.pack(side=tkinter.RIGHT, padx=10, pady=5)
 
+    performance_text = tkinter.StringVar()
+    performance_label = tkinter.Label(frame, textvariable=performance_text)
+    performance_label.pack(side=tkinter.RIGHT, padx=10, pady=5)
+
     root.mainloop()
-    print('Modelling finished!')
+    stop_process()
+    logger.info('Modelling finished!')
 
 
 if __name__ == "__main__":
@@ -0,0 +1,182 @@
+# coding: utf-8
+# license: GPLv3
+
+"""
+Метрики долгих расчётов.
+MetricsRecorder раз в interval секунд снимает показатели расчёта (шагов в
+секунду, модельное время, число тел, дрейф полной энергии, занятую память,
+задержку записи контрольной точки) и записывает их строкой JSON в журнал
+и/или в текстовый файл в формате Prometheus. Файл Prometheus каждый раз
+переписывается целиком через временный файл и os.replace, поэтому
+сборщик (node_exporter textfile) никогда не прочтёт его наполовину.
+Модуль не импортирует NumPy: solar_state загружается при первом расчёте энергии.
+Полная энергия считается за O(n²), поэтому снимается реже остальных
+метрик (раз в energy_interval секунд) и только для систем не больше
+energy_max_bodies тел.
+"""
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+METRICS = {
+    # имя: (тип, описание)
+    "solar_steps_per_second": ("gauge", "Шагов расчёта в секунду за последний интервал"),
+    "solar_sim_time_seconds": ("gauge", "Модельное время"),
+    "solar_steps_total": ("counter", "Шагов расчёта с начала задачи"),
+    "solar_bodies": ("gauge", "Число тел"),
+    "solar_energy_drift": ("gauge", "Относительное изменение полной энергии"),
+    "solar_rss_bytes": ("gauge", "Резидентная память процесса"),
+    "solar_checkpoint_latency_seconds": ("gauge", "Время записи последней контрольной точки"),
+    "solar_checkpoints_total": ("counter", "Записано контрольных точек"),
+}
+
+ENERGY_INTERVAL = 60.0
+"""Период расчёта полной энергии по умолчанию, с"""
+
+ENERGY_MAX_BODIES = 10000
+"""Наибольшее число тел, для которого по умолчанию считается энергия"""
+
+
+def rss_bytes():
+    """Резидентная память процесса в байтах (пиковая, если текущая
+    недоступна) или None."""
+    try:
+        with open("/proc/self/statm", 'r') as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux сообщает килобайты, macOS — байты
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _prometheus_value(value):
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class MetricsRecorder:
+    """Снимает и записывает метрики расчёта.
+
+    Использование в цикле расчёта:
+        if metrics.due():
+            metrics.sample(state, sim_time, step, elapsed)
+        ...
+        metrics.checkpoint(секунд записи)
+        metrics.close()
+
+    labels — метки ряда Prometheus (например, движок и метод).
+    energy_interval и energy_max_bodies ограничивают расчёт энергии.
+    """
+    def __init__(self, jsonl_path=None, prometheus_path=None, interval=5.0, labels=None,
+                 energy_interval=ENERGY_INTERVAL, energy_max_bodies=ENERGY_MAX_BODIES):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.interval = interval
+        self.energy_interval = energy_interval
+        self.energy_max_bodies = energy_max_bodies
+        self.labels = dict(labels or {})
+        self.values = {name: None for name in METRICS}
+        self.values["solar_checkpoints_total"] = 0
+        self._jsonl = open(jsonl_path, 'a', encoding='utf-8') if jsonl_path else None
+        self._energy = None
+        self._next_energy = time.monotonic()
+        self._last_step = None
+        self._last_elapsed = 0.0
+        self._next = time.monotonic()
+
+    def due(self):
+        """Пора ли снимать метрики; дешёвая проверка для каждого шага."""
+        return time.monotonic() >= self._next
+
+    def sample(self, state, sim_time, step, elapsed, energy=None):
+        """Снимает метрики для состояния state и записывает их.
+        elapsed — секунд расчёта с начала задачи. Первый расчёт энергии
+        запоминает начальную энергию, от которой считается дрейф.
+        energy=None считает энергию раз в energy_interval секунд,
+        True — при каждом вызове (например, в конце расчёта), False — никогда;
+        системы больше energy_max_bodies тел пропускаются всегда."""
+        if self._last_step is not None and elapsed > self._last_elapsed:
+            self.values["solar_steps_per_second"] = \
+                (step - self._last_step) / (elapsed - self._last_elapsed)
+        self._last_step, self._last_elapsed = step, elapsed
+        self.values["solar_sim_time_seconds"] = sim_time
+        self.values["solar_steps_total"] = step
+        self.values["solar_bodies"] = len(state)
+        self.values["solar_rss_bytes"] = rss_bytes()
+        if energy is None:
+            energy = time.monotonic() >= self._next_energy
+        if energy and len(state) > self.energy_max_bodies:
+            if self._next_energy != float("inf"):
+                logger.info("Энергия не считается: %d тел больше %d", len(state),
+                            self.energy_max_bodies)
+            self._next_energy = float("inf")
+        elif energy:
+            from solar_state import total_energy
+            self._next_energy = time.monotonic() + self.energy_interval
+            current = total_energy(state)
+            if self._energy is None:
+                self._energy = current
+            if self._energy:
+                self.values["solar_energy_drift"] = abs((current - self._energy) / self._energy)
+        self.flush()
+
+    def checkpoint(self, latency):
+        """Учитывает запись контрольной точки, длившуюся latency секунд."""
+        self.values["solar_checkpoint_latency_seconds"] = latency
+        self.values["solar_checkpoints_total"] += 1
+
+    def flush(self):
+        """Записывает текущие значения и назначает следующий замер."""
+        self._next = time.monotonic() + self.interval
+        if self._jsonl is not None:
+            record = {"time": time.time(), **self.labels, **self.values}
+            self._jsonl.write(json.dumps(record) + "\n")
+            self._jsonl.flush()
+        if self.prometheus_path:
+            self._write_prometheus()
+        logger.debug("Метрики: %s", self.values)
+
+    def _write_prometheus(self):
+        labels = ",".join(f'{key}="{value}"' for key, value in sorted(self.labels.items()))
+        labels = "{" + labels + "}" if labels else ""
+        lines = []
+        for name, (kind, description) in METRICS.items():
+            value = self.values[name]
+            if value is None:
+                continue
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name}{labels} {_prometheus_value(value)}")
+        directory = os.path.dirname(os.path.abspath(self.prometheus_path))
+        descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, 'w', encoding='utf-8') as prometheus_file:
+                prometheus_file.write("\n".join(lines) + "\n")
+            # mkstemp создаёт файл только для владельца; сборщик может работать от другого пользователя
+            os.chmod(temporary, 0o644)
+            os.replace(temporary, self.prometheus_path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def close(self):
+        if self._jsonl is not None:
+            self._jsonl.close()
+            self._jsonl = None
+
+
+if __name__ == "__main__":
+    print("This module is not for direct call!")
@@ -58,17 +58,8 @@ def move_space_object(body, dt):
     body.x += body.Vx * dt
     body.y += body.Vy * dt
 
-def recalculate_space_objects_positions(space_objects, dt):
-    """Основной цикл пересчета физики системы"""
-    # Вычисляем все силы
-    for body in space_objects:
-        calculate_force(body, space_objects)
-
-    # Обновляем позиции
-    for body in space_objects:
-        move_space_object(body, dt)
-
-    # Корректировка спутников - фиксируем их на орбитах
+def fix_moon_orbits(space_objects):
+    """Корректировка спутников - фиксируем их на круговых орбитах вокруг планет"""
     for body in space_objects:
         if getattr(body, 'type', None) == 'moon' and hasattr(body, 'parent'):
             parent = body.parent
@@ -84,6 +75,42 @@ def recalculate_space_objects_positions(space_objects, dt):
             body.Vx = parent.Vx - orbital_speed * math.sin(angle)
             body.Vy = parent.Vy + orbital_speed * math.cos(angle)
 
+def recalculate_space_objects_positions(space_objects, dt):
+    """Основной цикл пересчета физики системы"""
+    # Вычисляем все силы
+    for body in space_objects:
+        calculate_force(body, space_objects)
+
+    # Обновляем позиции
+    for body in space_objects:
+        move_space_object(body, dt)
+
+    fix_moon_orbits(space_objects)
+
+def leapfrog_space_objects_positions(space_objects, dt):
+    """Шаг методом leapfrog (полшага по координатам, шаг по скоростям,
+    полшага по координатам). Второй порядок точности и одно вычисление
+    сил за шаг, как у метода Эйлера"""
+    for body in space_objects:
+        body.x += body.Vx * dt / 2
+        body.y += body.Vy * dt / 2
+
+    for body in space_objects:
+        calculate_force(body, space_objects)
+
+    for body in space_objects:
+        # Скорость меняется на полный шаг, координаты — на вторую половину шага
+        body.Vx += body.Fx / (body.m + 1E-10) * dt
+        body.Vy += body.Fy / (body.m + 1E-10) * dt
+        speed = (body.Vx ** 2 + body.Vy ** 2) ** 0.5
+        if speed > max_speed:
+            body.Vx = body.Vx * max_speed / speed
+            body.Vy = body.Vy * max_speed / speed
+        body.x += body.Vx * dt / 2
+        body.y += body.Vy * dt / 2
+
+    fix_moon_orbits(space_objects)
+
 if __name__ == "__main__":
     print("This module is not for direct call!")
 
@@ -0,0 +1,295 @@
+# coding: utf-8
+# license: GPLv3
+
+"""
+Расчёт в отдельном процессе.
+Процесс расчёта публикует координаты и скорости тел в двойной буфер
+в multiprocessing.shared_memory со счётчиком последовательности, а
+интерфейс копирует из него последний кадр без передачи объектов
+CelestialBody. Команды (запуск, пауза, шаг, загрузка, сохранение)
+передаются через очередь управления.
+Модуль не импортирует tkinter и может использоваться без экрана.
+"""
+import logging
+import multiprocessing
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from solar_scheduler import PhysicsScheduler, Snapshot
+
+logger = logging.getLogger(__name__)
+
+HEADER_INTS = 4    # seq, n, active, steps
+HEADER_FLOATS = 6  # время слотов 0/1, шагов/с, время расчёта кадра, публикация слотов 0/1
+ARRAYS = 4         # x, y, Vx, Vy
+
+
+class SharedFrames:
+    """Двойной буфер кадров в разделяемой памяти.
+
+    Писатель заполняет неактивный слот и затем переключает active и
+    увеличивает seq. Следующий кадр пишется в слот, прочитанный последним,
+    поэтому read копирует слот и повторяет чтение, если за время
+    копирования seq изменился.
+    """
+    def __init__(self, n=None, name=None):
+        size = 8 * (HEADER_INTS + HEADER_FLOATS + 2 * ARRAYS * max(n or 0, 1))
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+
+        self.header = np.ndarray(HEADER_INTS, dtype=np.int64, buffer=self.shm.buf)
+        if self.owner:
+            self.header[:] = 0
+            self.header[1] = n
+        n = int(self.header[1])
+        self.meta = np.ndarray(HEADER_FLOATS, dtype=np.float64, buffer=self.shm.buf,
+                               offset=8 * HEADER_INTS)
+        self.slots = np.ndarray((2, ARRAYS, n), dtype=np.float64, buffer=self.shm.buf,
+                                offset=8 * (HEADER_INTS + HEADER_FLOATS))
+        self._last_read = (0, None)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def publish(self, snapshot, steps_per_second=0.0, physics_time=0.0):
+        """Записывает снимок (solar_scheduler.Snapshot) в неактивный слот."""
+        slot = 1 - int(self.header[2])
+        for i, array in enumerate((snapshot.xs, snapshot.ys, snapshot.vxs, snapshot.vys)):
+            self.slots[slot, i] = array
+        self.meta[slot] = snapshot.time
+        self.meta[4 + slot] = snapshot.wall or time.perf_counter()
+        self.meta[2] = steps_per_second
+        self.meta[3] = physics_time
+        self.header[3] = snapshot.steps
+        self.header[2] = slot
+        self.header[0] += 1
+
+    def read(self):
+        """Копия последнего опубликованного кадра как Snapshot или None, если
+        кадров ещё не было. wall — момент публикации (time.perf_counter)."""
+        while True:
+            seq = int(self.header[0])
+            if seq == 0:
+                return None
+            if seq == self._last_read[0]:
+                return self._last_read[1]
+            slot = int(self.header[2])
+            sim_time, wall = float(self.meta[slot]), float(self.meta[4 + slot])
+            steps = int(self.header[3])
+            xs, ys, vxs, vys = self.slots[slot].copy()
+            if int(self.header[0]) == seq:
+                self._last_read = (seq, Snapshot(sim_time, steps, xs, ys, vxs, vys, wall))
+                return self._last_read[1]
+
+    @property
+    def steps_per_second(self):
+        return float(self.meta[2])
+
+    @property
+    def physics_time(self):
+        return float(self.meta[3])
+
+    def close(self):
+        # Массивы держат ссылки на буфер; их нужно отпустить до закрытия
+        self.header = self.meta = self.slots = None
+        self._last_read = (0, None)
+        if self.owner:
+            self.shm.unlink()
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # снимок из буфера ещё используется; память освободится вместе с ним
+
+
+def _physics_process(control, status, input_filename, seed, dt):
+    """Тело процесса расчёта: выполняет команды из очереди control."""
+    from solar_cache import load_space_state
+    from solar_input import write_space_state_to_file
+    from solar_state import recalculate_state_positions
+
+    state = frames = scheduler = None
+    settings = {"dt": dt, "budget_fraction": 0.8, "rate": 0.0}
+    sim_time = 0.0
+
+    def load(filename, load_seed):
+        nonlocal state, frames, sim_time
+        state = load_space_state(filename, load_seed)
+        sim_time = 0.0
+        old_frames, frames = frames, SharedFrames(len(state))
+        frames.publish(Snapshot(0.0, 0, state.x, state.y, state.Vx, state.Vy, 0.0))
+        status.put(("loaded", frames.name, len(state)))
+        if old_frames is not None:
+            old_frames.close()
+
+    def pause():
+        nonlocal scheduler, sim_time
+        if scheduler is not None:
+            scheduler.stop()
+            sim_time = scheduler.sim_time
+            scheduler = None
+
+    load(input_filename, seed)
+    while True:
+        command, *args = control.get()
+        if command == "start" and scheduler is None:
+            current = frames
+            scheduler = PhysicsScheduler(
+                step=lambda step_dt: recalculate_state_positions(state, step_dt),
+                snapshot=lambda: (state.x.copy(), state.y.copy(), state.Vx.copy(), state.Vy.copy()),
+                sim_time=sim_time,
+                on_snapshot=lambda snapshot: current.publish(snapshot, scheduler.steps_per_second,
+                                                             scheduler.physics_time),
+                **settings
+            ).start()
+        elif command == "pause":
+            pause()
+            status.put(("paused", *args))
+        elif command == "set":
+            name, value = args
+            settings[name] = value
+            if scheduler is not None:
+                setattr(scheduler, name, value)
+        elif command == "load":
+            pause()
+            load(*args)
+        elif command == "restore":
+            pause()
+            sim_time, xs, ys, vxs, vys, steps, step_dt = args
+            for name, array in zip(("x", "y", "Vx", "Vy"), (xs, ys, vxs, vys)):
+                getattr(state, name)[:] = array
+            for _ in range(steps):
+                recalculate_state_positions(state, step_dt)
+            sim_time = sim_time + steps * step_dt
+            frames.publish(Snapshot(sim_time, 0, state.x, state.y, state.Vx, state.Vy, 0.0))
+        elif command == "save":
+            running = scheduler is not None
+            pause()
+            write_space_state_to_file(args[0], state)
+            status.put(("saved", args[0]))
+            if running:
+                control.put(("start",))
+        elif command == "stop":
+            pause()
+            frames.close()
+            return
+
+
+class PhysicsProcess:
+    """Управление процессом расчёта из интерфейса.
+
+    Повторяет интерфейс PhysicsScheduler, которым пользуется цикл отрисовки:
+    latest(), steps_per_second и изменяемые на ходу dt, budget_fraction и rate.
+    """
+    def __init__(self, input_filename, seed, dt):
+        context = multiprocessing.get_context("spawn")
+        self.control = context.Queue()
+        self.status = context.Queue()
+        self.frames = None
+        self.process = context.Process(
+            target=_physics_process, daemon=True,
+            args=(self.control, self.status, input_filename, seed, dt))
+        self.process.start()
+        self.pause_requests = 0
+        self.acknowledged_pause = 0
+        self._settings = {"dt": dt, "budget_fraction": 0.8, "rate": 0.0}
+
+    def __getattr__(self, name):
+        settings = self.__dict__.get("_settings", {})
+        if name in settings:
+            return settings[name]
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        settings = self.__dict__.get("_settings", {})
+        if name in settings:
+            if settings[name] != value:
+                settings[name] = value
+                self.control.put(("set", name, value))
+        else:
+            super().__setattr__(name, value)
+
+    def start(self):
+        self.control.put(("start",))
+        return self
+
+    def pause(self):
+        """Ставит расчёт на паузу. Возвращает номер запроса: когда
+        paused(номер) станет истинным, последний кадр — состояние паузы."""
+        self.pause_requests += 1
+        self.control.put(("pause", self.pause_requests))
+        return self.pause_requests
+
+    def paused(self, request):
+        """Подтвердил ли процесс паузу по запросу с номером request."""
+        self.poll()
+        return self.acknowledged_pause >= request
+
+    def load(self, input_filename, seed):
+        self.control.put(("load", input_filename, seed))
+
+    def save(self, output_filename):
+        self.control.put(("save", output_filename))
+
+    def restore(self, sim_time, xs, ys, vxs, vys, steps=0, dt=0.0):
+        """Ставит расчёт на паузу и заменяет координаты и скорости тел
+        (перемотка к опорному кадру), затем досчитывает steps шагов по dt.
+        Результат публикуется кадром на момент sim_time + steps * dt."""
+        self.control.put(("restore", sim_time, xs, ys, vxs, vys, steps, dt))
+
+    def poll(self):
+        """Обрабатывает сообщения процесса; при загрузке подключается к новому буферу."""
+        while True:
+            try:
+                message = self.status.get_nowait()
+            except queue.Empty:
+                return
+            if message[0] == "loaded":
+                if self.frames is not None:
+                    self.frames.close()
+                self.frames = SharedFrames(name=message[1])
+            elif message[0] == "paused":
+                self.acknowledged_pause = max(self.acknowledged_pause, message[1])
+            elif message[0] == "saved":
+                logger.info("Сохранено: %s", message[1])
+
+    def wait_loaded(self, timeout=60):
+        """Ждёт, пока процесс загрузит сценарий и опубликует первый кадр."""
+        deadline = time.perf_counter() + timeout
+        while self.frames is None and time.perf_counter() < deadline:
+            self.poll()
+            time.sleep(0.01)
+        return self.frames is not None
+
+    def latest(self):
+        self.poll()
+        return self.frames.read() if self.frames is not None else None
+
+    @property
+    def steps_per_second(self):
+        return self.frames.steps_per_second if self.frames is not None else 0.0
+
+    @property
+    def physics_time(self):
+        return self.frames.physics_time if self.frames is not None else 0.0
+
+    def stop(self):
+        """Завершает процесс расчёта."""
+        self.control.put(("stop",))
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+        if self.frames is not None:
+            self.frames.close()
+            self.frames = None
+
+
+if __name__ == "__main__":
+    print("This module is not for direct call!")
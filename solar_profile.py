@@ -0,0 +1,139 @@
+# coding: utf-8
+# license: GPLv3
+
+"""
+Замеры времени по фазам кадра.
+Цикл отрисовки отмечает окончание каждой фазы (опрос расчёта, следы,
+отрисовка, надписи), а FrameProfiler накапливает длительности в
+скользящих окнах и выдаёт процентили. Пока профилировщик выключен,
+отметки сводятся к одной проверке флага.
+По запросу профилировщик снимает cProfile или tracemalloc за N кадров
+и записывает результат в файл.
+"""
+import cProfile
+import time
+import tracemalloc
+
+import numpy as np
+
+CAPTURE_KINDS = ("cprofile", "tracemalloc")
+
+
+class RollingStats:
+    """Последние window значений в кольцевом буфере."""
+    def __init__(self, window=120):
+        self.values = np.zeros(window)
+        self.count = 0
+
+    def add(self, value):
+        self.values[self.count % len(self.values)] = value
+        self.count += 1
+
+    def percentiles(self, q=(50, 95, 99)):
+        filled = self.values[:min(self.count, len(self.values))]
+        if not len(filled):
+            return [0.0] * len(q)
+        return np.percentile(filled, q).tolist()
+
+
+class FrameProfiler:
+    """Длительности фаз кадра в миллисекундах.
+
+    Использование в цикле отрисовки:
+        profiler.begin_frame()
+        ...; profiler.mark("render")
+        profiler.end_frame(physics_ms=..., bodies=...)
+    """
+    def __init__(self, window=120):
+        self.enabled = False
+        self.window = window
+        self.phases = {}
+        self.bodies = 0
+        self.physics = RollingStats(window)
+        self.frame_times = RollingStats(window)
+        self._last = self._frame_start = 0.0
+        self._capture = None
+
+    def phase(self, name):
+        if name not in self.phases:
+            self.phases[name] = RollingStats(self.window)
+        return self.phases[name]
+
+    def begin_frame(self):
+        if self._capture is not None:
+            self._capture.begin()
+        if self.enabled:
+            self._last = self._frame_start = time.perf_counter()
+
+    def mark(self, name):
+        """Отмечает конец фазы name, начавшейся с предыдущей отметки."""
+        if self.enabled:
+            now = time.perf_counter()
+            self.phase(name).add((now - self._last) * 1000)
+            self._last = now
+
+    def end_frame(self, physics_ms=0.0, bodies=0):
+        if self.enabled:
+            self.frame_times.add((time.perf_counter() - self._frame_start) * 1000)
+            self.physics.add(physics_ms)
+            self.bodies = bodies
+        if self._capture is not None and self._capture.end():
+            self._capture = None
+
+    def summary(self, fps):
+        """Текст для наложения на холст: медиана и 95-й процентиль фаз."""
+        lines = [f"FPS {fps:.0f}   bodies drawn {self.bodies}"]
+        for name, stats in (("physics", self.physics), ("frame", self.frame_times),
+                            *self.phases.items()):
+            p50, p95, p99 = stats.percentiles()
+            lines.append(f"{name:8s} p50 {p50:6.2f}  p95 {p95:6.2f}  p99 {p99:6.2f} ms")
+        return "\n".join(lines)
+
+    def capture(self, kind, frames, filename, on_done=None):
+        """Снимает профиль следующих frames кадров в filename.
+        cProfile охватывает только поток интерфейса; расчёт в отдельном
+        потоке или процессе виден в overlay как фаза physics."""
+        if kind not in CAPTURE_KINDS:
+            raise ValueError(f"Неизвестный вид профиля: {kind}")
+        self._capture = _Capture(kind, frames, filename, on_done)
+
+    @property
+    def capturing(self):
+        return self._capture is not None
+
+
+class _Capture:
+    def __init__(self, kind, frames, filename, on_done):
+        self.kind = kind
+        self.frames = frames
+        self.filename = filename
+        self.on_done = on_done
+        self.profile = None
+
+    def begin(self):
+        if self.kind == "cprofile":
+            if self.profile is None:
+                self.profile = cProfile.Profile()
+            self.profile.enable()
+        elif not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def end(self):
+        """Завершает кадр; возвращает True, когда профиль записан."""
+        if self.kind == "cprofile":
+            self.profile.disable()
+        self.frames -= 1
+        if self.frames > 0:
+            return False
+        if self.kind == "cprofile":
+            self.profile.dump_stats(self.filename)
+        else:
+            tracemalloc.take_snapshot().dump(self.filename)
+            tracemalloc.stop()
+        if self.on_done:
+            self.on_done(self.filename)
+        return True
+
+
+if __name__ == "__main__":
+    print("This module is not for direct call!")
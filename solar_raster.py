@@ -0,0 +1,163 @@
+# coding: utf-8
+# license: GPLv3
+
+"""
+Растровая отрисовка: все тела рисуются в один массив RGB, который затем
+выводится на холст одним изображением. Стоимость кадра для tkinter
+не зависит от числа тел, в отличие от отдельного овала на каждое тело.
+Модуль не импортирует tkinter, пока не создан RasterLayer, поэтому
+растеризацию можно использовать и без экрана.
+"""
+import numpy as np
+
+import solar_vis
+
+DRAW_ORDER = ("planet", "moon", "star")
+"""Порядок наложения типов тел: звёзды рисуются поверх всего"""
+
+MIN_DRAW_RADIUS = {"star": 15, "planet": 1, "moon": 3}
+"""Минимальные радиусы в пикселах, как в create_*_image модуля solar_vis"""
+
+
+def hex_to_rgb(color):
+    """'#RRGGBB' -> (r, g, b)."""
+    color = color.lstrip('#')
+    return tuple(int(color[i:i + 2], 16) for i in (0, 2, 4))
+
+
+class RasterBodies:
+    """Неизменные между кадрами данные для растеризации: цвета, радиусы
+    и порядок наложения. Координаты передаются при каждом кадре."""
+    def __init__(self, types, colors, radii):
+        types = np.asarray(types)
+        self.rgb = np.zeros((len(types), 3), dtype=np.uint8)
+        for body_type in np.unique(types):
+            for color in np.unique(np.asarray(colors)[types == body_type]):
+                mask = (types == body_type) & (np.asarray(colors) == color)
+                self.rgb[mask] = hex_to_rgb(solar_vis.fill_color(str(body_type), str(color)))
+        # Цвет, упакованный в одно число, чтобы рисовать пиксел одной записью
+        self.packed = ((self.rgb[:, 0].astype(np.uint32) << 16) |
+                       (self.rgb[:, 1].astype(np.uint32) << 8) | self.rgb[:, 2])
+
+        minimum = np.array([MIN_DRAW_RADIUS.get(t, 1) for t in DRAW_ORDER])
+        layer = np.array([DRAW_ORDER.index(t) if t in DRAW_ORDER else 0 for t in types.tolist()],
+                         dtype=np.int64)
+        self.radius = np.maximum(np.asarray(radii), minimum[layer]).astype(np.int64)
+
+        # Группы тел одного слоя и радиуса рисуются одной операцией
+        self.groups = []
+        for current_layer in np.unique(layer):
+            for radius in np.unique(self.radius[layer == current_layer]):
+                indices = np.flatnonzero((layer == current_layer) & (self.radius == radius))
+                self.groups.append((indices, int(radius)))
+
+    @classmethod
+    def from_objects(cls, space_objects):
+        return cls([obj.type for obj in space_objects],
+                   [obj.color for obj in space_objects],
+                   [obj.R for obj in space_objects])
+
+    @classmethod
+    def from_state(cls, state):
+        from solar_state import TYPE_NAMES
+        return cls(np.array(TYPE_NAMES)[state.kind], state.color, state.R)
+
+
+_disc_offsets = {}
+
+
+def _disc(radius):
+    """Смещения пикселов круга радиуса radius (кэшируются)."""
+    if radius not in _disc_offsets:
+        d = np.arange(-radius, radius + 1)
+        dy, dx = np.meshgrid(d, d, indexing='ij')
+        inside = dx ** 2 + dy ** 2 <= radius ** 2
+        _disc_offsets[radius] = (dy[inside], dx[inside])
+    return _disc_offsets[radius]
+
+
+def render_frame(xs, ys, bodies, width, height, density=False, out=None, view=None):
+    """Рисует тела в массив (height, width, 3) uint8.
+
+    xs, ys — физические координаты в порядке bodies.
+    density=True включает аддитивное затенение: яркость пиксела растёт
+    логарифмически с числом попавших в него тел, что показывает плотность
+    скоплений, где отдельные тела сливаются.
+    view — преобразование координат (solar_vis.ViewTransform), по умолчанию
+    текущий вид интерфейса.
+    """
+    if out is None:
+        out = np.zeros((height, width, 3), dtype=np.uint8)
+    else:
+        out[:] = 0
+    px, py = (view or solar_vis.view).project(xs, ys)
+
+    if density:
+        _render_density(px, py, bodies, width, height, out)
+        return out
+
+    packed = np.zeros(width * height, dtype=np.uint32)
+    for indices, radius in bodies.groups:
+        dy, dx = _disc(radius)
+        x = (px[indices][:, None] + dx).ravel()
+        y = (py[indices][:, None] + dy).ravel()
+        visible = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        color = np.broadcast_to(bodies.packed[indices][:, None], (len(indices), len(dx))).ravel()
+        packed[y[visible] * width + x[visible]] = color[visible]
+
+    flat = out.reshape(-1, 3)
+    flat[:, 0] = packed >> 16
+    flat[:, 1] = packed >> 8
+    flat[:, 2] = packed
+    return out
+
+
+def _render_density(px, py, bodies, width, height, out):
+    visible = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+    pixel = py[visible] * width + px[visible]
+    rgb = bodies.rgb[visible].astype(np.float64)
+    count = np.bincount(pixel, minlength=width * height)
+    lit = count > 0
+    weight = np.log1p(count[lit])
+    weight /= max(weight.max(), 1E-12)
+    for channel in range(3):
+        total = np.bincount(pixel, weights=rgb[:, channel], minlength=width * height)
+        # Средний цвет пиксела, яркость по логарифму числа тел
+        value = total[lit] / count[lit] * (0.35 + 0.65 * weight)
+        out.reshape(-1, 3)[lit, channel] = np.clip(value, 0, 255).astype(np.uint8)
+
+
+def to_ppm(frame):
+    """Кадр (height, width, 3) uint8 -> данные двоичного PPM."""
+    height, width = frame.shape[:2]
+    return b"P6 %d %d 255\n" % (width, height) + np.ascontiguousarray(frame).tobytes()
+
+
+class RasterLayer:
+    """Слой холста tkinter с одним изображением, обновляемым каждый кадр."""
+    def __init__(self, canvas):
+        import tkinter
+        self.canvas = canvas
+        self.photo = tkinter.PhotoImage(master=canvas, width=1, height=1)
+        self.item = canvas.create_image(0, 0, image=self.photo, anchor="nw", tags="raster")
+        canvas.tag_lower(self.item)
+        self.frame = None
+
+    def draw(self, xs, ys, bodies, density=False, overlay=None):
+        """Растеризует тела и выводит кадр на холст.
+        overlay(кадр), если задан, дорисовывает в кадр дополнительные элементы."""
+        width = max(1, self.canvas.winfo_width())
+        height = max(1, self.canvas.winfo_height())
+        if self.frame is None or self.frame.shape[:2] != (height, width):
+            self.frame = np.zeros((height, width, 3), dtype=np.uint8)
+        render_frame(xs, ys, bodies, width, height, density, out=self.frame)
+        if overlay is not None:
+            overlay(self.frame)
+        self.photo.configure(data=to_ppm(self.frame), format="PPM", width=width, height=height)
+
+    def clear(self):
+        self.canvas.delete(self.item)
+
+
+if __name__ == "__main__":
+    print("This module is not for direct call!")
@@ -0,0 +1,123 @@
+# coding: utf-8
+# license: GPLv3
+
+"""
+Опорные кадры для повторного просмотра.
+Во время расчёта KeyframeRecorder сохраняет координаты и скорости всех тел
+каждые every шагов. Память ограничена бюджетом: когда он исчерпан, из уже
+записанных кадров удаляется каждый второй, а промежуток между новыми
+кадрами удваивается, так что кадры остаются равномерно распределёнными
+по всему расчёту.
+Любой момент записанного отрезка восстанавливается сразу: между соседними
+опорными кадрами положения интерполируются кубическим многочленом Эрмита
+по координатам и скоростям, а для продолжения расчёта состояние берётся
+из ближайшего более раннего кадра и досчитывается вперёд.
+"""
+import bisect
+
+import numpy as np
+
+from solar_scheduler import Snapshot
+
+KEYFRAME_OVERHEAD = 512
+"""Оценка накладных расходов на один кадр сверх массивов, байт"""
+
+
+class KeyframeRecorder:
+    """Опорные кадры расчёта системы из n тел в пределах budget байт."""
+    def __init__(self, n, every=10, budget=128 << 20):
+        self.n = n
+        self.every = every
+        self.budget = budget
+        self.times = []
+        self.frames = []
+        """Массивы (4, n): x, y, Vx, Vy"""
+        self._pending = every
+        self._seen = None
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def nbytes(self):
+        return len(self.frames) * (32 * self.n + KEYFRAME_OVERHEAD)
+
+    @property
+    def start_time(self):
+        return self.times[0] if self.times else 0.0
+
+    @property
+    def end_time(self):
+        return self.times[-1] if self.times else 0.0
+
+    def record(self, snapshot):
+        """Учитывает снимок расчёта (solar_scheduler.Snapshot); сохраняет его,
+        если с прошлого кадра прошло не меньше every шагов.
+        Счётчик шагов снимков начинается заново при каждом запуске расчёта.
+        Возвращает True, если кадр сохранён."""
+        if snapshot.vxs is None or len(snapshot.xs) != self.n:
+            return False
+        steps = snapshot.steps
+        done = steps - self._seen if self._seen is not None and steps >= self._seen else steps
+        self._seen = steps
+        self._pending += done
+        if self._pending < self.every or (self.times and snapshot.time <= self.times[-1]):
+            return False
+        self._pending = 0
+        self.add(snapshot.time, snapshot.xs, snapshot.ys, snapshot.vxs, snapshot.vys)
+        return True
+
+    def add(self, sim_time, xs, ys, vxs, vys):
+        """Сохраняет кадр на момент sim_time (позже всех записанных)."""
+        self.times.append(sim_time)
+        self.frames.append(np.array((xs, ys, vxs, vys), dtype=np.float64))
+        while self.nbytes > self.budget and len(self.frames) > 2:
+            self._decimate()
+
+    def _decimate(self):
+        """Удаляет каждый второй записанный кадр (первый и последний
+        сохраняются) и вдвое реже записывает новые."""
+        keep = list(range(0, len(self.frames), 2))
+        if keep[-1] != len(self.frames) - 1:
+            keep.append(len(self.frames) - 1)
+        self.times = [self.times[i] for i in keep]
+        self.frames = [self.frames[i] for i in keep]
+        self.every *= 2
+
+    def truncate(self, sim_time):
+        """Удаляет кадры позже sim_time: расчёт продолжается с этого момента
+        по другой траектории."""
+        end = bisect.bisect_right(self.times, sim_time)
+        del self.times[end:], self.frames[end:]
+        self._pending = 0
+        self._seen = None
+
+    def keyframe(self, sim_time):
+        """Ближайший кадр не позже sim_time (или самый ранний) как Snapshot."""
+        if not self.times:
+            return None
+        i = max(0, bisect.bisect_right(self.times, sim_time) - 1)
+        return Snapshot(self.times[i], 0, *self.frames[i], 0.0)
+
+    def positions(self, sim_time):
+        """Координаты (xs, ys) на момент sim_time без пересчёта: интерполяция
+        Эрмита между соседними кадрами, за пределами записи — крайний кадр."""
+        if not self.times:
+            return None
+        i = bisect.bisect_right(self.times, sim_time)
+        if i == 0 or i == len(self.times):
+            frame = self.frames[min(i, len(self.times) - 1)]
+            return frame[0], frame[1]
+        t0, t1 = self.times[i - 1], self.times[i]
+        (x0, y0, vx0, vy0), (x1, y1, vx1, vy1) = self.frames[i - 1], self.frames[i]
+        h = t1 - t0
+        s = (sim_time - t0) / h
+        s2, s3 = s * s, s * s * s
+        h00, h10 = 2 * s3 - 3 * s2 + 1, (s3 - 2 * s2 + s) * h
+        h01, h11 = -2 * s3 + 3 * s2, (s3 - s2) * h
+        return (h00 * x0 + h10 * vx0 + h01 * x1 + h11 * vx1,
+                h00 * y0 + h10 * vy0 + h01 * y1 + h11 * vy1)
+
+
+if __name__ == "__main__":
+    print("This module is not for direct call!")
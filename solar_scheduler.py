@@ -0,0 +1,122 @@
+# coding: utf-8
+# license: GPLv3
+
+"""
+Планировщик расчёта, отделённый от отрисовки.
+Физика выполняется в отдельном потоке: за каждый кадр делается столько
+шагов, сколько помещается в бюджет времени кадра (или сколько нужно для
+заданной скорости модельного времени), после чего публикуется снимок
+координат. Интерфейс с постоянной частотой кадров рисует последний снимок.
+"""
+import threading
+import time
+from collections import namedtuple
+
+Snapshot = namedtuple("Snapshot", "time steps xs ys vxs vys wall")
+"""Снимок расчёта: модельное время, число шагов от начала, координаты и
+скорости тел (скорости могут отсутствовать) и момент публикации по
+time.perf_counter"""
+
+
+class PhysicsScheduler:
+    """Выполняет step(dt) в фоновом потоке кадрами по frame_period секунд.
+
+    snapshot() вызывается в конце каждого кадра под блокировкой lock и
+    должен вернуть массивы (xs, ys) или (xs, ys, vxs, vys). Параметры dt, budget_fraction
+    (доля кадра, отдаваемая расчёту) и rate (модельных секунд в секунду,
+    0 — без ограничения) можно менять на ходу из потока интерфейса.
+    on_snapshot(снимок), если задан, вызывается в потоке расчёта после
+    публикации каждого снимка.
+    """
+    def __init__(self, step, snapshot, dt, sim_time=0.0, target_fps=60,
+                 budget_fraction=0.8, rate=0.0, on_snapshot=None):
+        self.step = step
+        self.snapshot = snapshot
+        self.on_snapshot = on_snapshot
+        self.dt = dt
+        self.sim_time = sim_time
+        self.frame_period = 1.0 / target_fps
+        self.budget_fraction = budget_fraction
+        self.rate = rate
+        self.steps = 0
+        self.steps_per_second = 0.0
+        self.physics_time = 0.0
+        """Длительность шагов расчёта в последнем кадре, с"""
+        self.lock = threading.Lock()
+        """Удерживается на время шагов расчёта; захватив его, можно безопасно
+        читать или менять объекты расчёта из другого потока"""
+        self._latest = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Останавливает поток расчёта и дожидается окончания текущего кадра."""
+        self._stop.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def latest(self):
+        """Последний опубликованный снимок или None."""
+        return self._latest
+
+    def _run(self):
+        carry = 0.0
+        window_start, window_steps = time.perf_counter(), 0
+        while not self._stop.is_set():
+            frame_start = time.perf_counter()
+            budget = self.frame_period * self.budget_fraction
+            dt = self.dt
+            if self.rate > 0 and dt > 0:
+                carry += self.rate * self.frame_period / dt
+                wanted = int(carry)
+                carry -= wanted
+            else:
+                wanted = None
+
+            done = 0
+            with self.lock:
+                while wanted is None or done < wanted:
+                    # Хотя бы один шаг за кадр, даже если шаг дольше бюджета
+                    if done and time.perf_counter() - frame_start >= budget:
+                        break
+                    self.step(dt)
+                    self.sim_time += dt
+                    done += 1
+                self.steps += done
+                self.physics_time = time.perf_counter() - frame_start
+                arrays = tuple(self.snapshot()) + (None, None)
+            if wanted is not None and done < wanted:
+                carry = 0.0  # не успеваем: не копим отставание
+            self._latest = Snapshot(self.sim_time, self.steps, *arrays[:4], time.perf_counter())
+            if self.on_snapshot:
+                self.on_snapshot(self._latest)
+
+            window_steps += done
+            now = time.perf_counter()
+            if now - window_start >= 1.0:
+                self.steps_per_second = window_steps / (now - window_start)
+                window_start, window_steps = now, 0
+            self._stop.wait(max(0.0, frame_start + self.frame_period - now))
+
+
+class FrameCounter:
+    """Считает фактическую частоту кадров интерфейса."""
+    def __init__(self):
+        self.fps = 0.0
+        self._start = time.perf_counter()
+        self._frames = 0
+
+    def tick(self):
+        self._frames += 1
+        now = time.perf_counter()
+        if now - self._start >= 1.0:
+            self.fps = self._frames / (now - self._start)
+            self._start, self._frames = now, 0
+
+
+if __name__ == "__main__":
+    print("This module is not for direct call!")
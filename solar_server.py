@@ -0,0 +1,333 @@
+# coding: utf-8
+# license: GPLv3
+
+"""
+Сервер расчёта для нескольких зрителей.
+Один расчёт выполняется на сервере, а кадры с координатами тел
+рассылаются зрителям (solar_viewer) по локальному сокету TCP или Unix.
+
+Формат потока: сообщения с длиной в 4 байта впереди.
+    H — приветствие: JSON с числом тел, шагом квантования и неизменными
+        свойствами тел (тип, радиус, цвет, родитель);
+    K — опорный кадр: квантованные координаты целиком;
+    D — разностный кадр: изменение квантованных координат с прошлого кадра.
+Координаты квантуются целыми числами с шагом resolution метров и
+сжимаются zlib; ширина целых (2, 4 или 8 байт) выбирается по кадру.
+Каждый кадр кодируется один раз для всех зрителей, поэтому нагрузка на
+сервер почти не зависит от их числа. Зрителю, у которого переполнен
+буфер отправки, кадр пропускается; следующим он получает опорный кадр.
+
+Пример:
+    python solar_server.py synthetic_scaling.txt --dt 60 --steps-per-frame 10 --port 8765
+    python solar_viewer.py --port 8765
+"""
+import argparse
+import asyncio
+import json
+import logging
+import socket
+import struct
+import zlib
+
+import numpy as np
+
+from solar_engines import ENGINES, INTEGRATORS, create_engine
+
+logger = logging.getLogger(__name__)
+
+LENGTH = struct.Struct("<I")
+FRAME_HEADER = struct.Struct("<cIdB")  # тип, номер кадра, модельное время, ширина целых
+
+WIDTHS = {2: np.int16, 4: np.int32, 8: np.int64}
+
+DEFAULT_PORT = 8765
+
+MAX_BUFFER = 1 << 20
+"""Сколько байт может скопиться в буфере отправки зрителя, прежде чем
+ему начнут пропускаться кадры"""
+
+
+def _pack(kind, seq, sim_time, values, level=1):
+    """Сообщение кадра: значения упаковываются в самые узкие подходящие целые."""
+    limit = int(np.abs(values).max()) if len(values) else 0
+    width = next(width for width, dtype in WIDTHS.items() if limit <= np.iinfo(dtype).max)
+    payload = zlib.compress(values.astype(WIDTHS[width]).tobytes(), level)
+    body = FRAME_HEADER.pack(kind, seq, sim_time, width) + payload
+    return LENGTH.pack(len(body)) + body
+
+
+def hello_message(state, resolution, origin):
+    """Приветствие с неизменными свойствами тел."""
+    body = b"H" + json.dumps({
+        "n": len(state),
+        "resolution": resolution,
+        "origin": origin,
+        "kind": np.asarray(state.kind).tolist(),
+        "R": np.asarray(state.R).tolist(),
+        "color": np.asarray(state.color).tolist(),
+        "parent": np.asarray(state.parent).tolist(),
+    }).encode("utf-8")
+    return LENGTH.pack(len(body)) + body
+
+
+class FrameEncoder:
+    """Квантует кадры и готовит для них опорное и разностное сообщения.
+    Оба сообщения строятся не больше одного раза на кадр."""
+    def __init__(self, resolution, origin=(0.0, 0.0)):
+        self.resolution = resolution
+        self.origin = origin
+        self.seq = 0
+        self.sim_time = 0.0
+        self.current = None
+        self.previous = None
+        self._keyframe = self._delta = None
+
+    def push(self, xs, ys, sim_time):
+        """Новый кадр с координатами xs, ys."""
+        quantized = np.concatenate((np.rint((np.asarray(xs) - self.origin[0]) / self.resolution),
+                                    np.rint((np.asarray(ys) - self.origin[1]) / self.resolution)))
+        self.previous, self.current = self.current, quantized.astype(np.int64)
+        self.seq += 1
+        self.sim_time = sim_time
+        self._keyframe = self._delta = None
+
+    def keyframe(self):
+        if self._keyframe is None:
+            self._keyframe = _pack(b"K", self.seq, self.sim_time, self.current)
+        return self._keyframe
+
+    def delta(self):
+        """Разность с прошлым кадром (или опорный кадр, если прошлого нет)."""
+        if self.previous is None:
+            return self.keyframe()
+        if self._delta is None:
+            self._delta = _pack(b"D", self.seq, self.sim_time, self.current - self.previous)
+        return self._delta
+
+
+class FrameDecoder:
+    """Восстанавливает координаты из сообщений FrameEncoder."""
+    def __init__(self, hello):
+        self.n = hello["n"]
+        self.resolution = hello["resolution"]
+        self.origin = hello["origin"]
+        self.seq = None
+        self.current = None
+
+    def decode(self, body):
+        """Возвращает (номер кадра, модельное время, xs, ys)."""
+        kind, seq, sim_time, width = FRAME_HEADER.unpack_from(body)
+        values = np.frombuffer(zlib.decompress(body[FRAME_HEADER.size:]), WIDTHS[width])
+        if kind == b"K":
+            self.current = values.astype(np.int64)
+        elif kind == b"D":
+            if self.seq != seq - 1:
+                raise ValueError(f"Разностный кадр {seq} без кадра {seq - 1}")
+            self.current = self.current + values
+        else:
+            raise ValueError(f"Неизвестный тип кадра: {kind!r}")
+        self.seq = seq
+        xs = self.current[:self.n] * self.resolution + self.origin[0]
+        ys = self.current[self.n:] * self.resolution + self.origin[1]
+        return seq, sim_time, xs, ys
+
+
+class _Viewer:
+    def __init__(self, writer):
+        self.writer = writer
+        self.seq = None
+        """Номер последнего отправленного кадра"""
+        self.dropped = 0
+        self.task = None
+
+
+class SimulationServer:
+    """Расчёт движком engine и рассылка кадров зрителям.
+
+    Шаги движка выполняются в отдельном потоке, чтобы цикл asyncio
+    продолжал отправку кадров. resolution — шаг квантования координат,
+    по умолчанию миллионная доля размера системы.
+    """
+    def __init__(self, engine, dt, steps_per_frame=1, fps=30, resolution=None,
+                 max_buffer=MAX_BUFFER, sim_time=0.0):
+        self.engine = engine
+        self.dt = dt
+        self.steps_per_frame = steps_per_frame
+        self.fps = fps
+        self.max_buffer = max_buffer
+        self.sim_time = sim_time
+        self.viewers = set()
+        self.bytes_sent = 0
+
+        state = engine.to_state()
+        x, y = np.asarray(state.x, dtype=float), np.asarray(state.y, dtype=float)
+        extent = max(np.ptp(x), np.ptp(y)) if len(x) else 1.0
+        origin = (float(x.mean()), float(y.mean())) if len(x) else (0.0, 0.0)
+        self.resolution = resolution or (extent or 1.0) / (1 << 20)
+        self.hello = hello_message(state, self.resolution, origin)
+        self.encoder = FrameEncoder(self.resolution, origin)
+        self.encoder.push(x, y, sim_time)
+        self.server = None
+
+    async def start(self, host=None, port=DEFAULT_PORT, path=None):
+        """Начинает принимать зрителей на TCP host:port или сокете Unix path."""
+        if path:
+            self.server = await asyncio.start_unix_server(self._accept, path)
+        else:
+            self.server = await asyncio.start_server(self._accept, host or "127.0.0.1", port)
+        return self.server
+
+    async def _accept(self, reader, writer):
+        sock = writer.get_extra_info("socket")
+        if sock is not None and sock.family in (socket.AF_INET, socket.AF_INET6):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        viewer = _Viewer(writer)
+        viewer.task = asyncio.current_task()
+        writer.write(self.hello)
+        self.viewers.add(viewer)
+        logger.info("Зритель подключён, всего %d", len(self.viewers))
+        try:
+            # Зритель ничего не присылает: ждём закрытия соединения
+            await reader.read()
+        except ConnectionError:
+            pass
+        finally:
+            self.viewers.discard(viewer)
+            writer.close()
+            logger.info("Зритель отключён, пропущено кадров: %d", viewer.dropped)
+
+    def _advance(self):
+        for _ in range(self.steps_per_frame):
+            self.engine.step(self.dt)
+            self.sim_time += self.dt
+        state = self.engine.to_state()
+        self.encoder.push(state.x, state.y, self.sim_time)
+
+    def broadcast(self):
+        """Отправляет текущий кадр всем зрителям, успевающим его принять."""
+        encoder = self.encoder
+        for viewer in list(self.viewers):
+            transport = viewer.writer.transport
+            if transport.is_closing():
+                self.viewers.discard(viewer)
+                continue
+            if transport.get_write_buffer_size() > self.max_buffer:
+                viewer.dropped += 1
+                continue
+            message = encoder.delta() if viewer.seq == encoder.seq - 1 else encoder.keyframe()
+            viewer.writer.write(message)
+            viewer.seq = encoder.seq
+            self.bytes_sent += len(message)
+
+    async def run(self, frames=None):
+        """Рассчитывает и рассылает frames кадров (без ограничения, если None)."""
+        loop = asyncio.get_running_loop()
+        period = 1 / self.fps if self.fps else 0
+        done = 0
+        while frames is None or done < frames:
+            start = loop.time()
+            await loop.run_in_executor(None, self._advance)
+            self.broadcast()
+            done += 1
+            await asyncio.sleep(max(0.0, period - (loop.time() - start)))
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        viewers = list(self.viewers)
+        for viewer in viewers:
+            viewer.writer.close()
+        # Обработчики завершаются, получив конец потока от закрытых соединений
+        await asyncio.gather(*(viewer.task for viewer in viewers), return_exceptions=True)
+
+
+class StreamClient:
+    """Блокирующий клиент потока кадров для тонких зрителей."""
+    def __init__(self, host=None, port=DEFAULT_PORT, path=None, timeout=None):
+        if path:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.settimeout(timeout)
+            self.socket.connect(path)
+        else:
+            self.socket = socket.create_connection((host or "127.0.0.1", port), timeout)
+        self.file = self.socket.makefile("rb")
+        body = self._read()
+        if body is None or body[:1] != b"H":
+            raise ConnectionError("Сервер не прислал приветствие")
+        self.hello = json.loads(body[1:].decode("utf-8"))
+        self.decoder = FrameDecoder(self.hello)
+
+    def _read(self):
+        header = self.file.read(LENGTH.size)
+        if len(header) < LENGTH.size:
+            return None
+        size, = LENGTH.unpack(header)
+        body = self.file.read(size)
+        return body if len(body) == size else None
+
+    def state(self):
+        """SpaceState с неизменными свойствами тел (координаты нулевые)."""
+        from solar_state import SpaceState
+        hello = self.hello
+        state = SpaceState(hello["n"])
+        state.kind[:] = hello["kind"]
+        state.R[:] = hello["R"]
+        state.color = np.array(hello["color"], dtype=state.color.dtype)
+        state.parent[:] = hello["parent"]
+        return state
+
+    def read_frame(self):
+        """Следующий кадр (номер, модельное время, xs, ys) или None,
+        если сервер закрыл соединение."""
+        body = self._read()
+        return None if body is None else self.decoder.decode(body)
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сервер расчёта для нескольких зрителей")
+    parser.add_argument("scenario", help="файл сценария или контрольная точка .npz")
+    parser.add_argument("--dt", type=float, default=1.0, help="шаг по времени, с")
+    parser.add_argument("--steps-per-frame", type=int, default=1)
+    parser.add_argument("--fps", type=float, default=30, help="кадров в секунду")
+    parser.add_argument("--frames", type=int, help="число кадров (по умолчанию без ограничения)")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="numpy")
+    parser.add_argument("--integrator", choices=INTEGRATORS, default="euler")
+    parser.add_argument("--seed", type=int, default=0, help="зерно генерации сценария")
+    parser.add_argument("--resolution", type=float, help="шаг квантования координат, м")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", metavar="PATH", help="сокет Unix вместо TCP")
+    parser.add_argument("--log-level", default="INFO",
+                        choices=("DEBUG", "INFO", "WARNING", "ERROR"))
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level, format="%(levelname)s %(name)s: %(message)s")
+
+    from solar_cli import load_initial_state
+    state, sim_time, _ = load_initial_state(args.scenario, args.seed)
+    engine = create_engine(args.engine, state, args.integrator)
+    server = SimulationServer(engine, args.dt, args.steps_per_frame, args.fps,
+                              args.resolution, sim_time=sim_time)
+
+    async def serve():
+        await server.start(args.host, args.port, args.unix)
+        logger.info("Сервер: %d тел, %s", len(engine), args.unix or f"{args.host}:{args.port}")
+        try:
+            await server.run(args.frames)
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# coding: utf-8
+# license: GPLv3
+
+"""
+Пространственный индекс положений тел.
+Тела раскладываются по ячейкам равномерной сетки; номера тел хранятся
+отсортированными по номеру ячейки, поэтому ячейки одной строки сетки
+занимают непрерывный отрезок массива. Запросы (ближайшее тело, тела в
+круге, тела в прямоугольнике) просматривают только отрезки нужных строк.
+
+При движении тел update пересчитывает номера ячеек и досортировывает
+прошлый порядок: почти упорядоченный массив устойчивая сортировка
+(timsort) проходит за линейное время, поэтому индекс можно обновлять
+каждый кадр.
+
+Пример:
+    index = SpatialIndex(state.x, state.y)
+    i, distance = index.nearest(1E11, 0)
+    near = index.within(1E11, 0, 5E9)
+    parent, matches = find_parents(moon_xs, moon_ys, planet_xs, planet_ys, 5 * planet_R)
+"""
+import numpy as np
+
+BODIES_PER_CELL = 2
+"""Среднее число тел в ячейке при выборе размера ячейки"""
+
+OUTLIER_QUANTILES = (0.001, 0.999)
+"""Квантили координат, по которым выбираются границы сетки"""
+
+
+class SpatialIndex:
+    """Индекс тел с координатами xs, ys на равномерной сетке.
+
+    Сетка строится по размаху координат при создании (или при rebuild).
+    Тела, вышедшие за её пределы, относятся к крайним ячейкам, так что
+    запросы остаются точными; если таких тел становится много, update
+    перестраивает сетку.
+    """
+    def __init__(self, xs, ys, cells=None):
+        self.xs = np.asarray(xs, dtype=float)
+        self.ys = np.asarray(ys, dtype=float)
+        self.rebuild(cells)
+
+    def __len__(self):
+        return len(self.xs)
+
+    def rebuild(self, cells=None):
+        """Выбирает сетку под текущий размах координат и сортирует тела заново.
+        cells — примерное число ячеек (по умолчанию n / BODIES_PER_CELL)."""
+        n = len(self.xs)
+        cells = cells or max(1, n // BODIES_PER_CELL)
+        if n:
+            # Границы по квантилям: редкие далёкие тела не растягивают сетку,
+            # а попадают в крайние ячейки
+            self.x0, x1 = np.quantile(self.xs, OUTLIER_QUANTILES).tolist()
+            self.y0, y1 = np.quantile(self.ys, OUTLIER_QUANTILES).tolist()
+            width, height = x1 - self.x0, y1 - self.y0
+        else:
+            self.x0 = self.y0 = width = height = 0.0
+        side = max(width, height, 1E-9)
+        self.cell_size = max(np.sqrt(max(width, side * 1E-3) * max(height, side * 1E-3) / cells),
+                             side * 1E-6)
+        self.columns = int(width // self.cell_size) + 1
+        self.rows = int(height // self.cell_size) + 1
+        self.order = np.argsort(self._cells(), kind="stable")
+        self._index()
+
+    def _cells(self):
+        cx = np.clip(((self.xs - self.x0) // self.cell_size), 0, self.columns - 1).astype(np.int64)
+        cy = np.clip(((self.ys - self.y0) // self.cell_size), 0, self.rows - 1).astype(np.int64)
+        return cy * self.columns + cx
+
+    def _index(self):
+        self.keys = self._cells()[self.order]
+        self.starts = np.searchsorted(self.keys, np.arange(self.columns * self.rows + 1))
+
+    def update(self, xs, ys):
+        """Новые координаты тех же тел."""
+        self.xs = np.asarray(xs, dtype=float)
+        self.ys = np.asarray(ys, dtype=float)
+        if len(self.xs) != len(self.order):
+            self.rebuild()
+            return
+        # Крайние ячейки переполнены ушедшими за сетку телами: сетка устарела
+        outside = np.count_nonzero((self.xs < self.x0) | (self.ys < self.y0) |
+                                   (self.xs >= self.x0 + self.columns * self.cell_size) |
+                                   (self.ys >= self.y0 + self.rows * self.cell_size))
+        if outside > max(16, len(self.xs) // 10):
+            self.rebuild()
+            return
+        keys = self._cells()[self.order]
+        self.order = self.order[np.argsort(keys, kind="stable")]
+        self._index()
+
+    def _cell_range(self, x0, y0, x1, y1):
+        cx0 = int(np.clip((x0 - self.x0) // self.cell_size, 0, self.columns - 1))
+        cx1 = int(np.clip((x1 - self.x0) // self.cell_size, 0, self.columns - 1))
+        cy0 = int(np.clip((y0 - self.y0) // self.cell_size, 0, self.rows - 1))
+        cy1 = int(np.clip((y1 - self.y0) // self.cell_size, 0, self.rows - 1))
+        return cx0, cx1, cy0, cy1
+
+    def _candidates(self, x0, y0, x1, y1):
+        """Номера тел в ячейках, пересекающих прямоугольник."""
+        if not len(self.xs) or x1 < x0 or y1 < y0:
+            return np.zeros(0, dtype=np.int64)
+        cx0, cx1, cy0, cy1 = self._cell_range(x0, y0, x1, y1)
+        first = np.arange(cy0, cy1 + 1) * self.columns
+        begin = self.starts[first + cx0]
+        end = self.starts[first + cx1 + 1]
+        if len(begin) == 1:
+            return self.order[begin[0]:end[0]]
+        return np.concatenate([self.order[b:e] for b, e in zip(begin.tolist(), end.tolist())])
+
+    def in_rect(self, x0, y0, x1, y1):
+        """Номера тел в прямоугольнике [x0, x1] x [y0, y1]."""
+        found = self._candidates(x0, y0, x1, y1)
+        xs, ys = self.xs[found], self.ys[found]
+        return found[(xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1)]
+
+    def within(self, x, y, radius):
+        """Номера тел на расстоянии не больше radius от точки (x, y)."""
+        found = self._candidates(x - radius, y - radius, x + radius, y + radius)
+        return found[(self.xs[found] - x) ** 2 + (self.ys[found] - y) ** 2 <= radius * radius]
+
+    def pairs_within(self, xs, ys, radius):
+        """Все пары (номер точки, номер тела), где тело лежит не дальше radius
+        от точки (xs[k], ys[k]). Точки обрабатываются одним векторным проходом:
+        для каждой точки берутся отрезки строк сетки, накрывающих её квадрат."""
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        empty = np.zeros(0, dtype=np.int64)
+        if not len(xs) or not len(self.xs):
+            return empty, empty
+        cx0 = np.clip((xs - radius - self.x0) // self.cell_size, 0, self.columns - 1).astype(np.int64)
+        cx1 = np.clip((xs + radius - self.x0) // self.cell_size, 0, self.columns - 1).astype(np.int64)
+        cy0 = np.clip((ys - radius - self.y0) // self.cell_size, 0, self.rows - 1).astype(np.int64)
+        cy1 = np.clip((ys + radius - self.y0) // self.cell_size, 0, self.rows - 1).astype(np.int64)
+        # Пары (точка, строка сетки)
+        row_counts = cy1 - cy0 + 1
+        point = np.repeat(np.arange(len(xs)), row_counts)
+        row = cy0[point] + _ranks(row_counts)
+        begin = self.starts[row * self.columns + cx0[point]]
+        end = self.starts[row * self.columns + cx1[point] + 1]
+        # Пары (точка, тело из отрезка строки)
+        counts = end - begin
+        point = np.repeat(point, counts)
+        body = self.order[np.repeat(begin, counts) + _ranks(counts)]
+        near = (self.xs[body] - xs[point]) ** 2 + (self.ys[body] - ys[point]) ** 2 <= radius * radius
+        return point[near], body[near]
+
+    def nearest(self, x, y, max_distance=None):
+        """(номер, расстояние) ближайшего к точке (x, y) тела или None,
+        если тел нет (или нет ближе max_distance)."""
+        if not len(self.xs):
+            return None
+        # Круг поиска растёт вдвое, пока в него не попадёт хотя бы одно тело;
+        # ближайшее из попавших — ближайшее вообще
+        span = max(abs(x - self.x0), abs(y - self.y0),
+                   abs(x - self.x0 - self.columns * self.cell_size),
+                   abs(y - self.y0 - self.rows * self.cell_size)) * 2
+        radius = self.cell_size
+        while True:
+            if max_distance is not None and radius >= max_distance:
+                radius = max_distance
+            found = self.within(x, y, radius)
+            if len(found):
+                distance = np.hypot(self.xs[found] - x, self.ys[found] - y)
+                best = int(distance.argmin())
+                return int(found[best]), float(distance[best])
+            if radius == max_distance:
+                return None
+            if radius > span:
+                # Точка далеко от сетки и тел, ушедших за неё
+                distance = np.hypot(self.xs - x, self.ys - y)
+                best = int(distance.argmin())
+                return best, float(distance[best])
+            radius *= 2
+
+
+def _ranks(counts):
+    """Номера 0..counts[i]-1 внутри каждой группы, подряд для всех групп."""
+    total = int(counts.sum())
+    offsets = np.repeat(np.cumsum(counts) - counts, counts)
+    return np.arange(total) - offsets
+
+
+def find_parents(xs, ys, parent_xs, parent_ys, reach):
+    """Родители для точек (xs, ys): для каждой точки — первое по порядку тело
+    (parent_xs, parent_ys), к которому она ближе reach этого тела, как в
+    solar_input.find_parent_planet, но для всех точек сразу.
+    Возвращает (parent, matches): номер родителя (-1, если его нет) и число
+    подходящих тел; matches > 1 означает неоднозначный выбор."""
+    reach = np.asarray(reach, dtype=float)
+    parent = np.full(len(xs), -1, dtype=np.int64)
+    matches = np.zeros(len(xs), dtype=np.int64)
+    if not len(xs) or not len(reach):
+        return parent, matches
+    index = SpatialIndex(parent_xs, parent_ys)
+    point, body = index.pairs_within(xs, ys, float(reach.max()))
+    # Граница строгая, как в find_parent_planet
+    dx = index.xs[body] - np.asarray(xs, dtype=float)[point]
+    dy = index.ys[body] - np.asarray(ys, dtype=float)[point]
+    hit = dx * dx + dy * dy < reach[body] ** 2
+    point, body = point[hit], body[hit]
+    matches[:] = np.bincount(point, minlength=len(xs))
+    first = np.full(len(xs), len(reach), dtype=np.int64)
+    np.minimum.at(first, point, body)
+    parent[matches > 0] = first[matches > 0]
+    return parent, matches
+
+
+if __name__ == "__main__":
+    print("This module is not for direct call!")
@@ -0,0 +1,390 @@
+# coding: utf-8
+# license: GPLv3
+
+"""
+Состояние системы в виде массивов NumPy.
+Каждое тело занимает одну позицию во всех массивах, поэтому генераторы
+и расчёты могут работать сразу со всей системой, а не с отдельными объектами.
+"""
+import json
+import os
+
+import numpy as np
+
+from solar_objects import Star, Planet, Moon
+from solar_model import gravitational_constant, max_speed
+
+KIND_STAR = 0
+KIND_PLANET = 1
+KIND_MOON = 2
+
+TYPE_NAMES = ("star", "planet", "moon")
+"""Имена типов тел в порядке кодов KIND_*"""
+
+PAIRWISE_CHUNK = 1 << 22
+"""Максимальное число пар тело-источник, обрабатываемых за одну операцию"""
+
+DEFAULT_BLOCK_SIZE = 1 << 16
+"""Размер блока тел для состояний, отображённых на диск"""
+
+STATE_FIELDS = ("kind", "m", "x", "y", "Vx", "Vy", "R", "color", "parent")
+"""Имена массивов состояния"""
+
+FIELD_DTYPES = {
+    "kind": np.int8,
+    "m": np.float64,
+    "x": np.float64,
+    "y": np.float64,
+    "Vx": np.float64,
+    "Vy": np.float64,
+    "R": np.float64,
+    "color": "<U16",
+    "parent": np.int64,
+}
+
+
+class SpaceState:
+    """Массивы состояния всех тел системы.
+
+    parent — индекс родительской планеты для спутников (-1, если родителя нет).
+    """
+    def __init__(self, n=0):
+        for name in STATE_FIELDS:
+            setattr(self, name, np.zeros(n, dtype=FIELD_DTYPES[name]))
+        self.parent[:] = -1
+
+    def __len__(self):
+        return len(self.m)
+
+    def add_bodies(self, kind, m, x, y, Vx, Vy, R, color, parent=-1):
+        """Добавляет тела в конец массивов.
+        Аргументы могут быть скалярами или массивами одинаковой длины.
+        Возвращает срез индексов добавленных тел.
+        """
+        count = max(np.size(a) for a in (m, x, y, Vx, Vy, R, color, parent))
+        start = len(self)
+        values = dict(kind=kind, m=m, x=x, y=y, Vx=Vx, Vy=Vy, R=R,
+                      color=color, parent=parent)
+        for name in STATE_FIELDS:
+            column = np.broadcast_to(np.asarray(values[name], dtype=FIELD_DTYPES[name]), count)
+            setattr(self, name, np.concatenate((getattr(self, name), column)))
+        return slice(start, start + count)
+
+    def count(self, kind):
+        """Количество тел заданного типа."""
+        return int(np.count_nonzero(self.kind == kind))
+
+    @classmethod
+    def from_objects(cls, space_objects):
+        """Создаёт состояние по списку объектов CelestialBody."""
+        state = cls(len(space_objects))
+        index = {id(obj): i for i, obj in enumerate(space_objects)}
+        for i, obj in enumerate(space_objects):
+            state.kind[i] = TYPE_NAMES.index(obj.type)
+            state.m[i] = obj.m
+            state.x[i] = obj.x
+            state.y[i] = obj.y
+            state.Vx[i] = obj.Vx
+            state.Vy[i] = obj.Vy
+            state.R[i] = obj.R
+            state.color[i] = obj.color
+            parent = getattr(obj, 'parent', None)
+            if parent is not None:
+                state.parent[i] = index.get(id(parent), -1)
+        return state
+
+    def to_objects(self, progress=None):
+        """Создаёт список объектов CelestialBody в том же порядке, что и массивы.
+        Спутники добавляются к своим родительским планетам.
+        progress(доля) вызывается через каждые 10000 тел.
+        """
+        classes = (Star, Planet, Moon)
+        objects = []
+        for i in range(len(self)):
+            if progress and i % 10000 == 0:
+                progress(i / len(self))
+            obj = classes[self.kind[i]]()
+            obj.m = float(self.m[i])
+            obj.x = float(self.x[i])
+            obj.y = float(self.y[i])
+            obj.Vx = float(self.Vx[i])
+            obj.Vy = float(self.Vy[i])
+            obj.R = float(self.R[i])
+            obj.color = str(self.color[i])
+            objects.append(obj)
+
+        for i in np.flatnonzero(self.parent >= 0):
+            objects[self.parent[i]].add_moon(objects[i])
+        return objects
+
+    def flush(self):
+        """Состояние в памяти не требует сброса на диск."""
+
+
+def object_positions(space_objects):
+    """Координаты списка объектов в виде двух массивов (xs, ys)."""
+    n = len(space_objects)
+    return (np.fromiter((body.x for body in space_objects), float, n),
+            np.fromiter((body.y for body in space_objects), float, n))
+
+
+def object_velocities(space_objects):
+    """Скорости списка объектов в виде двух массивов (vxs, vys)."""
+    n = len(space_objects)
+    return (np.fromiter((body.Vx for body in space_objects), float, n),
+            np.fromiter((body.Vy for body in space_objects), float, n))
+
+
+class MappedSpaceState(SpaceState):
+    """Состояние, массивы которого лежат в файлах numpy.memmap.
+    Позволяет вести расчёт для большего числа тел, чем помещается в память:
+    шаг обходит массивы последовательными блоками.
+
+    Каталог содержит по файлу <поле>.dat на каждый массив и meta.json с числом тел.
+    Добавлять тела в такое состояние нельзя, его размер задаётся при создании.
+    """
+    def __init__(self, directory, mode='r+'):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), 'r', encoding='utf-8') as meta_file:
+            n = json.load(meta_file)["n"]
+        for name in STATE_FIELDS:
+            setattr(self, name, self._map(name, FIELD_DTYPES[name], n, mode))
+
+    def _map(self, name, dtype, n, mode):
+        path = os.path.join(self.directory, f"{name}.dat")
+        if n == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode=mode, shape=(n,))
+
+    @classmethod
+    def create(cls, directory, n, block_size=DEFAULT_BLOCK_SIZE, source=None):
+        """Создаёт файлы состояния на n тел.
+        Если задано source (SpaceState), данные копируются из него блоками.
+        """
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "meta.json"), 'w', encoding='utf-8') as meta_file:
+            json.dump({"n": n}, meta_file)
+        for name in STATE_FIELDS:
+            if n:
+                np.memmap(os.path.join(directory, f"{name}.dat"),
+                          dtype=FIELD_DTYPES[name], mode='w+', shape=(n,)).flush()
+
+        state = cls(directory)
+        state.parent[:] = -1
+        if source is not None:
+            for start in range(0, n, block_size):
+                block = slice(start, min(start + block_size, n))
+                for name in STATE_FIELDS:
+                    getattr(state, name)[block] = getattr(source, name)[block]
+        state.flush()
+        return state
+
+    @classmethod
+    def from_state(cls, directory, state, block_size=DEFAULT_BLOCK_SIZE):
+        """Переносит состояние из памяти в файлы каталога directory."""
+        return cls.create(directory, len(state), block_size, source=state)
+
+    def add_bodies(self, *args, **kwargs):
+        raise TypeError("Размер состояния на диске задаётся при создании")
+
+    def scratch(self, name, dtype=np.float64):
+        """Рабочий массив на диске того же размера, что и состояние.
+        Файл создаётся один раз и переиспользуется в следующих шагах."""
+        scratch = self.__dict__.setdefault("_scratch", {})
+        if name not in scratch:
+            scratch[name] = self._map(name, dtype, len(self), 'w+')
+        return scratch[name]
+
+    def flush(self):
+        """Сбрасывает изменённые страницы массивов на диск."""
+        for name in STATE_FIELDS:
+            array = getattr(self, name)
+            if isinstance(array, np.memmap):
+                array.flush()
+
+
+def _blocks(n, block_size):
+    for start in range(0, n, block_size):
+        yield slice(start, min(start + block_size, n))
+
+
+def _block_accelerations(state, block, sources, ax, ay):
+    """Ускорения тел блока от источников sources — последовательности
+    порций (x, y, m). Для спутников учитывается только родительская
+    планета, как в solar_model.calculate_force."""
+    x, y, m = state.x[block], state.y[block], state.m[block]
+    parent = state.parent[block]
+    block_ax = np.zeros(len(x))
+    block_ay = np.zeros(len(x))
+
+    for src_x, src_y, src_m in sources:
+        # Внутреннее дробление, чтобы матрица пар не превышала PAIRWISE_CHUNK
+        chunk = max(1, PAIRWISE_CHUNK // max(1, len(src_m)))
+        for start in range(0, len(x), chunk):
+            part = slice(start, start + chunk)
+            dx = src_x[None, :] - x[part, None]
+            dy = src_y[None, :] - y[part, None]
+            r = np.sqrt(dx ** 2 + dy ** 2) + 1E-10
+            # Собственное слагаемое обнуляется само: dx = dy = 0
+            g = src_m[None, :] / r ** 3
+            block_ax[part] += (g * dx).sum(axis=1)
+            block_ay[part] += (g * dy).sum(axis=1)
+
+    moons = np.flatnonzero(parent >= 0)
+    if len(moons):
+        parents = parent[moons]
+        dx = state.x[parents] - x[moons]
+        dy = state.y[parents] - y[moons]
+        r = np.sqrt(dx ** 2 + dy ** 2) + 1E-10
+        g = state.m[parents] / r ** 3
+        block_ax[moons] = g * dx
+        block_ay[moons] = g * dy
+
+    # Та же защита от нулевой массы, что и в move_space_object
+    factor = gravitational_constant * m / (m + 1E-10)
+    ax[block] = block_ax * factor
+    ay[block] = block_ay * factor
+
+
+def _block_move(state, block, ax, ay, dt, drift=1.0):
+    """Метод Эйлера с ограничением скорости, как в solar_model.move_space_object.
+    Координаты смещаются на drift шага (0.5 — вторая половина шага leapfrog)."""
+    vx = state.Vx[block] + ax[block] * dt
+    vy = state.Vy[block] + ay[block] * dt
+    speed = np.sqrt(vx ** 2 + vy ** 2)
+    limit = np.where(speed > max_speed, max_speed / np.maximum(speed, 1E-300), 1.0)
+    vx *= limit
+    vy *= limit
+    state.Vx[block] = vx
+    state.Vy[block] = vy
+    state.x[block] += vx * (dt * drift)
+    state.y[block] += vy * (dt * drift)
+
+
+def _block_drift(state, block, dt):
+    state.x[block] += state.Vx[block] * dt
+    state.y[block] += state.Vy[block] * dt
+
+
+def _block_fix_moons(state, block):
+    """Фиксирует спутники блока на круговых орбитах вокруг родителей."""
+    parent = state.parent[block]
+    moons = np.flatnonzero(parent >= 0) + block.start
+    if not len(moons):
+        return
+    parents = state.parent[moons]
+    px, py = state.x[parents], state.y[parents]
+    angle = np.arctan2(state.y[moons] - py, state.x[moons] - px)
+    target_distance = state.R[parents] * 4
+    cos_a, sin_a = np.cos(angle), np.sin(angle)
+    state.x[moons] = px + target_distance * cos_a
+    state.y[moons] = py + target_distance * sin_a
+    orbital_speed = np.sqrt(gravitational_constant * state.m[parents] / target_distance)
+    state.Vx[moons] = state.Vx[parents] - orbital_speed * sin_a
+    state.Vy[moons] = state.Vy[parents] + orbital_speed * cos_a
+
+
+def recalculate_state_positions(state, dt, sources=None, block_size=None):
+    """Векторный аналог solar_model.recalculate_space_objects_positions.
+
+    Работает одинаково для SpaceState и MappedSpaceState: тела обходятся
+    блоками по block_size в три последовательных прохода (силы, движение,
+    спутники), поэтому доступ к файлам остаётся последовательным.
+
+    sources — индексы тел, создающих гравитацию. По умолчанию это все тела
+    (точный расчёт N^2); для ограниченной задачи с пробными частицами
+    достаточно передать индексы массивных тел.
+    """
+    n = len(state)
+    block_size = _block_size(state, block_size)
+    ax, ay = _accelerations(state, sources, block_size)
+    for block in _blocks(n, block_size):
+        _block_move(state, block, ax, ay, dt)
+    for block in _blocks(n, block_size):
+        _block_fix_moons(state, block)
+
+
+def leapfrog_state_positions(state, dt, sources=None, block_size=None):
+    """Шаг методом leapfrog, векторный аналог
+    solar_model.leapfrog_space_objects_positions. Параметры те же, что у
+    recalculate_state_positions."""
+    n = len(state)
+    block_size = _block_size(state, block_size)
+    for block in _blocks(n, block_size):
+        _block_drift(state, block, dt / 2)
+    ax, ay = _accelerations(state, sources, block_size)
+    for block in _blocks(n, block_size):
+        _block_move(state, block, ax, ay, dt, drift=0.5)
+    for block in _blocks(n, block_size):
+        _block_fix_moons(state, block)
+
+
+def _block_size(state, block_size):
+    if block_size is None:
+        return DEFAULT_BLOCK_SIZE if isinstance(state, MappedSpaceState) else max(len(state), 1)
+    return block_size
+
+
+def _accelerations(state, sources, block_size):
+    """Ускорения всех тел, блоками по block_size.
+    Источники тоже читаются блоками: в памяти одновременно находятся только
+    блок тел и блок источников, поэтому состояние на диске не загружается
+    целиком. Координаты в этом проходе не меняются."""
+    n = len(state)
+    if sources is None:
+        def source_blocks():
+            for source in _blocks(n, block_size):
+                yield state.x[source], state.y[source], state.m[source]
+    else:
+        selected = [(state.x[sources], state.y[sources], state.m[sources])]
+
+        def source_blocks():
+            return selected
+
+    if isinstance(state, MappedSpaceState):
+        ax, ay = state.scratch("ax"), state.scratch("ay")
+    else:
+        ax, ay = np.empty(n), np.empty(n)
+
+    for block in _blocks(n, block_size):
+        _block_accelerations(state, block, source_blocks(), ax, ay)
+    return ax, ay
+
+
+def total_energy(state):
+    """Полная энергия системы: кинетическая плюс потенциальная всех пар.
+    Пары обрабатываются полосами, чтобы не превышать PAIRWISE_CHUNK."""
+    m, x, y = np.asarray(state.m), np.asarray(state.x), np.asarray(state.y)
+    kinetic = 0.5 * np.sum(m * (np.asarray(state.Vx) ** 2 + np.asarray(state.Vy) ** 2))
+    n = len(m)
+    potential = 0.0
+    chunk = max(1, PAIRWISE_CHUNK // max(1, n))
+    for start in range(0, n, chunk):
+        stop = min(start + chunk, n)
+        # Полоса строк [start, stop) против столбцов j >= start; берутся пары j > i
+        dx = x[None, start:] - x[start:stop, None]
+        dy = y[None, start:] - y[start:stop, None]
+        with np.errstate(divide='ignore'):
+            pairs = m[start:stop, None] * m[None, start:] / np.hypot(dx, dy)
+        potential += np.sum(np.triu(pairs, 1))
+    return kinetic - gravitational_constant * potential
+
+
+def save_state(file, state, **meta):
+    """Записывает состояние в файл .npz (имя или открытый файл).
+    meta — дополнительные числа, например время и номер шага."""
+    np.savez(file, **{name: getattr(state, name) for name in STATE_FIELDS},
+             **{f"meta_{key}": value for key, value in meta.items()})
+
+
+def load_state(file):
+    """Читает файл save_state. Возвращает (SpaceState, словарь meta)."""
+    state = SpaceState()
+    with np.load(file) as data:
+        for name in STATE_FIELDS:
+            setattr(state, name, data[name])
+        meta = {key[5:]: data[key].item() for key in data.files if key.startswith("meta_")}
+    return state, meta
+
+if __name__ == "__main__":
+    print("This module is not for direct call!")
@@ -0,0 +1,130 @@
+# coding: utf-8
+# license: GPLv3
+
+"""
+Фоновые задачи для интерфейса tkinter.
+Долгая работа выполняется в отдельном потоке, а результат, ход выполнения
+и ошибки передаются в поток tkinter через очередь, которую опрашивает after.
+"""
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class TaskCancelled(Exception):
+    """Задача отменена пользователем."""
+
+
+class BackgroundTask:
+    """Выполняет work(task) в фоновом потоке.
+
+    Внутри work можно вызывать task.report(доля, сообщение) для отображения хода
+    выполнения; report же прерывает работу исключением TaskCancelled, если
+    задача отменена. Обработчики on_done, on_error и on_progress вызываются
+    только в потоке tkinter.
+    """
+    def __init__(self, widget, work, on_done, on_error=None, on_progress=None, poll_ms=50):
+        self.widget = widget
+        self.work = work
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.poll_ms = poll_ms
+        self._events = queue.Queue()
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        self.widget.after(self.poll_ms, self._poll)
+        return self
+
+    def cancel(self):
+        """Просит задачу остановиться при ближайшем вызове report."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def report(self, fraction, message=""):
+        """Сообщает ход выполнения (0..1). Вызывается из фонового потока."""
+        if self._cancelled.is_set():
+            raise TaskCancelled()
+        self._events.put(("progress", (fraction, message)))
+
+    def _run(self):
+        try:
+            result = self.work(self)
+        except BaseException as e:
+            self._events.put(("error", e))
+        else:
+            self._events.put(("done", result))
+
+    def _poll(self):
+        # Обрабатываем только последнее сообщение о ходе, чтобы не тормозить интерфейс
+        progress = None
+        while True:
+            try:
+                kind, payload = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                progress = payload
+                continue
+            if progress is not None and self.on_progress:
+                self.on_progress(*progress)
+            if kind == "done":
+                if self._cancelled.is_set():
+                    self._finish_error(TaskCancelled())
+                else:
+                    self.on_done(payload)
+            else:
+                self._finish_error(payload)
+            return
+
+        if progress is not None and self.on_progress:
+            self.on_progress(*progress)
+        self.widget.after(self.poll_ms, self._poll)
+
+    def _finish_error(self, error):
+        if self.on_error:
+            self.on_error(error)
+        else:
+            logger.error("Ошибка фоновой задачи: %s", error)
+
+
+def run_in_batches(widget, actions, batch_size=500, on_done=None, on_progress=None):
+    """Выполняет список вызовов actions порциями по batch_size через after,
+    чтобы создание тысяч элементов холста не блокировало окно.
+    Возвращает функцию отмены.
+    """
+    position = 0
+    cancelled = False
+
+    def step():
+        nonlocal position
+        if cancelled:
+            return
+        for action in actions[position:position + batch_size]:
+            action()
+        position += batch_size
+        if position < len(actions):
+            if on_progress:
+                on_progress(position / len(actions))
+            widget.after(1, step)
+        elif on_done:
+            on_done()
+
+    def cancel():
+        nonlocal cancelled
+        cancelled = True
+
+    widget.after(1, step)
+    return cancel
+
+
+if __name__ == "__main__":
+    print("This module is not for direct call!")
@@ -0,0 +1,116 @@
+# coding: utf-8
+# license: GPLv3
+
+"""
+Следы движения тел с ограниченной памятью.
+Для каждого тела хранится не больше length последних точек в заранее
+выделенном кольцевом буфере, а новая точка записывается, только если тело
+сместилось не меньше чем на min_pixels пикселов. Поэтому объём памяти и
+стоимость отрисовки следов не растут с длительностью расчёта.
+"""
+import numpy as np
+
+import solar_vis
+from solar_canvas import ItemPool
+
+TRAIL_BRIGHTNESS = 0.5
+"""Яркость следа относительно цвета тела"""
+
+
+class TrailBuffer:
+    """Кольцевой буфер точек следов для n тел."""
+    def __init__(self, n, length=64, min_pixels=2.0):
+        self.length = length
+        self.min_pixels = min_pixels
+        # float64: при координатах порядка 1E11 м float32 различает лишь
+        # ~10 км, и при увеличении следы дрожат
+        self.points = np.zeros((n, length, 2), dtype=np.float64)
+        self.head = np.zeros(n, dtype=np.int64)    # куда писать следующую точку
+        self.count = np.zeros(n, dtype=np.int64)   # сколько точек заполнено
+        self.last = np.full((n, 2), np.nan)        # последняя записанная точка
+        self.dirty = np.zeros(n, dtype=bool)       # следы, изменённые после отрисовки
+
+    def __len__(self):
+        return len(self.head)
+
+    def record(self, xs, ys):
+        """Добавляет текущие положения тел, которые заметно сместились.
+        Порог задаётся в пикселах, поэтому медленные тела прореживаются."""
+        min_distance = self.min_pixels / max(solar_vis.view.scale, 1E-300)
+        moved = np.isnan(self.last[:, 0]) | (
+            np.hypot(xs - self.last[:, 0], ys - self.last[:, 1]) >= min_distance)
+        bodies = np.flatnonzero(moved)
+        if not len(bodies):
+            return 0
+        slot = self.head[bodies]
+        self.points[bodies, slot, 0] = xs[bodies]
+        self.points[bodies, slot, 1] = ys[bodies]
+        self.last[bodies, 0] = xs[bodies]
+        self.last[bodies, 1] = ys[bodies]
+        self.head[bodies] = (slot + 1) % self.length
+        self.count[bodies] = np.minimum(self.count[bodies] + 1, self.length)
+        self.dirty[bodies] = True
+        return len(bodies)
+
+    def trail(self, i):
+        """Точки следа тела i от старых к новым, массив (k, 2)."""
+        order = (self.head[i] - self.count[i] + np.arange(self.count[i])) % self.length
+        return self.points[i, order]
+
+    def all_points(self):
+        """Все заполненные точки всех следов: (индексы тел, xs, ys)."""
+        filled = np.arange(self.length)[None, :] < self.count[:, None]
+        bodies, slots = np.nonzero(filled)
+        return bodies, self.points[bodies, slots, 0], self.points[bodies, slots, 1]
+
+
+class TrailRenderer:
+    """Рисует следы на холсте: по одной ломаной на тело.
+    Изменённые следы обновляются одной командой Tcl."""
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.lines = ItemPool(canvas, "line", lower=True, tags="trail")
+        self.visible = 0
+
+    def draw(self, trails, bodies):
+        """trails — TrailBuffer, bodies — RasterBodies с цветами тел."""
+        n = len(trails)
+        items = self.lines.acquire(n)
+        path = self.canvas._w
+        script = []
+        if self.visible != n:
+            script += self.lines.hide_script(n)
+            self.visible = n
+            trails.dirty[:] = True
+            colors = (bodies.rgb * TRAIL_BRIGHTNESS).astype(np.int64)
+            for item, (r, g, b) in zip(items, colors.tolist()):
+                script.append(f"{path} itemconfigure {item} -fill #{r:02x}{g:02x}{b:02x}")
+
+        for i in np.flatnonzero(trails.dirty & (trails.count >= 2)).tolist():
+            points = trails.trail(i)
+            x = solar_vis.scale_x_array(points[:, 0])
+            y = solar_vis.scale_y_array(points[:, 1])
+            coords = " ".join(map(str, np.column_stack((x, y)).ravel().tolist()))
+            script.append(f"{path} coords {items[i]} {coords}")
+        trails.dirty[:] = False
+        if script:
+            self.canvas.tk.eval("\n".join(script))
+
+    def clear(self):
+        self.lines.clear()
+        self.visible = 0
+
+
+def splat_trails(frame, trails, bodies):
+    """Рисует точки следов в растровый кадр (height, width, 3) приглушённым цветом тел."""
+    height, width = frame.shape[:2]
+    index, xs, ys = trails.all_points()
+    px = solar_vis.scale_x_array(xs)
+    py = solar_vis.scale_y_array(ys)
+    visible = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+    colors = (bodies.rgb[index[visible]] * TRAIL_BRIGHTNESS).astype(np.uint8)
+    frame[py[visible], px[visible]] = np.maximum(frame[py[visible], px[visible]], colors)
+
+
+if __name__ == "__main__":
+    print("This module is not for direct call!")
@@ -0,0 +1,107 @@
+# coding: utf-8
+# license: GPLv3
+
+"""
+Тонкий зритель сервера расчёта (solar_server).
+Не считает ничего сам: получает кадры из сокета в отдельном потоке и
+рисует последний полученный кадр средствами solar_vis и solar_canvas.
+Колесо мыши приближает изображение.
+
+Пример:
+    python solar_viewer.py --port 8765
+"""
+import argparse
+import logging
+import threading
+import tkinter
+
+import numpy as np
+
+import solar_vis
+from solar_canvas import CanvasItemPool, CanvasUpdater
+from solar_server import DEFAULT_PORT, StreamClient
+
+logger = logging.getLogger(__name__)
+
+POLL_MS = 15
+
+
+class Viewer:
+    """Окно зрителя для клиента client (StreamClient)."""
+    def __init__(self, root, client):
+        self.root = root
+        self.client = client
+        self.frame = None
+        self.drawn_seq = None
+        self.frames_received = 0
+        self.closed = False
+
+        self.canvas = tkinter.Canvas(root, bg="black", width=solar_vis.window_width,
+                                     height=solar_vis.window_height)
+        self.canvas.pack(fill=tkinter.BOTH, expand=True)
+        self.status = tkinter.StringVar(value="Ожидание кадра...")
+        tkinter.Label(root, textvariable=self.status, anchor="w").pack(fill=tkinter.X)
+        self.canvas.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.canvas.bind("<Button-4>", self.on_mouse_wheel)
+        self.canvas.bind("<Button-5>", self.on_mouse_wheel)
+
+        self.bodies = client.state().to_objects()
+        self.updater = CanvasUpdater(self.canvas, CanvasItemPool(self.canvas))
+        self.updater.set_bodies(self.bodies)
+        threading.Thread(target=self.receive, daemon=True).start()
+        root.after(POLL_MS, self.poll)
+
+    def receive(self):
+        """Поток чтения: в self.frame всегда последний кадр."""
+        try:
+            while True:
+                frame = self.client.read_frame()
+                if frame is None:
+                    break
+                self.frame = frame
+                self.frames_received += 1
+        except (OSError, ValueError) as error:
+            logger.error("Ошибка потока кадров: %s", error)
+        self.closed = True
+
+    def poll(self):
+        frame = self.frame
+        if frame is not None and frame[0] != self.drawn_seq:
+            seq, sim_time, xs, ys = frame
+            if self.drawn_seq is None:
+                solar_vis.calculate_scale_factor(float(np.max(np.hypot(xs, ys), initial=0)) * 1.3)
+            self.drawn_seq = seq
+            self.updater.update(xs, ys)
+            self.status.set(f"{sim_time:.1f} seconds gone   кадр {seq}, "
+                            f"получено {self.frames_received}")
+        if self.closed:
+            self.status.set(self.status.get() + "   (соединение закрыто)")
+            return
+        self.root.after(POLL_MS, self.poll)
+
+    def on_mouse_wheel(self, event):
+        factor = 1.2 if event.num == 4 or getattr(event, "delta", 0) > 0 else 1 / 1.2
+        solar_vis.view.zoom(factor, event.x, event.y)
+        if self.frame is not None:
+            self.updater.update(self.frame[2], self.frame[3])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Зритель сервера расчёта")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", metavar="PATH", help="сокет Unix вместо TCP")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+
+    client = StreamClient(args.host, args.port, args.unix)
+    logger.info("Подключено: %d тел", client.hello["n"])
+    root = tkinter.Tk()
+    root.title("Solar System Viewer")
+    Viewer(root, client)
+    root.mainloop()
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
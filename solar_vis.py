@@ -6,11 +6,11 @@
 Нигде, кроме этого модуля, не используются экранные координаты объектов.
 Функции, создающие графические объекты и перемещающие их на экране, принимают физические координаты
 """
-from random import *
+import logging
 import math
-from solar_input import find_parent_planet
-import random
-from random import uniform
+import numpy as np
+
+logger = logging.getLogger(__name__)
 
 header_font = ("Arial", 16, "bold")
 """Шрифт в заголовке"""
@@ -44,14 +44,93 @@ PLANET_COLORS = {
 }
 
 
+class ViewTransform:
+    """Преобразование физических координат в экранные: масштаб и положение
+    на экране физического начала координат. Меняется при приближении и
+    сдвиге изображения мышью."""
+    min_zoom = 1E-3
+    max_zoom = 1E6
+
+    def __init__(self, scale=scale_factor):
+        self.reset(scale)
+
+    def reset(self, scale):
+        """Вид по умолчанию: начало координат в центре окна."""
+        self.base_scale = scale
+        self.scale = scale
+        self.origin_x = float(window_width // 2)
+        self.origin_y = float(window_height // 2)
+
+    def project(self, xs, ys):
+        """Экранные координаты массивов физических координат (одна векторная операция)."""
+        px = np.trunc(np.asarray(xs) * self.scale).astype(np.int64) + round(self.origin_x)
+        py = round(self.origin_y) - np.trunc(np.asarray(ys) * self.scale).astype(np.int64)
+        return px, py
+
+    def unproject(self, px, py):
+        """Физические координаты экранной точки."""
+        return (px - self.origin_x) / self.scale, (self.origin_y - py) / self.scale
+
+    def zoom(self, factor, px, py):
+        """Масштабирует вид в factor раз относительно экранной точки (px, py),
+        которая остаётся на месте. Возвращает фактически применённый множитель."""
+        scale = min(max(self.scale * factor, self.base_scale * self.min_zoom),
+                    self.base_scale * self.max_zoom)
+        factor = scale / self.scale
+        self.scale = scale
+        self.origin_x = px + (self.origin_x - px) * factor
+        self.origin_y = py + (self.origin_y - py) * factor
+        return factor
+
+    def pan(self, dx, dy):
+        """Сдвигает изображение на (dx, dy) пикселов."""
+        self.origin_x += dx
+        self.origin_y += dy
+
+
+view = ViewTransform()
+"""Текущее преобразование координат, общее для всех способов отрисовки"""
+
+
 def scale_x(x):
     """Преобразует физическую x-координату в экранную."""
-    return int(x * scale_factor) + window_width // 2
+    return int(x * view.scale) + round(view.origin_x)
 
 
 def scale_y(y):
     """Преобразует физическую y-координату в экранную (с инверсией оси)."""
-    return window_height // 2 - int(y * scale_factor)
+    return round(view.origin_y) - int(y * view.scale)
+
+
+def scale_x_array(xs):
+    """Векторный вариант scale_x для массива координат."""
+    return np.trunc(np.asarray(xs) * view.scale).astype(np.int64) + round(view.origin_x)
+
+
+def scale_y_array(ys):
+    """Векторный вариант scale_y для массива координат."""
+    return round(view.origin_y) - np.trunc(np.asarray(ys) * view.scale).astype(np.int64)
+
+
+def fill_color(body_type, color):
+    """Цвет заливки, которым рисуется тело данного типа и цвета."""
+    if body_type == 'star':
+        return STAR_COLORS.get(color.lower(), "#FF3333")
+    if body_type == 'planet':
+        return PLANET_COLORS.get(color.lower(), "#D3D3D3")
+    return "#888888"
+
+
+def item_options(body):
+    """Параметры овала холста, которым рисуется тело (как в create_*_image)."""
+    body_type = getattr(body, 'type', None)
+    fill = fill_color(body_type, getattr(body, 'color', ''))
+    if body_type == 'star':
+        return dict(fill=fill, outline="", width=1, tags=("star", "core"))
+    if body_type == 'planet':
+        return dict(fill=fill, outline="#333333", width=2,
+                    tags=("planet", f"planet_{id(body)}"))
+    return dict(fill=fill, outline="#AAAAAA", width=1, tags=("moon", f"moon_{id(body)}"))
 
 
 # Изменить функцию calculate_scale_factor():
@@ -62,7 +141,8 @@ def calculate_scale_factor(max_distance):
     else:
         available_size = min(window_width, window_height) * 1.0  # 50% окна
         scale_factor = available_size / max_distance
-    print(f"Масштаб: {scale_factor:.4f} (макс. расстояние={max_distance:.1f})")
+    view.reset(scale_factor)
+    logger.debug("Масштаб: %.4f (макс. расстояние=%.1f)", scale_factor, max_distance)
 
 def create_star_image(space, star):
     """Упрощенная отрисовка звезды без лишних эффектов"""
@@ -74,49 +154,35 @@ def create_star_image(space, star):
         star.image = space.create_oval(
             x - r, y - r,
             x + r, y + r,
-            fill=STAR_COLORS.get(star.color.lower(), "#FF3333"),
-            outline="",
-            tags=("star", "core")
+            **item_options(star)
         )
     except Exception as e:
-        print(f"Ошибка отрисовки звезды: {e}")
+        logger.error("Ошибка отрисовки звезды: %s", e)
 
 
 def create_planet_image(space, planet):
-    """Отрисовка планеты с кольцом орбиты спутника"""
+    """Отрисовка планеты (кольцо орбиты спутников рисует draw_moon_orbit)"""
     try:
         # Проверка координат
         try:
             x = scale_x(float(planet.x))
             y = scale_y(float(planet.y))
         except (TypeError, ValueError):
-            print(f"Ошибка координат планеты: x={planet.x}, y={planet.y}")
+            logger.error("Ошибка координат планеты: x=%s, y=%s", planet.x, planet.y)
             return
 
         # Проверка радиуса
         r = max(1, planet.R)  # Минимальный радиус = 1 пиксель
 
-        # Проверка цвета
-        color = getattr(planet, 'color', '').lower()
-        fill_color = PLANET_COLORS.get(color, "#D3D3D3")
-
         # Отрисовка планеты
         planet.image = space.create_oval(
             x - r, y - r,
             x + r, y + r,
-            fill=fill_color,
-            outline="#333333",
-            width=2,
-            tags=("planet", f"planet_{id(planet)}")
+            **item_options(planet)
         )
 
-        # Отрисовка орбиты спутников (если они есть)
-        if hasattr(planet, 'moons') and planet.moons:
-            min_orbit_radius = planet.R * 2  # Минимальный радиус орбиты
-            draw_moon_orbit(space, planet, min_orbit_radius)
-
     except Exception as e:
-        print(f"Ошибка отрисовки планеты: {e}")
+        logger.error("Ошибка отрисовки планеты: %s", e)
 
 def create_moon_image(space, moon):
     """Отрисовка спутника рядом с планетой"""
@@ -144,10 +210,7 @@ def create_moon_image(space, moon):
         moon.image = space.create_oval(
             x - r, y - r,
             x + r, y + r,
-            fill="#888888",  # Серый цвет
-            outline="#AAAAAA",
-            width=1,
-            tags=("moon", f"moon_{id(moon)}")
+            **item_options(moon)  # Серый цвет
         )
 
         # Убедимся, что спутник выше орбиты, но ниже планеты
@@ -155,7 +218,7 @@ def create_moon_image(space, moon):
             space.tag_raise(moon.image, parent.image)
 
     except Exception as e:
-        print(f"Moon drawing error: {e}")
+        logger.error("Moon drawing error: %s", e)
 
 def draw_orbit(canvas, center, radius, width=1, color=None):
     """Рисует орбиту с улучшенной видимостью"""
@@ -165,7 +228,7 @@ def draw_orbit(canvas, center, radius, width=1, color=None):
 
         x = scale_x(center.x)
         y = scale_y(center.y)
-        r = max(20, int(radius * scale_factor))
+        r = max(20, int(radius * view.scale))
 
         orbit_id = canvas.create_oval(
             x - r, y - r,
@@ -178,7 +241,7 @@ def draw_orbit(canvas, center, radius, width=1, color=None):
         canvas.lower(orbit_id)
         return orbit_id
     except Exception as e:
-        print(f"Ошибка при рисовании орбиты: {str(e)}")
+        logger.error("Ошибка при рисовании орбиты: %s", e)
         return None
 
 
@@ -202,7 +265,7 @@ def draw_moon_orbit(space, planet, radius):
         # Масштабирование координат
         x = scale_x(planet.x)
         y = scale_y(planet.y)
-        r_pixels = int(radius * scale_factor)  # Радиус в пикселях
+        r_pixels = int(radius * view.scale)  # Радиус в пикселях
 
         # Проверка, что орбита не меньше планеты
         if r_pixels <= planet.R:
@@ -219,9 +282,18 @@ def draw_moon_orbit(space, planet, radius):
         )
 
     except ValueError as ve:
-        print(f"Ошибка в данных: {ve}")
+        logger.error("Ошибка в данных: %s", ve)
     except Exception as e:
-        print(f"Ошибка отрисовки орбиты спутника: {e}")
+        logger.error("Ошибка отрисовки орбиты спутника: %s", e)
+
+
+def apply_view_change(space, factor, center, shift, tags="orbit||moon_orbit"):
+    """Переносит неподвижные элементы холста (орбиты) в новый вид без
+    пересоздания: масштаб factor относительно точки center и сдвиг shift."""
+    if factor != 1:
+        space.scale(tags, center[0], center[1], factor, factor)
+    if shift != (0, 0):
+        space.move(tags, shift[0], shift[1])
 
 
 def update_object_position(space, body):
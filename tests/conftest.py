@@ -0,0 +1,8 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Модули программы лежат в корне репозитория."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
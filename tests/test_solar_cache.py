@@ -0,0 +1,91 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Дисковый кэш сценариев: ключ, попадания и вытеснение давно не использованных."""
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import solar_cache
+from solar_state import STATE_FIELDS
+
+SCENARIO = Path(__file__).resolve().parent.parent / "Four_stars@@@@.txt"
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    directory = tmp_path / "cache"
+    monkeypatch.setattr(solar_cache, "cache_dir", str(directory))
+    return directory
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    """Число разборов файла сценария мимо кэша."""
+    calls = []
+    read = solar_cache.read_space_state_from_file
+
+    def counting(*args, **kwargs):
+        calls.append(args)
+        return read(*args, **kwargs)
+    monkeypatch.setattr(solar_cache, "read_space_state_from_file", counting)
+    return calls
+
+
+def test_key_depends_on_content_and_seed(tmp_path):
+    copy = tmp_path / "copy.txt"
+    shutil.copy(SCENARIO, copy)
+    key = solar_cache.scenario_key(SCENARIO, 0)
+    assert solar_cache.scenario_key(copy, 0) == key
+    assert solar_cache.scenario_key(SCENARIO, 1) != key
+    copy.write_bytes(SCENARIO.read_bytes() + b"\n# changed\n")
+    assert solar_cache.scenario_key(copy, 0) != key
+
+
+def test_second_load_hits_cache(cache, reads):
+    first = solar_cache.load_space_state(SCENARIO, seed=2)
+    second = solar_cache.load_space_state(SCENARIO, seed=2)
+    assert len(reads) == 1
+    assert len(list(cache.glob("*.npz"))) == 1
+    for name in STATE_FIELDS:
+        assert np.array_equal(getattr(first, name), getattr(second, name)), name
+
+    solar_cache.load_space_state(SCENARIO, seed=3)
+    assert len(reads) == 2
+
+
+def test_no_seed_bypasses_cache(cache, reads):
+    solar_cache.load_space_state(SCENARIO, seed=None)
+    solar_cache.load_space_state(SCENARIO, seed=None)
+    assert len(reads) == 2
+    assert not cache.exists()
+
+
+def test_broken_entry_is_regenerated(cache, reads):
+    solar_cache.load_space_state(SCENARIO, seed=2)
+    (entry,) = cache.glob("*.npz")
+    entry.write_bytes(b"not a zip file")
+    state = solar_cache.load_space_state(SCENARIO, seed=2)
+    assert len(reads) == 2 and len(state) > 0
+    assert len(solar_cache.load_space_state(SCENARIO, seed=2)) == len(state)
+    assert len(reads) == 2
+
+
+def test_eviction_keeps_recently_used(cache, reads):
+    for seed in range(3):
+        solar_cache.load_space_state(SCENARIO, seed=seed)
+    paths = {seed: cache / (solar_cache.scenario_key(SCENARIO, seed) + ".npz")
+             for seed in range(3)}
+    for age, seed in enumerate((0, 1, 2)):
+        os.utime(paths[seed], (1000 + age, 1000 + age))
+    # Попадание обновляет отметку использования: запись 0 становится свежей
+    solar_cache.load_space_state(SCENARIO, seed=0)
+    assert len(reads) == 3
+
+    solar_cache.evict(paths[0].stat().st_size + paths[2].stat().st_size)
+    assert sorted(seed for seed, path in paths.items() if path.exists()) == [0, 2]
+    solar_cache.evict(0)
+    assert list(cache.glob("*.npz")) == []
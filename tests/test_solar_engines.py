@@ -0,0 +1,108 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Движки расчёта: совпадение результатов, файлы движка memmap и запуск из командной строки."""
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from solar_cli import main as cli_main
+from solar_engines import ENGINES, INTEGRATORS, create_engine
+from solar_input import read_space_state_from_file
+from solar_state import KIND_STAR, KIND_PLANET, KIND_MOON, SpaceState, load_state
+
+SCENARIO = str(Path(__file__).resolve().parent.parent / "Four_stars@@@@.txt")
+
+
+def planetary_system():
+    """Звезда, две планеты и спутник: система без тесных сближений."""
+    state = SpaceState()
+    state.add_bodies(KIND_STAR, 2E30, 0.0, 0.0, 0.0, 0.0, 20, "yellow")
+    state.add_bodies(KIND_PLANET, 6E24, 1.5E11, 0.0, 0.0, 2.98E4, 10, "blue")
+    state.add_bodies(KIND_PLANET, 6E23, 0.0, -2.3E11, 2.4E4, 0.0, 8, "red")
+    state.add_bodies(KIND_MOON, 7E22, 1.5E11 + 40, 0.0, 0.0, 3E4, 3, "gray", parent=1)
+    return state
+
+
+@pytest.mark.parametrize("integrator", INTEGRATORS)
+def test_engines_agree(integrator):
+    results = {}
+    for name in ENGINES:
+        with create_engine(name, planetary_system(), integrator) as engine:
+            assert len(engine) == 4
+            for _ in range(200):
+                engine.step(3600.0)
+            final = engine.to_state()
+            results[name] = np.array([final.x, final.y, final.Vx, final.Vy])
+    assert np.allclose(results["numpy"], results["python"], rtol=1E-9, atol=1E-3)
+    assert np.allclose(results["memmap"], results["numpy"], rtol=1E-12, atol=1E-6)
+
+
+def test_integrators_differ():
+    finals = []
+    for integrator in INTEGRATORS:
+        engine = create_engine("numpy", planetary_system(), integrator)
+        for _ in range(100):
+            engine.step(86400.0)
+        finals.append(engine.to_state().x.copy())
+    assert not np.array_equal(*finals)
+
+
+def test_unknown_engine_or_integrator():
+    with pytest.raises(ValueError):
+        create_engine("gpu", planetary_system())
+    with pytest.raises(ValueError):
+        create_engine("numpy", planetary_system(), "rk4")
+
+
+def test_memmap_engine_removes_temporary_directory():
+    state = read_space_state_from_file(SCENARIO, seed=1)
+    with create_engine("memmap", state) as engine:
+        engine.step(1.0)
+        directory = engine.state.directory
+        assert os.path.isdir(directory)
+    assert not os.path.exists(directory)
+
+
+def test_memmap_engine_keeps_given_directory(tmp_path):
+    state = read_space_state_from_file(SCENARIO, seed=1)
+    engine = create_engine("memmap", state, directory=str(tmp_path / "state"))
+    engine.step(1.0)
+    engine.close()
+    assert (tmp_path / "state" / "meta.json").exists()
+
+
+def test_cli_cleans_up_memmap_engine(tmp_path, monkeypatch):
+    temporary = tmp_path / "tmp"
+    temporary.mkdir()
+    monkeypatch.setattr("tempfile.tempdir", str(temporary))
+    monkeypatch.setattr("solar_cache.cache_dir", str(tmp_path / "cache"))
+    output = tmp_path / "final.npz"
+    cli_main([SCENARIO, "--steps", "5", "--engine", "memmap", "--output", str(output)])
+    assert list(temporary.iterdir()) == []
+    with np.load(output) as saved:
+        assert len(saved["x"]) == len(read_space_state_from_file(SCENARIO, seed=0))
+
+
+def test_cli_checkpoints_and_output(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr("solar_cache.cache_dir", str(tmp_path / "cache"))
+    checkpoints = tmp_path / "checkpoints"
+    output = tmp_path / "final.npz"
+    cli_main([SCENARIO, "--time", "10", "--dt", "2", "--engine", "python",
+              "--checkpoint-every", "2", "--checkpoint-dir", str(checkpoints),
+              "--output", str(output)])
+    assert sorted(path.name for path in checkpoints.iterdir()) == [
+        "checkpoint_00000002.npz", "checkpoint_00000004.npz"]
+    final, meta = load_state(output)
+    assert meta == {"time": 10.0, "steps": 5}
+    assert "5 шагов (python, euler)" in capsys.readouterr().out
+
+    # Продолжение с контрольной точки даёт тот же результат
+    resumed = tmp_path / "resumed.npz"
+    cli_main([str(checkpoints / "checkpoint_00000004.npz"), "--steps", "1", "--dt", "2",
+              "--engine", "python", "--output", str(resumed)])
+    state, meta = load_state(resumed)
+    assert meta == {"time": 10.0, "steps": 5}
+    assert np.array_equal(state.x, final.x) and np.array_equal(state.Vy, final.Vy)
@@ -0,0 +1,135 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Векторная генерация планет, спутников и синтетических систем с зерном."""
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from solar_generators import generate_planets_batch
+from solar_input import MOON_COLOR, PLANET_PALETTES, read_space_state_from_file
+from solar_model import gravitational_constant
+from solar_state import KIND_STAR, KIND_PLANET, KIND_MOON, STATE_FIELDS, SpaceState
+
+SCENARIO = Path(__file__).resolve().parent.parent / "Four_stars@@@@.txt"
+
+
+def star_state(color="red"):
+    state = SpaceState()
+    state.add_bodies(KIND_STAR, 2E30, 1000.0, -500.0, 3.0, 4.0, 20, color)
+    return state
+
+
+def assert_same_state(first, second):
+    assert len(first) == len(second)
+    for name in STATE_FIELDS:
+        assert np.array_equal(getattr(first, name), getattr(second, name)), name
+
+
+def test_same_seed_same_planets():
+    first, second = star_state(), star_state()
+    generate_planets_batch(first, 0, 12, 900, 1500, orbit_num=0, seed=5)
+    generate_planets_batch(second, 0, 12, 900, 1500, orbit_num=0, seed=5)
+    assert_same_state(first, second)
+
+    other = star_state()
+    generate_planets_batch(other, 0, 12, 900, 1500, orbit_num=0, seed=6)
+    assert not np.array_equal(other.x, first.x)
+
+
+def test_planets_orbit_their_star():
+    state = star_state("blue")
+    planets = generate_planets_batch(state, 0, 10, 900, 1500, orbit_num=0, seed=1)
+    assert planets == slice(1, 11)
+    distance = np.hypot(state.x[planets] - 1000.0, state.y[planets] + 500.0)
+    assert np.all((distance >= 900) & (distance <= 1500))
+    assert set(state.color[planets]) <= set(PLANET_PALETTES["blue"])
+    # У синей звезды спутников нет
+    assert state.count(KIND_MOON) == 0
+
+
+def test_moons_only_on_even_orbits_of_red_and_yellow_stars():
+    state = star_state("red")
+    planets = generate_planets_batch(state, 0, 5, 900, 900, orbit_num=1, seed=1)
+    assert state.count(KIND_MOON) == 0
+    planets = generate_planets_batch(state, 0, 5, 900, 900, orbit_num=2, seed=1)
+    moons = np.flatnonzero(state.kind == KIND_MOON)
+    assert state.parent[moons].tolist() == list(range(planets.start, planets.stop))
+    assert np.all(state.color[moons] == MOON_COLOR)
+    parent = state.parent[moons]
+    distance = np.hypot(state.x[moons] - state.x[parent], state.y[moons] - state.y[parent])
+    assert np.allclose(distance, state.R[parent] * 20)
+
+
+def test_scenario_reproducible_with_seed():
+    first = read_space_state_from_file(SCENARIO, seed=3)
+    assert_same_state(first, read_space_state_from_file(SCENARIO, seed=3))
+    assert first.count(KIND_STAR) == 4 and first.count(KIND_PLANET) == 100
+    assert not np.array_equal(first.m, read_space_state_from_file(SCENARIO, seed=4).m)
+
+
+def directive_state(tmp_path, directives, seed=None):
+    path = tmp_path / "synthetic.txt"
+    path.write_text("Star 20 yellow 2E30 100 -100 5 0\n" + "\n".join(directives) + "\n",
+                    encoding="utf-8")
+    return read_space_state_from_file(path, seed=seed)
+
+
+def test_exponential_disk_directive(tmp_path):
+    state = directive_state(tmp_path, [
+        "$exponential_disk star=yellow n=2000 scale=1500 r_min=300 r_max=6000 m=1E20 seed=1"])
+    disk = slice(1, None)
+    assert len(state) == 2001 and np.all(state.kind[disk] == KIND_PLANET)
+    r = np.hypot(state.x[disk] - 100, state.y[disk] + 100)
+    assert np.all((r >= 300) & (r <= 6000))
+    # Без разброса скорости круговые вокруг звезды
+    speed = np.hypot(state.Vx[disk] - 5, state.Vy[disk])
+    assert np.allclose(speed, np.sqrt(gravitational_constant * 2E30 / r), rtol=1E-3)
+
+
+def test_asteroid_belt_directive(tmp_path):
+    state = directive_state(tmp_path, [
+        "$asteroid_belt star=yellow n=2000 a_min=2500 a_max=3500 e_max=0.2 i_max=0 color=grey R=2 seed=2"])
+    belt = slice(1, None)
+    r = np.hypot(state.x[belt] - 100, state.y[belt] + 100)
+    # Расстояние до центра в пределах перицентра и апоцентра орбит
+    assert np.all((r >= 2500 * 0.8) & (r <= 3500 * 1.2))
+    assert np.all(state.color[belt] == "grey") and np.all(state.R[belt] == 2)
+
+
+def test_binary_population_directive(tmp_path):
+    state = directive_state(tmp_path, [
+        "$binary_population x=0 y=0 n=500 r_min=2000 r_max=6000 sep_min=20 sep_max=200 "
+        "m_min=1E26 m_max=1E27 seed=4"])
+    pairs = slice(1, None)
+    assert np.all(state.kind[pairs] == KIND_STAR)
+    x, y, m = state.x[pairs], state.y[pairs], state.m[pairs]
+    separation = np.hypot(x[0::2] - x[1::2], y[0::2] - y[1::2])
+    assert np.all((separation >= 20 * (1 - 1E-9)) & (separation <= 200 * (1 + 1E-9)))
+    com = np.hypot((m[0::2] * x[0::2] + m[1::2] * x[1::2]) / (m[0::2] + m[1::2]),
+                   (m[0::2] * y[0::2] + m[1::2] * y[1::2]) / (m[0::2] + m[1::2]))
+    assert np.all((com >= 2000 * (1 - 1E-9)) & (com <= 6000 * (1 + 1E-9)))
+
+
+def test_directive_seed_overrides_file_seed(tmp_path):
+    lines = ["$plummer_sphere x=0 y=0 n=500 a=800 total_mass=1E28 seed=3"]
+    first = directive_state(tmp_path, lines, seed=1)
+    assert_same_state(first, directive_state(tmp_path, lines, seed=2))
+    assert np.allclose(first.m[1:], 1E28 / 500)
+
+    lines = ["$plummer_sphere x=0 y=0 n=500 a=800 total_mass=1E28"]
+    assert_same_state(directive_state(tmp_path, lines, seed=1), directive_state(tmp_path, lines, seed=1))
+    assert not np.array_equal(directive_state(tmp_path, lines, seed=1).x,
+                              directive_state(tmp_path, lines, seed=2).x)
+
+
+@pytest.mark.parametrize("line", [
+    "$asteroid_belt star=yellow a_min=1 a_max=2",
+    "$asteroid_belt star=purple n=10 a_min=1 a_max=2",
+    "$asteroid_belt star=yellow n=10 a_min",
+    "$asteroid_belt star=yellow n=10 a_min=1 a_max=2 unknown=3",
+])
+def test_bad_directive_raises(tmp_path, line):
+    with pytest.raises(ValueError):
+        directive_state(tmp_path, [line])
@@ -0,0 +1,118 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Сохранение и повторное чтение сценариев: спутники остаются у своих планет."""
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from solar_input import (read_space_objects_data_from_file, read_space_state_from_file,
+                         write_space_objects_data_to_file, write_space_state_to_file)
+from solar_state import KIND_STAR, KIND_PLANET, KIND_MOON, STATE_FIELDS
+
+SCENARIO = Path(__file__).resolve().parent.parent / "Four_stars@@@@.txt"
+
+
+def test_state_round_trip(tmp_path):
+    state = read_space_state_from_file(SCENARIO, seed=1)
+    assert np.count_nonzero(state.kind == KIND_MOON) > 0
+    path = tmp_path / "saved.txt"
+    write_space_state_to_file(path, state)
+
+    loaded = read_space_state_from_file(path)
+    assert len(loaded) == len(state)
+    for name in STATE_FIELDS:
+        assert np.array_equal(getattr(loaded, name), getattr(state, name)), name
+
+
+def test_objects_reader_reads_saved_state(tmp_path):
+    state = read_space_state_from_file(SCENARIO, seed=1)
+    path = tmp_path / "saved.txt"
+    write_space_state_to_file(path, state)
+
+    objects = read_space_objects_data_from_file(path)
+    assert len(objects) == len(state)
+    assert sum(obj.type == "star" for obj in objects) == np.count_nonzero(state.kind == KIND_STAR)
+    assert sum(obj.type == "planet" for obj in objects) == np.count_nonzero(state.kind == KIND_PLANET)
+    moons = [obj for obj in objects if obj.type == "moon"]
+    assert len(moons) == np.count_nonzero(state.kind == KIND_MOON)
+    # Спутник приписан к той же планете, что и в исходном состоянии
+    by_position = {(obj.x, obj.y): i for i, obj in enumerate(state.to_objects())}
+    for moon in moons:
+        i = by_position[(moon.x, moon.y)]
+        parent = state.parent[i]
+        assert (moon.parent.x, moon.parent.y) == (state.x[parent], state.y[parent])
+
+
+def test_objects_round_trip(tmp_path):
+    objects = read_space_objects_data_from_file(SCENARIO)
+    path = tmp_path / "saved.txt"
+    write_space_objects_data_to_file(path, objects)
+
+    loaded = read_space_objects_data_from_file(path)
+    assert [obj.type for obj in loaded] == [obj.type for obj in objects]
+    for before, after in zip(objects, loaded):
+        assert (after.x, after.y, after.Vx, after.Vy, after.m) == \
+               (before.x, before.y, before.Vx, before.Vy, before.m)
+        if before.type == "moon":
+            assert (after.parent.x, after.parent.y) == (before.parent.x, before.parent.y)
+
+
+def test_moon_without_parent_is_found_by_distance(tmp_path):
+    path = tmp_path / "loose.txt"
+    path.write_text(
+        "Star 30 yellow 2E30 0 0 0 0\n"
+        "Planet 10 blue 6E24 1E11 0 0 30000\n"
+        "Planet 10 blue 6E24 -1E11 0 0 -30000\n"
+        "Moon 3 gray 7E22 -1E11 40 0 -29000\n"
+        "Moon 3 gray 7E22 5E10 0 0 0\n",
+        encoding="utf-8")
+
+    state = read_space_state_from_file(path)
+    moons = np.flatnonzero(state.kind == KIND_MOON)
+    # Второй спутник далеко от планет и пропускается
+    assert len(moons) == 1
+    assert state.x[state.parent[moons[0]]] == -1E11
+
+    objects = read_space_objects_data_from_file(path)
+    moons = [obj for obj in objects if obj.type == "moon"]
+    assert len(moons) == 1
+    assert moons[0].parent.x == -1E11
+
+
+COMMENTED = (
+    "# Система с комментариями\n"
+    "Star 30 yellow 2E30 0 0 0 0  # центральная звезда\n"
+    "Planet 10 #FF6B6B 6E24 1E11 0 0 30000 # цвет-решётка остаётся данными\n"
+    "Moon 3 gray 7E22 1E11 40 0 31000 1 # родитель — строка 1\n"
+    "   # отступ перед комментарием\n"
+)
+
+
+def test_readers_strip_trailing_comments(tmp_path):
+    path = tmp_path / "commented.txt"
+    path.write_text(COMMENTED, encoding="utf-8")
+
+    objects = read_space_objects_data_from_file(path)
+    assert [obj.type for obj in objects] == ["star", "planet", "moon"]
+    assert objects[1].color == "#FF6B6B" and objects[1].Vy == 30000
+    assert objects[2].parent is objects[1]
+
+    state = read_space_state_from_file(path)
+    assert state.kind.tolist() == [KIND_STAR, KIND_PLANET, KIND_MOON]
+    assert state.color[1] == "#FF6B6B" and state.parent.tolist() == [-1, -1, 1]
+
+
+@pytest.mark.parametrize("line", [
+    "Planet 10 blue 6E24 1E11 0 0",
+    "Planet 10 blue 6E24 1E11 0 0 30000 extra",
+    "$generate_planets green 3 0 0 0 1E10 2E10",
+])
+def test_readers_raise_on_bad_lines(tmp_path, line):
+    path = tmp_path / "bad.txt"
+    path.write_text(f"Star 30 yellow 2E30 0 0 0 0\n{line}\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        read_space_objects_data_from_file(path)
+    with pytest.raises(ValueError):
+        read_space_state_from_file(path)
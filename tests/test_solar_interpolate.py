@@ -0,0 +1,79 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Интерполяция и кеплерова экстраполяция между снимками расчёта."""
+import numpy as np
+
+from solar_interpolate import Interpolator, find_primaries, kepler_propagate
+from solar_model import gravitational_constant
+from solar_scheduler import Snapshot
+
+STAR_MASS = 2E30
+R = 1.5E11
+
+
+def circular(t, r=R, mass=STAR_MASS):
+    """Положение и скорость на круговой орбите вокруг начала координат."""
+    omega = np.sqrt(gravitational_constant * mass / r ** 3)
+    angle = omega * t
+    return (r * np.cos(angle), r * np.sin(angle),
+            -r * omega * np.sin(angle), r * omega * np.cos(angle))
+
+
+def snapshot(t, steps, wall, planet):
+    x, y, vx, vy = planet
+    return Snapshot(t, steps, np.array([0.0, x]), np.array([0.0, y]),
+                    np.array([0.0, vx]), np.array([0.0, vy]), wall)
+
+
+def test_find_primaries():
+    types = ["star", "star", "planet", "planet", "moon", "moon"]
+    masses = np.array([2E30, 1E30, 1E24, 1E24, 1E22, 1E22])
+    xs = np.array([0.0, 1E12, 1E11, 9E11, 1E11 + 1E8, 5E11])
+    ys = np.zeros(6)
+    parents = [-1, -1, -1, -1, 2, -1]
+    assert find_primaries(types, masses, parents, xs, ys).tolist() == [-1, -1, 0, 1, 2, -1]
+
+
+def test_kepler_propagate_circular_and_unbound():
+    x, y, vx, vy = circular(0.0)
+    mu = gravitational_constant * STAR_MASS
+    period = 2 * np.pi * np.sqrt(R ** 3 / mu)
+    dts = np.array([0.0, period / 8, period / 2, 0.9 * period])
+    rx, ry, bound = kepler_propagate(np.full(4, x), np.full(4, y), np.full(4, vx),
+                                     np.full(4, vy), mu, dts)
+    assert np.all(bound)
+    expected = [circular(dt)[:2] for dt in dts]
+    assert np.allclose(np.column_stack((rx, ry)), expected, rtol=0, atol=R * 1E-9)
+
+    _, _, bound = kepler_propagate(np.array([x]), np.array([y]), np.array([vx * 2]),
+                                   np.array([vy * 2]), mu, 1.0)
+    assert not bound[0]
+
+
+def test_linear_interpolation_between_snapshots():
+    interpolator = Interpolator(["star", "planet"], [STAR_MASS, 1E24], [-1, -1])
+    assert interpolator.positions("linear") is None
+    first = snapshot(0.0, 0, 10.0, (R, 0.0, 0.0, 3E4))
+    second = snapshot(100.0, 1, 11.0, (R, 3E6, 0.0, 3E4))
+    interpolator.push(first)
+    # Один снимок: интерполировать не между чем
+    assert interpolator.positions("linear", now=10.5)[1][1] == 0.0
+    interpolator.push(second)
+    interpolator.push(second._replace(ys=second.ys * 0))  # тот же номер шага
+    assert interpolator.current is second
+
+    assert interpolator.positions("linear", now=11.5)[1][1] == 1.5E6
+    assert interpolator.positions("linear", now=10.0)[1][1] == 0.0
+    assert interpolator.positions("linear", now=15.0)[1][1] == 3E6
+    assert interpolator.positions("off", now=11.5)[1][1] == 3E6
+
+
+def test_kepler_extrapolation_follows_orbit():
+    interpolator = Interpolator(["star", "planet"], [STAR_MASS, 0.0], [-1, -1])
+    interpolator.push(snapshot(0.0, 0, 10.0, circular(0.0)))
+    interpolator.push(snapshot(86400.0, 1, 11.0, circular(86400.0)))
+    xs, ys = interpolator.positions("kepler", now=11.5)
+    expected = circular(86400.0 * 1.5)
+    assert np.hypot(xs[1] - expected[0], ys[1] - expected[1]) < R * 1E-9
+    assert (xs[0], ys[0]) == (0.0, 0.0)
@@ -0,0 +1,108 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Метрики расчёта: журнал JSON и текстовый файл Prometheus."""
+import json
+import os
+import stat
+
+import pytest
+
+from solar_metrics import METRICS, MetricsRecorder, _prometheus_value
+from solar_state import KIND_STAR, KIND_PLANET, SpaceState, total_energy
+
+
+def two_bodies():
+    state = SpaceState()
+    state.add_bodies(KIND_STAR, 2E30, 0.0, 0.0, 0.0, 0.0, 20, "yellow")
+    state.add_bodies(KIND_PLANET, 6E24, 1.5E11, 0.0, 0.0, 2.98E4, 10, "blue")
+    return state
+
+
+def parse_prometheus(path):
+    """Значения рядов файла Prometheus: {(имя, метки): число}."""
+    values = {}
+    kinds = {}
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if line.startswith("# TYPE"):
+            _, _, name, kind = line.split()
+            kinds[name] = kind
+        elif not line.startswith("#"):
+            series, value = line.rsplit(" ", 1)
+            name, _, labels = series.partition("{")
+            values[name, labels.rstrip("}")] = float(value)
+    return values, kinds
+
+
+def test_prometheus_file(tmp_path):
+    path = tmp_path / "solar.prom"
+    recorder = MetricsRecorder(prometheus_path=str(path), labels={"integrator": "euler",
+                                                                  "engine": "numpy"})
+    state = two_bodies()
+    recorder.sample(state, 0.0, 0, 0.0, energy=True)
+    state.Vy[1] *= 1.01
+    recorder.checkpoint(0.25)
+    recorder.sample(state, 60.0, 100, 2.0, energy=True)
+    recorder.close()
+
+    values, kinds = parse_prometheus(path)
+    labels = 'engine="numpy",integrator="euler"'
+    assert values["solar_steps_per_second", labels] == 50.0
+    assert values["solar_sim_time_seconds", labels] == 60.0
+    assert values["solar_steps_total", labels] == 100
+    assert values["solar_bodies", labels] == 2
+    assert values["solar_checkpoint_latency_seconds", labels] == 0.25
+    assert values["solar_checkpoints_total", labels] == 1
+    assert values["solar_rss_bytes", labels] > 0
+    initial = total_energy(two_bodies())
+    assert values["solar_energy_drift", labels] == pytest.approx(
+        abs((total_energy(state) - initial) / initial))
+    assert kinds == {name: kind for name, (kind, _) in METRICS.items()}
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+    assert [entry.name for entry in tmp_path.iterdir()] == ["solar.prom"]
+
+
+def test_jsonl_appends_one_record_per_sample(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    recorder = MetricsRecorder(jsonl_path=str(path), labels={"engine": "python"})
+    state = two_bodies()
+    recorder.sample(state, 0.0, 0, 0.0, energy=False)
+    recorder.sample(state, 10.0, 10, 1.0, energy=False)
+    recorder.close()
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [record["solar_steps_total"] for record in records] == [0, 10]
+    assert records[0]["solar_steps_per_second"] is None
+    assert records[1]["solar_steps_per_second"] == 10.0
+    assert all(record["engine"] == "python" for record in records)
+    # Без расчёта энергии дрейф не записывается
+    assert records[1]["solar_energy_drift"] is None
+
+
+def test_energy_interval_and_body_limit(monkeypatch):
+    calls = []
+    monkeypatch.setattr("solar_state.total_energy", lambda state: calls.append(1) or 1.0)
+    recorder = MetricsRecorder(energy_interval=3600.0)
+    state = two_bodies()
+    recorder.sample(state, 0.0, 0, 0.0)
+    recorder.sample(state, 1.0, 1, 0.1)
+    assert len(calls) == 1  # второй замер раньше energy_interval
+    recorder.sample(state, 2.0, 2, 0.2, energy=True)
+    assert len(calls) == 2
+
+    limited = MetricsRecorder(energy_max_bodies=1)
+    limited.sample(state, 0.0, 0, 0.0, energy=True)
+    assert len(calls) == 2 and limited.values["solar_energy_drift"] is None
+
+
+def test_due_follows_interval():
+    recorder = MetricsRecorder(interval=3600.0)
+    assert recorder.due()
+    recorder.flush()
+    assert not recorder.due()
+
+
+@pytest.mark.parametrize("value, text", [
+    (1.5, "1.5"), (3, "3.0"), (float("nan"), "NaN"), (float("inf"), "+Inf"), (float("-inf"), "-Inf"),
+])
+def test_prometheus_values(value, text):
+    assert _prometheus_value(value) == text
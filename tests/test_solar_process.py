@@ -0,0 +1,105 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Чтение кадров из разделяемой памяти (SharedFrames) и пауза процесса расчёта."""
+import multiprocessing
+import time
+from pathlib import Path
+
+import numpy as np
+
+from solar_input import read_space_state_from_file
+from solar_process import PhysicsProcess, SharedFrames
+from solar_scheduler import Snapshot
+
+SCENARIO = str(Path(__file__).resolve().parent.parent / "Four_stars@@@@.txt")
+
+
+def frame(value, n, wall=0.0):
+    array = np.full(n, float(value))
+    return Snapshot(float(value), int(value), array, array + 1, array + 2, array + 3, wall)
+
+
+def test_read_before_publish():
+    frames = SharedFrames(4)
+    try:
+        assert frames.read() is None
+    finally:
+        frames.close()
+
+
+def test_read_returns_copy_with_publish_time():
+    frames = SharedFrames(8)
+    try:
+        frames.publish(frame(1, 8, wall=123.5))
+        first = frames.read()
+        assert first.wall == 123.5
+        assert first.time == 1.0 and first.steps == 1
+        # Кадр остаётся прежним после двух следующих публикаций
+        frames.publish(frame(2, 8))
+        frames.publish(frame(3, 8))
+        assert np.all(first.xs == 1) and np.all(first.vys == 4)
+        assert frames.read().time == 3.0
+    finally:
+        frames.close()
+
+
+def publish_until(name, n, stop):
+    frames = SharedFrames(name=name)
+    value = 0
+    while not stop.is_set():
+        value += 1
+        frames.publish(frame(value, n))
+    frames.close()
+
+
+def test_reader_sees_whole_frames():
+    n = 200000
+    frames = SharedFrames(n)
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+    writer = context.Process(target=publish_until, args=(frames.name, n, stop))
+    writer.start()
+    try:
+        seen = set()
+        while len(seen) < 50:
+            snapshot = frames.read()
+            if snapshot is None:
+                continue
+            seen.add(snapshot.steps)
+            assert np.all(snapshot.xs == snapshot.time)
+            assert np.all(snapshot.vys == snapshot.time + 3)
+    finally:
+        stop.set()
+        writer.join()
+        frames.close()
+
+
+def wait_until(condition, timeout=30):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline
+        time.sleep(0.01)
+
+
+def test_last_frame_after_pause_is_paused_state(tmp_path):
+    process = PhysicsProcess(SCENARIO, None, dt=60.0)
+    try:
+        assert process.wait_loaded()
+        process.start()
+        wait_until(lambda: process.latest().steps > 0)
+        request = process.pause()
+        wait_until(lambda: process.paused(request))
+        paused = process.latest()
+        time.sleep(0.2)
+        assert process.latest().steps == paused.steps
+
+        # Состояние, на котором остановился процесс, совпадает с кадром
+        path = tmp_path / "paused.txt"
+        process.save(str(path))
+        request = process.pause()  # подтверждение придёт после сохранения
+        wait_until(lambda: process.paused(request))
+        state = read_space_state_from_file(path)
+        assert np.array_equal(state.x, paused.xs) and np.array_equal(state.Vy, paused.vys)
+    finally:
+        process.stop()
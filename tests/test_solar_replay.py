@@ -0,0 +1,75 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Опорные кадры: прореживание и интерполяция."""
+import numpy as np
+import pytest
+
+from solar_replay import KeyframeRecorder, KEYFRAME_OVERHEAD
+from solar_scheduler import Snapshot
+
+
+def frame_budget(n, frames):
+    return frames * (32 * n + KEYFRAME_OVERHEAD)
+
+
+@pytest.mark.parametrize("count", [4, 5, 8, 9, 40])
+def test_decimation_keeps_first_and_last(count):
+    recorder = KeyframeRecorder(1, every=1, budget=frame_budget(1, 3))
+    for t in range(count):
+        recorder.add(float(t), [t], [0.0], [1.0], [0.0])
+        assert recorder.times[0] == 0.0
+        assert recorder.times[-1] == float(t)
+        assert recorder.nbytes <= recorder.budget
+    assert recorder.times == sorted(recorder.times)
+
+
+def test_decimation_doubles_interval():
+    recorder = KeyframeRecorder(1, every=1, budget=frame_budget(1, 3))
+    for t in range(4):
+        recorder.add(float(t), [t], [0.0], [1.0], [0.0])
+    assert recorder.times == [0.0, 2.0, 3.0]
+    assert recorder.every == 2
+
+
+def test_record_respects_every_across_runs():
+    recorder = KeyframeRecorder(2, every=10)
+    zeros = np.zeros(2)
+    saved = [recorder.record(Snapshot(float(steps), steps, zeros, zeros, zeros, zeros, 0.0))
+             for steps in (5, 10, 15, 20)]
+    # Первый снимок сохраняется сразу, дальше — каждые 10 шагов
+    assert saved == [True, False, True, False]
+    # Новый запуск расчёта: счётчик шагов снимков начинается заново,
+    # а шаги прошлого запуска учитываются
+    assert recorder.record(Snapshot(25.0, 5, zeros, zeros, zeros, zeros, 0.0))
+    assert not recorder.record(Snapshot(30.0, 10, zeros, zeros, zeros, zeros, 0.0))
+
+
+def test_keyframe_and_truncate():
+    recorder = KeyframeRecorder(1)
+    for t in (0.0, 10.0, 20.0):
+        recorder.add(t, [t], [0.0], [0.0], [0.0])
+    assert recorder.keyframe(15.0).time == 10.0
+    assert recorder.keyframe(-5.0).time == 0.0
+    recorder.truncate(10.0)
+    assert recorder.times == [0.0, 10.0]
+
+
+def test_positions_exact_for_cubic_motion():
+    # Эрмитова интерполяция точна для движения не выше третьей степени
+    def x(t):
+        return 2 * t ** 3 - t ** 2 + 3 * t + 1
+
+    def vx(t):
+        return 6 * t ** 2 - 2 * t + 3
+
+    recorder = KeyframeRecorder(1)
+    for t in (0.0, 2.0, 5.0):
+        recorder.add(t, [x(t)], [-x(t)], [vx(t)], [-vx(t)])
+    for t in np.linspace(0, 5, 11):
+        xs, ys = recorder.positions(t)
+        assert xs[0] == pytest.approx(x(t))
+        assert ys[0] == pytest.approx(-x(t))
+    # За пределами записи — крайние кадры
+    assert recorder.positions(-1.0)[0][0] == x(0.0)
+    assert recorder.positions(9.0)[0][0] == x(5.0)
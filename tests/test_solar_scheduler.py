@@ -0,0 +1,90 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Планировщик расчёта в фоновом потоке."""
+import threading
+import time
+
+import numpy as np
+
+from solar_scheduler import PhysicsScheduler
+
+
+class Counter:
+    """Модель расчёта: каждое тело сдвигается на dt за шаг."""
+    def __init__(self, n=3, step_time=0.0):
+        self.xs = np.zeros(n)
+        self.step_time = step_time
+        self.calls = 0
+        self.threads = set()
+
+    def step(self, dt):
+        self.threads.add(threading.current_thread())
+        if self.step_time:
+            time.sleep(self.step_time)
+        self.xs += dt
+        self.calls += 1
+
+    def snapshot(self):
+        return self.xs.copy(), -self.xs
+
+
+def run(scheduler, seconds):
+    scheduler.start()
+    time.sleep(seconds)
+    scheduler.stop()
+    return scheduler
+
+
+def test_snapshots_are_consistent_with_steps():
+    model = Counter()
+    published = []
+    scheduler = run(PhysicsScheduler(model.step, model.snapshot, dt=0.5, sim_time=10.0,
+                                     on_snapshot=published.append), 0.2)
+    assert model.threads and threading.main_thread() not in model.threads
+    assert scheduler.steps == model.calls > 0
+    latest = scheduler.latest()
+    assert latest is published[-1]
+    assert latest.steps == scheduler.steps
+    assert latest.time == 10.0 + 0.5 * latest.steps
+    assert np.all(latest.xs == 0.5 * latest.steps) and np.all(latest.ys == -latest.xs)
+    assert latest.vxs is None and latest.vys is None
+    assert [s.wall for s in published] == sorted(s.wall for s in published)
+
+    # После stop расчёт не продолжается
+    steps = model.calls
+    time.sleep(0.05)
+    assert model.calls == steps
+
+
+def test_rate_limits_model_time():
+    model = Counter()
+    scheduler = PhysicsScheduler(model.step, model.snapshot, dt=1.0, target_fps=100, rate=200.0)
+    run(scheduler, 0.5)
+    # 200 модельных секунд в секунду при dt=1: около 100 шагов за 0.5 с
+    assert 30 <= model.calls <= 120
+
+
+def test_one_step_per_frame_when_step_exceeds_budget():
+    model = Counter(step_time=0.03)
+    scheduler = PhysicsScheduler(model.step, model.snapshot, dt=1.0, target_fps=60)
+    published = []
+    scheduler.on_snapshot = published.append
+    run(scheduler, 0.3)
+    assert published
+    assert all(b.steps - a.steps == 1 for a, b in zip(published, published[1:]))
+
+
+def test_parameters_change_while_running():
+    model = Counter()
+    scheduler = PhysicsScheduler(model.step, model.snapshot, dt=1.0).start()
+    try:
+        time.sleep(0.05)
+        scheduler.dt = 0.0
+        time.sleep(0.05)
+        with scheduler.lock:
+            frozen = model.xs.copy()
+        time.sleep(0.05)
+        assert np.array_equal(model.xs, frozen)
+    finally:
+        scheduler.stop()
@@ -0,0 +1,102 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Кодирование кадров сервера расчёта: опорные и разностные кадры."""
+import json
+
+import numpy as np
+import pytest
+
+from solar_server import LENGTH, FrameDecoder, FrameEncoder, hello_message
+from solar_state import SpaceState
+
+RESOLUTION = 1E6
+
+
+def body(message):
+    """Сообщение без префикса длины, как его передаёт клиент декодеру."""
+    (length,) = LENGTH.unpack_from(message)
+    assert length == len(message) - LENGTH.size
+    return message[LENGTH.size:]
+
+
+def frames(rng, n, count, spread=1E11, step=1E8):
+    xs, ys = rng.normal(0, spread, n), rng.normal(0, spread, n)
+    for _ in range(count):
+        yield xs, ys
+        xs = xs + rng.normal(0, step, n)
+        ys = ys + rng.normal(0, step, n)
+
+
+def hello(n, origin=(0.0, 0.0)):
+    return {"n": n, "resolution": RESOLUTION, "origin": origin}
+
+
+@pytest.mark.parametrize("spread, step", [(1E8, 1E6), (1E11, 1E8), (1E16, 1E13)])
+def test_delta_round_trip(spread, step):
+    rng = np.random.default_rng(3)
+    encoder = FrameEncoder(RESOLUTION, origin=(5E9, -5E9))
+    decoder = FrameDecoder(hello(300, origin=(5E9, -5E9)))
+    for seq, (xs, ys) in enumerate(frames(rng, 300, 20, spread, step), 1):
+        encoder.push(xs, ys, seq * 60.0)
+        decoded_seq, sim_time, dxs, dys = decoder.decode(body(encoder.delta()))
+        assert (decoded_seq, sim_time) == (seq, seq * 60.0)
+        # Погрешность квантования не больше половины разрешения
+        assert np.max(np.abs(dxs - xs)) <= RESOLUTION / 2 * (1 + 1E-9)
+        assert np.max(np.abs(dys - ys)) <= RESOLUTION / 2 * (1 + 1E-9)
+
+
+def test_keyframe_resynchronizes_lagging_viewer():
+    rng = np.random.default_rng(4)
+    encoder = FrameEncoder(RESOLUTION)
+    decoder = FrameDecoder(hello(50))
+    sequence = list(frames(rng, 50, 6))
+    encoder.push(*sequence[0], 0.0)
+    decoder.decode(body(encoder.keyframe()))
+    for xs, ys in sequence[1:4]:
+        encoder.push(xs, ys, 1.0)  # кадры пропущены зрителем
+    with pytest.raises(ValueError):
+        decoder.decode(body(encoder.delta()))
+    seq, _, dxs, _ = decoder.decode(body(encoder.keyframe()))
+    assert seq == 4
+    assert np.max(np.abs(dxs - sequence[3][0])) <= RESOLUTION / 2 * (1 + 1E-9)
+    encoder.push(*sequence[4], 2.0)
+    seq, _, dxs, _ = decoder.decode(body(encoder.delta()))
+    assert seq == 5
+    assert np.max(np.abs(dxs - sequence[4][0])) <= RESOLUTION / 2 * (1 + 1E-9)
+
+
+def test_messages_built_once_per_frame():
+    encoder = FrameEncoder(RESOLUTION)
+    encoder.push(np.zeros(3), np.zeros(3), 0.0)
+    # Без прошлого кадра разностное сообщение — опорное
+    assert encoder.delta() is encoder.keyframe()
+    encoder.push(np.ones(3) * RESOLUTION, np.zeros(3), 1.0)
+    assert encoder.delta() is encoder.delta()
+    assert encoder.delta() is not encoder.keyframe()
+
+
+def test_narrow_integers_for_small_deltas():
+    rng = np.random.default_rng(5)
+    xs, ys = rng.normal(0, 1E17, 10000), rng.normal(0, 1E17, 10000)
+    encoder = FrameEncoder(RESOLUTION)
+    encoder.push(xs, ys, 0.0)
+    encoder.push(xs + RESOLUTION, ys - RESOLUTION, 1.0)
+    # Ширина целых записана последним полем заголовка
+    assert body(encoder.keyframe())[13] == 8
+    assert body(encoder.delta())[13] == 2
+    assert len(encoder.delta()) < len(encoder.keyframe()) / 10
+
+
+def test_hello_message():
+    state = SpaceState()
+    state.add_bodies(0, 2E30, 0.0, 0.0, 0.0, 0.0, 30, "yellow")
+    state.add_bodies(1, 6E24, 1E11, 0.0, 0.0, 3E4, 10, "blue")
+    state.add_bodies(2, 7E22, 1E11, 4E8, 0.0, 3E4, 3, "gray", parent=1)
+    message = body(hello_message(state, RESOLUTION, (0.0, 0.0)))
+    assert message[:1] == b"H"
+    hello = json.loads(message[1:])
+    assert hello["n"] == 3
+    assert hello["kind"] == [0, 1, 2]
+    assert hello["parent"] == [-1, -1, 1]
+    assert hello["color"] == ["yellow", "blue", "gray"]
@@ -0,0 +1,130 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Пространственный индекс и поиск родителей против полного перебора."""
+import numpy as np
+import pytest
+
+from solar_spatial import SpatialIndex, find_parents
+
+
+def random_points(rng, n, outliers=10):
+    xs = rng.normal(0, 1E11, n)
+    ys = rng.normal(0, 1E11, n)
+    # Редкие далёкие тела оказываются за границами сетки
+    far = rng.choice(n, min(outliers, n), replace=False)
+    xs[far] *= 1E3
+    ys[far] *= -1E3
+    return xs, ys
+
+
+def brute_within(xs, ys, x, y, radius):
+    return np.flatnonzero((xs - x) ** 2 + (ys - y) ** 2 <= radius * radius)
+
+
+def queries(rng, xs, ys, count=50):
+    """Точки запросов: рядом с телами, случайные и далеко за сеткой."""
+    near = rng.choice(len(xs), count)
+    points = list(zip(xs[near] + rng.normal(0, 1E9, count), ys[near] + rng.normal(0, 1E9, count)))
+    points += list(zip(rng.normal(0, 3E11, count), rng.normal(0, 3E11, count)))
+    points += [(1E16, 1E16), (-1E16, 0.0)]
+    return points
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(7)
+
+
+@pytest.mark.parametrize("n", [1, 2, 17, 3000])
+def test_queries_match_brute_force(rng, n):
+    xs, ys = random_points(rng, n)
+    index = SpatialIndex(xs, ys)
+    for x, y in queries(rng, xs, ys):
+        for radius in (1E9, 5E10, 1E12):
+            assert sorted(index.within(x, y, radius)) == list(brute_within(xs, ys, x, y, radius))
+        x0, y0 = x - 4E10, y - 2E10
+        x1, y1 = x + 1E10, y + 6E10
+        inside = np.flatnonzero((xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1))
+        assert sorted(index.in_rect(x0, y0, x1, y1)) == list(inside)
+
+        i, distance = index.nearest(x, y)
+        distances = np.hypot(xs - x, ys - y)
+        assert distance == pytest.approx(distances.min())
+        assert distances[i] == pytest.approx(distances.min())
+
+
+def test_nearest_max_distance(rng):
+    xs, ys = random_points(rng, 500)
+    index = SpatialIndex(xs, ys)
+    distances = np.hypot(xs - 1E11, ys)
+    assert index.nearest(1E11, 0.0, max_distance=distances.min() / 2) is None
+    assert index.nearest(1E11, 0.0, max_distance=distances.min() * 2)[0] == distances.argmin()
+
+
+def test_update_after_motion(rng):
+    xs, ys = random_points(rng, 2000)
+    index = SpatialIndex(xs, ys)
+    for shift in (1E9, 1E10, 5E11):
+        xs = xs + rng.normal(0, shift, len(xs))
+        ys = ys + rng.normal(0, shift, len(ys))
+        index.update(xs, ys)
+        for x, y in queries(rng, xs, ys, 10):
+            assert sorted(index.within(x, y, 3E10)) == list(brute_within(xs, ys, x, y, 3E10))
+
+
+def test_empty_index():
+    index = SpatialIndex([], [])
+    assert len(index) == 0
+    assert len(index.within(0.0, 0.0, 1.0)) == 0
+    assert len(index.in_rect(-1.0, -1.0, 1.0, 1.0)) == 0
+    assert index.nearest(0.0, 0.0) is None
+    point, body = index.pairs_within([0.0], [0.0], 1.0)
+    assert len(point) == len(body) == 0
+
+
+def test_pairs_within_match_brute_force(rng):
+    xs, ys = random_points(rng, 1500)
+    index = SpatialIndex(xs, ys)
+    qx, qy = np.array(queries(rng, xs, ys, 200)).T
+    point, body = index.pairs_within(qx, qy, 2E10)
+    found = sorted(zip(point.tolist(), body.tolist()))
+    expected = [(k, i) for k in range(len(qx)) for i in brute_within(xs, ys, qx[k], qy[k], 2E10)]
+    assert found == expected
+
+
+def brute_parents(xs, ys, parent_xs, parent_ys, reach):
+    """Правило solar_input.find_parent_planet: первое тело ближе reach."""
+    parent = np.full(len(xs), -1)
+    matches = np.zeros(len(xs), dtype=int)
+    for k in range(len(xs)):
+        hits = np.flatnonzero(np.hypot(parent_xs - xs[k], parent_ys - ys[k]) < reach)
+        matches[k] = len(hits)
+        if len(hits):
+            parent[k] = hits[0]
+    return parent, matches
+
+
+def test_find_parents_match_brute_force(rng):
+    parent_xs, parent_ys = random_points(rng, 400)
+    reach = rng.uniform(1E9, 3E10, 400)
+    # Половина точек возле тел (часть — сразу у нескольких), остальные случайны
+    near = rng.choice(400, 300)
+    angle = rng.uniform(0, 2 * np.pi, 300)
+    distance = rng.uniform(0, 1.5, 300) * reach[near]
+    xs = np.concatenate((parent_xs[near] + distance * np.cos(angle), rng.normal(0, 1E11, 300)))
+    ys = np.concatenate((parent_ys[near] + distance * np.sin(angle), rng.normal(0, 1E11, 300)))
+
+    parent, matches = find_parents(xs, ys, parent_xs, parent_ys, reach)
+    expected_parent, expected_matches = brute_parents(xs, ys, parent_xs, parent_ys, reach)
+    assert np.array_equal(parent, expected_parent)
+    assert np.array_equal(matches, expected_matches)
+    assert np.any(matches > 1)
+
+
+def test_find_parents_empty_inputs():
+    parent, matches = find_parents([], [], [1.0], [1.0], [5.0])
+    assert len(parent) == len(matches) == 0
+    parent, matches = find_parents([0.0, 1.0], [0.0, 1.0], [], [], [])
+    assert parent.tolist() == [-1, -1]
+    assert matches.tolist() == [0, 0]
@@ -0,0 +1,80 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Векторный шаг по массивам против модели объектов и состояние на диске."""
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from solar_input import read_space_state_from_file
+from solar_model import recalculate_space_objects_positions
+from solar_state import (KIND_STAR, KIND_PLANET, STATE_FIELDS, MappedSpaceState, SpaceState,
+                         load_state, object_positions, object_velocities,
+                         recalculate_state_positions, save_state)
+
+SCENARIO = Path(__file__).resolve().parent.parent / "Four_stars@@@@.txt"
+
+
+def assert_close(state, xs, ys, vxs, vys):
+    for actual, expected in ((state.x, xs), (state.y, ys), (state.Vx, vxs), (state.Vy, vys)):
+        assert np.allclose(actual, expected, rtol=1E-9, atol=1E-6)
+
+
+def test_vectorized_step_matches_objects():
+    state = read_space_state_from_file(SCENARIO, seed=1)
+    objects = state.to_objects()
+    # Система хаотична: разница порядка суммирования растёт от шага к шагу,
+    # поэтому сравниваются первые несколько шагов
+    for _ in range(5):
+        recalculate_state_positions(state, 1.0)
+        recalculate_space_objects_positions(objects, 1.0)
+    assert_close(state, *object_positions(objects), *object_velocities(objects))
+
+
+def test_mapped_state_matches_memory(tmp_path):
+    state = read_space_state_from_file(SCENARIO, seed=1)
+    mapped = MappedSpaceState.from_state(str(tmp_path / "state"), state)
+    for name in STATE_FIELDS:
+        assert np.array_equal(getattr(mapped, name), getattr(state, name)), name
+
+    # Маленькие блоки: и тела, и источники обходятся по частям
+    for _ in range(5):
+        recalculate_state_positions(state, 1.0)
+        recalculate_state_positions(mapped, 1.0, block_size=17)
+    assert_close(mapped, state.x, state.y, state.Vx, state.Vy)
+
+    mapped.flush()
+    reopened = MappedSpaceState(str(tmp_path / "state"))
+    assert np.array_equal(reopened.x, mapped.x) and np.array_equal(reopened.parent, state.parent)
+    with pytest.raises(TypeError):
+        reopened.add_bodies(KIND_STAR, 1.0, 0.0, 0.0, 0.0, 0.0, 1, "red")
+
+
+def test_sources_limited_to_massive_bodies():
+    state = SpaceState()
+    state.add_bodies(KIND_STAR, 2E30, 0.0, 0.0, 0.0, 0.0, 20, "yellow")
+    rng = np.random.default_rng(1)
+    state.add_bodies(KIND_PLANET, 0.0, rng.uniform(1E3, 1E4, 50), rng.uniform(1E3, 1E4, 50),
+                     0.0, 0.0, 1, "grey")
+    limited = SpaceState()
+    for name in STATE_FIELDS:
+        setattr(limited, name, getattr(state, name).copy())
+    recalculate_state_positions(state, 1.0)
+    recalculate_state_positions(limited, 1.0, sources=np.array([0]))
+    assert_close(limited, state.x, state.y, state.Vx, state.Vy)
+
+
+def test_empty_mapped_state(tmp_path):
+    mapped = MappedSpaceState.from_state(str(tmp_path / "empty"), SpaceState())
+    assert len(mapped) == 0
+    recalculate_state_positions(mapped, 1.0)
+
+
+def test_save_and_load_state(tmp_path):
+    state = read_space_state_from_file(SCENARIO, seed=1)
+    save_state(tmp_path / "state.npz", state, time=12.5, steps=3)
+    loaded, meta = load_state(tmp_path / "state.npz")
+    assert meta == {"time": 12.5, "steps": 3}
+    for name in STATE_FIELDS:
+        assert np.array_equal(getattr(loaded, name), getattr(state, name)), name
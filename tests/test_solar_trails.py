@@ -0,0 +1,63 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Кольцевой буфер следов."""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import solar_vis
+from solar_trails import TRAIL_BRIGHTNESS, TrailBuffer, splat_trails
+
+
+@pytest.fixture(autouse=True)
+def unit_view(monkeypatch):
+    """Один метр — один пиксел, начало координат в точке (10, 10)."""
+    monkeypatch.setattr(solar_vis, "view", solar_vis.ViewTransform(1.0))
+    solar_vis.view.origin_x = solar_vis.view.origin_y = 10.0
+
+
+def test_ring_wraps_around():
+    trails = TrailBuffer(2, length=4, min_pixels=1.0)
+    for t in range(7):
+        trails.record(np.array([t, -t], dtype=float), np.array([0.0, 2 * t]))
+        assert trails.count.tolist() == [min(t + 1, 4)] * 2
+        assert trails.head.tolist() == [(t + 1) % 4] * 2
+    # От старых точек к новым, самые старые перезаписаны
+    assert trails.trail(0)[:, 0].tolist() == [3.0, 4.0, 5.0, 6.0]
+    assert trails.trail(1).tolist() == [[-3.0, 6.0], [-4.0, 8.0], [-5.0, 10.0], [-6.0, 12.0]]
+
+
+def test_small_moves_are_skipped():
+    trails = TrailBuffer(2, length=8, min_pixels=2.0)
+    assert trails.record(np.zeros(2), np.zeros(2)) == 2
+    trails.dirty[:] = False
+    assert trails.record(np.array([1.0, 3.0]), np.zeros(2)) == 1
+    assert trails.count.tolist() == [1, 2]
+    assert trails.dirty.tolist() == [False, True]
+    # Смещение считается от последней записанной точки, а не от прошлого вызова
+    assert trails.record(np.array([2.0, 3.0]), np.zeros(2)) == 1
+    assert trails.trail(0)[:, 0].tolist() == [0.0, 2.0]
+
+
+def test_all_points_and_precision():
+    trails = TrailBuffer(3, length=4, min_pixels=0.0)
+    trails.record(np.array([1E11, 0.0, 5.0]), np.zeros(3))
+    trails.record(np.array([1E11 + 1, 0.0, 5.0]), np.zeros(3))
+    bodies, xs, ys = trails.all_points()
+    assert bodies.tolist() == [0, 0, 1, 1, 2, 2]
+    # Соседние точки далёкого тела различимы
+    assert xs[1] - xs[0] == 1.0
+
+
+def test_splat_trails_into_frame():
+    trails = TrailBuffer(2, length=4, min_pixels=1.0)
+    trails.record(np.array([0.0, 1000.0]), np.array([0.0, 0.0]))
+    trails.record(np.array([3.0, 1000.0]), np.array([-2.0, 0.0]))
+    frame = np.zeros((20, 20, 3), dtype=np.uint8)
+    bodies = SimpleNamespace(rgb=np.array([[200, 100, 50], [255, 255, 255]]))
+    splat_trails(frame, trails, bodies)
+    lit = {tuple(p) for p in np.argwhere(frame.any(axis=2)).tolist()}
+    assert lit == {(10, 10), (12, 13)}
+    assert frame[12, 13].tolist() == (np.array([200, 100, 50]) * TRAIL_BRIGHTNESS).astype(int).tolist()